@@ -1,75 +1,35 @@
-import pandas as pd
-import re
+import argparse
 
-def extract_series_line(part_number_str):
-    """
-    Извлекает основную серию и линейку из part_number.
-    """
-    part_number = str(part_number_str)
-    
-    if part_number.startswith("STM32L0"):
-        match_l0 = re.match(r"STM32L0(\d{2})", part_number)
-        if not match_l0:
-            return "L0_Malformed_PN"
-        device_line_digits = match_l0.group(1)
-        if device_line_digits == "10":
-            return "L0x0"
-        elif device_line_digits in ["11", "21", "31", "41", "51", "61", "71", "81"]:
-            return "L0x1"
-        elif device_line_digits in ["52", "62", "72", "82"]:
-            return "L0x2"
-        elif device_line_digits in ["53", "63", "73", "83"]:
-            return "L0x3"
-        else:
-            return "L0_Unknown_Digits"
-            
-    elif part_number.startswith("STM32L1"):
-        match_l1 = re.match(r"STM32L1(\d{2})", part_number)
-        if not match_l1:
-            return "L1_Malformed_PN"
-        device_line_digits = match_l1.group(1)
-        # L100, L151, L152, L162
-        if device_line_digits in ["00", "51", "52", "62"]: 
-            return f"L1{device_line_digits}"
-        else:
-            # Для L1 могут быть и другие, например, STM32L151xD (Cat 4), STM32L151xE (Cat 5)
-            # Пока оставляем так, но эту логику можно будет уточнить при необходимости
-            # для более детальной классификации L1.
-            # Сейчас главное - отделить L1 от L0.
-            return f"L1{device_line_digits}" # Возвращаем L1XX
-    return "Unknown_Series"
+import pandas as pd
 
+from eeprom_rules import RESEARCH_FILTER, RESEARCH_SERIES_LINE_RULES
+from engine import add_engine_argument, get_engine
 
-def create_eeprom_research_csv(parquet_filepath, output_csv_filepath):
-    try:
-        df = pd.read_parquet(parquet_filepath)
-    except Exception as e:
-        print(f"Ошибка чтения Parquet файла '{parquet_filepath}': {e}")
-        return
 
-    print(f"Прочитано {len(df)} записей из Parquet файла '{parquet_filepath}'.")
+def build_research_frame(engine, parquet_filepath):
+    """
+    Строит таблицу для исследования EEPROM: МК L0/L1 с EEPROM > 0 байт, серия и
+    линейка из part_number (правила в eeprom_rules.py) и пустые столбцы для
+    ручного заполнения. Возвращает pandas DataFrame (пустой, если МК не найдены).
+    """
+    table = engine.read_parquet(parquet_filepath)
+    print(f"Прочитано {engine.num_rows(table)} записей из Parquet файла '{parquet_filepath}'.")
 
     # Фильтруем только L0 и L1 серии и те, у кого есть EEPROM
     # (столбец data_e2prom_b из вашего парсинга pandas)
     # Убедимся, что data_e2prom_b числовой для фильтрации
-    df['data_e2prom_b'] = pd.to_numeric(df['data_e2prom_b'], errors='coerce').fillna(0)
-
-    df_filtered = df[
-        (df['part_number'].str.startswith('STM32L0') | df['part_number'].str.startswith('STM32L1')) &
-        (df['data_e2prom_b'] > 0)
-    ].copy()
-
+    table = engine.to_numeric(table, ['data_e2prom_b'])
+    table = engine.filter_rows(table, RESEARCH_FILTER)
+    table = engine.derive_series_line(table, RESEARCH_SERIES_LINE_RULES)
+    df_filtered = engine.to_pandas(table)
     if df_filtered.empty:
-        print("Не найдено МК L0/L1 с информацией о EEPROM (>0 байт) в Parquet файле.")
-        return
-
-    print(f"Найдено {len(df_filtered)} МК L0/L1 с EEPROM для создания исследовательского CSV.")
+        return pd.DataFrame()
 
     # Создаем новый DataFrame с нужными столбцами
     research_df = pd.DataFrame()
     research_df['part_number'] = df_filtered['part_number']
     
-    research_df['series_line'] = df_filtered['part_number'].apply(extract_series_line)
+    research_df['series_line'] = df_filtered['series_line']
     
     # Копируем существующие полезные поля
     # Убедимся, что эти столбцы существуют в вашем df_filtered
@@ -108,7 +68,21 @@ def create_eeprom_research_csv(parquet_filepath, output_csv_filepath):
     # Убедимся, что все столбцы из column_order присутствуют в research_df перед переупорядочиванием
     final_columns = [col for col in column_order if col in research_df.columns]
     research_df = research_df[final_columns]
+    return research_df
+
+
+def create_eeprom_research_csv(parquet_filepath, output_csv_filepath, engine_name="pandas"):
+    try:
+        research_df = build_research_frame(get_engine(engine_name), parquet_filepath)
+    except Exception as e:
+        print(f"Ошибка чтения Parquet файла '{parquet_filepath}': {e}")
+        return
+
+    if research_df.empty:
+        print("Не найдено МК L0/L1 с информацией о EEPROM (>0 байт) в Parquet файле.")
+        return
 
+    print(f"Найдено {len(research_df)} МК L0/L1 с EEPROM для создания исследовательского CSV.")
 
     try:
         research_df.to_csv(output_csv_filepath, index=False, encoding='utf-8')
@@ -120,4 +94,7 @@ def create_eeprom_research_csv(parquet_filepath, output_csv_filepath):
 if __name__ == "__main__":
     parquet_file = "all_stm_products.parquet" # Убедитесь, что этот файл обновлен
     output_csv_for_research = "stm32_l0_l1_eeprom_research.csv" # Этот файл будет перезаписан
-    create_eeprom_research_csv(parquet_file, output_csv_for_research)
+    parser = argparse.ArgumentParser(description="Создание исследовательского CSV для EEPROM МК L0/L1.")
+    add_engine_argument(parser)
+    args = parser.parse_args()
+    create_eeprom_research_csv(parquet_file, output_csv_for_research, args.engine)
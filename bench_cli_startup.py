@@ -0,0 +1,68 @@
+"""Start-up time of the command line tools.
+
+Every command is started as a fresh process a few times and the median wall time is
+reported, next to the heaviest imports seen by `python -X importtime`.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# (label, argv after the interpreter)
+COMMANDS = [
+    ("python (empty)", ["-c", "pass"]),
+    ("cli.py list", ["cli.py", "list"]),
+    ("cli.py search", ["cli.py", "search", "L151CB"]),
+    ("pn_search.py", ["pn_search.py", "L151CB"]),
+    ("list.py", ["list.py"]),
+    ("cli.py check", ["cli.py", "check"]),
+    ("check.py", ["check.py"]),
+]
+
+
+def wall_time_ms(argv, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def heaviest_imports(argv, top):
+    """Top-level packages by cumulative import time (ms), from -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, raw_name = line[12:].split("|")
+        cumulative = cumulative.strip()
+        if not cumulative.isdigit():
+            continue
+        # Nested imports are indented further, top-level ones have a single space
+        if len(raw_name) - len(raw_name.lstrip()) == 1:
+            root = raw_name.strip().split(".")[0]
+            packages[root] = packages.get(root, 0) + int(cumulative) / 1000
+    ranked = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return ", ".join(f"{name} {ms:.0f}" for name, ms in ranked)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure start-up time of the tools.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=4, help="Imports to show")
+    args = parser.parse_args()
+
+    print(f"{'command':<16} {'median ms':>10}  heaviest imports (ms)")
+    for label, argv in COMMANDS:
+        ms = wall_time_ms(argv, args.repeat)
+        print(f"{label:<16} {ms:>10.0f}  {heaviest_imports(argv, args.top)}")
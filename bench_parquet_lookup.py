@@ -0,0 +1,164 @@
+"""Lookup latency of the product catalogue Parquet layout, before and after.
+
+"before" is what main.py used to write: rows in file order, default settings.
+"after" is the file main.ingest_products writes: sorted by part_number, small row
+groups, statistics and page index. Both hold the same synthetic catalogue: ST
+exports made by copying the real L0/L1 rows into the other STM32 families are
+ingested by ingest_products, and "before" is its output put back in export order.
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from list import _prefix_upper_bound
+from main import ingest_products
+
+# --- Configuration ---
+export_files = ["ProductsList_L0.csv", "ProductsList_L1.csv"]
+FAMILIES = [
+    "C0", "F0", "F1", "F2", "F3", "F4", "F7", "G0", "G4", "H5",
+    "H7", "L0", "L1", "L4", "L5", "U0", "U5", "WB", "WL", "N6",
+]  # fmt: skip
+
+
+def synthetic_exports(csv_files, rows, out_dir, seed=0):
+    """ST exports with about `rows` copies of the real rows moved to other families,
+    shuffled. Returns (written files, their part numbers in file order)."""
+    tables = [
+        pd.read_csv(f, header=None, dtype=str, keep_default_na=False) for f in csv_files
+    ]
+    total = sum(len(table) - 2 for table in tables)
+    paths, part_numbers = [], []
+    for n, table in enumerate(tables):
+        # Header and sub-header rows are kept as they are
+        header, body = table.iloc[:2], table.iloc[2:]
+        names = header.iloc[0]
+        pn_col = names.index[names == "Part Number"][0]
+        eeprom_col = names.index[names == "Data E2PROM (B) nom"][0]
+        file_rows = rows * len(body) // total
+        copies = []
+        for i in range(-(-file_rows // len(body))):
+            family = FAMILIES[i % len(FAMILIES)]
+            copy = body.copy()
+            # STM32L010C6 -> STM32F4<copy>L010C6: unique, and grouped by family like real ones
+            copy[pn_col] = (
+                "STM32" + family + f"{i // len(FAMILIES):02d}" + copy[pn_col].str[5:]
+            )
+            if family not in ("L0", "L1"):
+                # Only the EEPROM families may have data EEPROM (constraints.py)
+                copy[eeprom_col] = "-"
+            copies.append(copy)
+        body = pd.concat(copies).iloc[:file_rows]
+        body = body.sample(frac=1, random_state=seed + n)
+        path = Path(out_dir) / f"ProductsList_synthetic_{n}.csv"
+        pd.concat([header, body]).to_csv(path, header=False, index=False)
+        paths.append(str(path))
+        part_numbers.extend(body[pn_col])
+    return paths, part_numbers
+
+
+def row_groups_touched(path, lo, hi):
+    """Row groups whose part_number statistics overlap [lo, hi]."""
+    meta = pq.ParquetFile(path).metadata
+    col = meta.schema.to_arrow_schema().get_field_index("part_number")
+    touched = 0
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(col).statistics
+        if (
+            stats is None
+            or not stats.has_min_max
+            or (stats.min <= hi and stats.max >= lo)
+        ):
+            touched += 1
+    return touched, meta.num_row_groups
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def bench_file(path, part_numbers, family, repeat):
+    point = _time(
+        lambda: [
+            pq.read_table(path, filters=[("part_number", "==", pn)])
+            for pn in part_numbers
+        ],
+        repeat,
+    ) / len(part_numbers)
+    upper = _prefix_upper_bound(family)
+    fam = _time(
+        lambda: pq.read_table(
+            path,
+            filters=[("part_number", ">=", family), ("part_number", "<", upper)],
+        ),
+        repeat,
+    )
+    rg_point = np.mean([row_groups_touched(path, pn, pn)[0] for pn in part_numbers])
+    rg_family, total = row_groups_touched(path, family, upper)
+    return point, fam, rg_point, rg_family, total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark part number and family lookups on the old and new Parquet layout."
+    )
+    parser.add_argument(
+        "--rows", type=int, default=20000, help="Synthetic catalogue size"
+    )
+    parser.add_argument(
+        "--lookups", type=int, default=50, help="Point lookups per round"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Rounds (median is reported)"
+    )
+    parser.add_argument(
+        "--family", default="STM32H7", help="Prefix for the family filter"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_files, all_part_numbers = synthetic_exports(export_files, args.rows, tmp)
+        before = Path(tmp) / "before.parquet"
+        after = Path(tmp) / "after.parquet"
+        # The progress output of the ingestion is not part of the benchmark
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, violations = ingest_products(csv_files, str(after))
+        if not after.exists():
+            print(violations.to_string(index=False))
+            raise SystemExit("The synthetic catalogue did not pass the constraints.")
+
+        df = pd.read_parquet(after)
+        order = pd.Index(all_part_numbers).get_indexer(df["part_number"])
+        df.iloc[np.argsort(order)].to_parquet(before, engine="pyarrow", index=False)
+        print(
+            f"Synthetic catalogue: {len(df)} rows, {df['part_number'].str[:7].nunique()} families."
+        )
+        rng = np.random.default_rng(1)
+        part_numbers = list(
+            rng.choice(df["part_number"].to_numpy(), args.lookups, replace=False)
+        )
+
+        print(
+            f"\n{'layout':<8} {'point ms':>9} {'family ms':>10} {'RG/point':>9} {'RG/family':>10} {'RGs':>5} {'size KB':>8}"
+        )
+        for name, path in (("before", before), ("after", after)):
+            point, fam, rg_point, rg_family, total = bench_file(
+                path, part_numbers, args.family, args.repeat
+            )
+            print(
+                f"{name:<8} {point:>9.3f} {fam:>10.3f} {rg_point:>9.2f} {rg_family:>10} {total:>5} {path.stat().st_size // 1024:>8}"
+            )
@@ -0,0 +1,223 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+key_column = "part_number"
+changes_jsonl_file = "catalog_changes.jsonl"
+
+# Fields json_check.py cares about; changes of other fields are reported but do not
+# make a chip a recheck candidate
+MEMORY_FIELDS = [
+    "flash_size_kb_prog",
+    "ram_size_kb",
+    "data_e2prom_b",
+    "dual_bank_flash",
+    "marketing_status",
+]
+
+
+def load_snapshot(path):
+    """Loads a catalogue snapshot (all_stm_products.parquet of some release)."""
+    df = pd.read_parquet(path)
+    if key_column not in df.columns:
+        raise SystemExit(f"Error: column '{key_column}' not found in {path}")
+    df[key_column] = df[key_column].astype(str).str.strip()
+    if df[key_column].duplicated().any():
+        dups = df.loc[df[key_column].duplicated(), key_column].unique()
+        print(
+            f"Warning: {len(dups)} duplicate part numbers in {path}, keeping the first row"
+        )
+        df = df.drop_duplicates(subset=[key_column], keep="first")
+    return df.sort_values(key_column, kind="stable").reset_index(drop=True)
+
+
+def sorted_merge_join(old_keys, new_keys):
+    """Aligns two sorted unique key arrays.
+
+    Returns (old index of common keys, new index of common keys, removed mask over
+    old, added mask over new), found with one binary search per side.
+    """
+    pos = np.searchsorted(old_keys, new_keys)
+    in_old = pos < len(old_keys)
+    in_old[in_old] = old_keys[pos[in_old]] == new_keys[in_old]
+    new_common = np.flatnonzero(in_old)
+    old_common = pos[in_old]
+
+    removed = np.ones(len(old_keys), dtype=bool)
+    removed[old_common] = False
+    return old_common, new_common, removed, ~in_old
+
+
+def _as_text(series):
+    return series.astype(object).where(series.notna(), "").astype(str).to_numpy()
+
+
+def changed_mask(old_values, new_values):
+    """Vectorized, NA-aware inequality of two aligned columns.
+
+    Numeric columns are compared as numbers (32 == 32.0); a column that is numeric in
+    one snapshot only is parsed as numbers on the other side first.
+    """
+    old_is_num = pd.api.types.is_numeric_dtype(old_values)
+    new_is_num = pd.api.types.is_numeric_dtype(new_values)
+    if old_is_num != new_is_num:
+        text_side = new_values if old_is_num else old_values
+        parsed = pd.to_numeric(text_side, errors="coerce")
+        if parsed.notna().sum() == (_as_text(text_side) != "").sum():
+            if old_is_num:
+                new_values = parsed
+            else:
+                old_values = parsed
+            old_is_num = new_is_num = True
+    if old_is_num and new_is_num:
+        old_num = old_values.to_numpy(dtype="float64", na_value=np.nan)
+        new_num = new_values.to_numpy(dtype="float64", na_value=np.nan)
+        both_nan = np.isnan(old_num) & np.isnan(new_num)
+        return ~(both_nan | (old_num == new_num))
+    return _as_text(old_values) != _as_text(new_values)
+
+
+def diff_catalogues(old_df, new_df, columns=None):
+    """Change set between two sorted snapshots.
+
+    Returns a DataFrame with part_number, change (added/removed/changed) and fields,
+    the list of changed columns as {column: [old, new]} for changed parts.
+    """
+    if columns is None:
+        columns = [
+            c for c in old_df.columns if c in set(new_df.columns) and c != key_column
+        ]
+
+    old_keys = old_df[key_column].to_numpy(dtype=str)
+    new_keys = new_df[key_column].to_numpy(dtype=str)
+    old_idx, new_idx, removed, added = sorted_merge_join(old_keys, new_keys)
+
+    old_common = old_df.iloc[old_idx].reset_index(drop=True)
+    new_common = new_df.iloc[new_idx].reset_index(drop=True)
+    masks = {}
+    for col in columns:
+        if col not in old_common.columns:
+            masks[col] = new_common[col].notna().to_numpy()
+        elif col not in new_common.columns:
+            masks[col] = old_common[col].notna().to_numpy()
+        else:
+            masks[col] = changed_mask(old_common[col], new_common[col])
+
+    # Only the changed cells are turned into Python objects
+    any_changed = np.zeros(len(old_common), dtype=bool)
+    for mask in masks.values():
+        any_changed |= mask
+    changed_rows = np.flatnonzero(any_changed)
+    fields = [{} for _ in changed_rows]
+    for col, mask in masks.items():
+        rows = np.flatnonzero(mask[changed_rows])
+        if not len(rows):
+            continue
+        old_vals = (
+            old_common[col].iloc[changed_rows[rows]]
+            if col in old_common
+            else [None] * len(rows)
+        )
+        new_vals = (
+            new_common[col].iloc[changed_rows[rows]]
+            if col in new_common
+            else [None] * len(rows)
+        )
+        for r, old_v, new_v in zip(rows, old_vals, new_vals):
+            fields[r][col] = [_json_value(old_v), _json_value(new_v)]
+
+    parts = [
+        pd.DataFrame({key_column: new_keys[added], "change": "added", "fields": None}),
+        pd.DataFrame(
+            {key_column: old_keys[removed], "change": "removed", "fields": None}
+        ),
+        pd.DataFrame(
+            {
+                key_column: new_common[key_column].to_numpy()[changed_rows],
+                "change": "changed",
+                "fields": fields,
+            }
+        ),
+    ]
+    changes = pd.concat(parts, ignore_index=True)
+    return changes.sort_values([key_column, "change"], kind="stable").reset_index(
+        drop=True
+    )
+
+
+def _json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def write_changes(changes, path):
+    with open(path, "w") as f:
+        for row in changes.itertuples(index=False):
+            record = {key_column: row.part_number, "change": row.change}
+            if row.fields:
+                record["fields"] = row.fields
+            f.write(
+                json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            )
+
+
+def read_recheck_chips(changes_path, fields=MEMORY_FIELDS):
+    """Part numbers json_check.py has to look at again: added parts and parts where
+    one of the given fields changed. Removed parts have nothing left to check."""
+    chips = set()
+    with open(changes_path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["change"] == "added" or (
+                record["change"] == "changed"
+                and any(field in record.get("fields", {}) for field in fields)
+            ):
+                chips.add(record[key_column])
+    return chips
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Diff two ST catalogue snapshots (all_stm_products.parquet of two releases)."
+    )
+    parser.add_argument("old", help="Previous snapshot (Parquet)")
+    parser.add_argument("new", help="New snapshot (Parquet)")
+    parser.add_argument(
+        "--output", default=changes_jsonl_file, help="JSONL file for the change set"
+    )
+    parser.add_argument(
+        "--columns",
+        nargs="+",
+        help="Only compare these columns (default: all shared columns)",
+    )
+    args = parser.parse_args()
+
+    old_df = load_snapshot(args.old)
+    new_df = load_snapshot(args.new)
+    print(f"Old snapshot: {len(old_df)} parts, new snapshot: {len(new_df)} parts.")
+
+    changes = diff_catalogues(old_df, new_df, args.columns)
+    write_changes(changes, args.output)
+
+    counts = changes["change"].value_counts()
+    for change in ("added", "removed", "changed"):
+        print(f"{change}: {counts.get(change, 0)}")
+    for row in changes.itertuples(index=False):
+        if row.change == "changed":
+            print(f"  ~ {row.part_number}: {', '.join(row.fields)}")
+        else:
+            print(f"  {'+' if row.change == 'added' else '-'} {row.part_number}")
+
+    recheck = read_recheck_chips(args.output)
+    print(
+        f"\nChange set written to {args.output}; {len(recheck)} chips need a json_check rerun:"
+    )
+    print(f"  python json_check.py --chips-from {args.output}")
@@ -1,96 +1,25 @@
 import pandas as pd
 import pyarrow.csv as pv
+import pyarrow.compute as pc
 import pyarrow as pa
-import numpy as np
 
 # File names
 research_file = "stm32_l0_l1_eeprom_research.csv"
 products_l0_file = "ProductsList_L0.csv"
 products_l1_file = "ProductsList_L1.csv"
 
-
-# --- Helper function to load CSVs using PyArrow and convert to Pandas ---
-def load_csv_pa_to_pd(filename, skip_rows=None):
-    """Loads a CSV using PyArrow and converts to Pandas DataFrame."""
-    try:
-        if skip_rows:
-            # PyArrow's read_csv doesn't have a direct skiprows list like pandas.
-            # A common workaround is to read with pandas if complex skipping is needed,
-            # or read all and then drop rows. For a single skip, we can do this:
-            df_temp = pd.read_csv(filename, skiprows=skip_rows, low_memory=False)
-            table = pa.Table.from_pandas(df_temp)
-        else:
-            table = pv.read_csv(filename)
-        return table.to_pandas()
-    except Exception as e:
-        print(f"Error loading {filename} with PyArrow, falling back to Pandas: {e}")
-        # Fallback to pandas for robustness, especially with tricky CSVs
-        return pd.read_csv(filename, skiprows=skip_rows, low_memory=False)
-
-
-# --- Load the research file ---
-print(f"Loading {research_file}...")
-research_df = load_csv_pa_to_pd(research_file)
-# Clean up research_df columns for comparison
-research_df["flash_size_kb_prog"] = pd.to_numeric(
-    research_df["flash_size_kb_prog"], errors="coerce"
-).astype("Int64")
-research_df["ram_size_kb"] = pd.to_numeric(
-    research_df["ram_size_kb"], errors="coerce"
-).astype("Int64")
-research_df["total_eeprom_b_from_export"] = pd.to_numeric(
-    research_df["total_eeprom_b_from_export"], errors="coerce"
-).astype("Int64")
-research_df["eeprom_total_size_b_from_doc"] = pd.to_numeric(
-    research_df["eeprom_total_size_b_from_doc"], errors="coerce"
-).astype("Int64")
-
-# --- Load Product List L0 ---
-print(f"Loading {products_l0_file}...")
-# The second row (index 1) is a sub-header, skip it.
-products_l0_df = load_csv_pa_to_pd(products_l0_file, skip_rows=[1])
-products_l0_df.rename(
-    columns={
-        "Flash Size (kB) (Prog)": "Product_Flash_kB",
-        "RAM Size (kB)": "Product_RAM_kB",
-        "Data E2PROM (B) nom": "Product_EEPROM_B",
-    },
-    inplace=True,
-)
-products_l0_df["Product_Flash_kB"] = pd.to_numeric(
-    products_l0_df["Product_Flash_kB"], errors="coerce"
-).astype("Int64")
-products_l0_df["Product_RAM_kB"] = pd.to_numeric(
-    products_l0_df["Product_RAM_kB"], errors="coerce"
-).astype("Int64")
-products_l0_df["Product_EEPROM_B"] = pd.to_numeric(
-    products_l0_df["Product_EEPROM_B"], errors="coerce"
-).astype("Int64")
-
-# --- Load Product List L1 ---
-print(f"Loading {products_l1_file}...")
-# The second row (index 1) is a sub-header, skip it.
-products_l1_df = load_csv_pa_to_pd(products_l1_file, skip_rows=[1])
-products_l1_df.rename(
-    columns={
-        "Flash Size (kB) (Prog)": "Product_Flash_kB",
-        "RAM Size (kB)": "Product_RAM_kB",
-        "Data E2PROM (B) nom": "Product_EEPROM_B",
-    },
-    inplace=True,
-)
-products_l1_df["Product_Flash_kB"] = pd.to_numeric(
-    products_l1_df["Product_Flash_kB"], errors="coerce"
-).astype("Int64")
-products_l1_df["Product_RAM_kB"] = pd.to_numeric(
-    products_l1_df["Product_RAM_kB"], errors="coerce"
-).astype("Int64")
-products_l1_df["Product_EEPROM_B"] = pd.to_numeric(
-    products_l1_df["Product_EEPROM_B"], errors="coerce"
-).astype("Int64")
-
-
-# --- Combine Product Lists ---
+# Columns of the research file taken into the comparison
+RESEARCH_NUMERIC_COLUMNS = [
+    "flash_size_kb_prog",
+    "ram_size_kb",
+    "total_eeprom_b_from_export",
+    "eeprom_total_size_b_from_doc",
+]
+PRODUCT_COLUMNS_RENAME = {
+    "Flash Size (kB) (Prog)": "Product_Flash_kB",
+    "RAM Size (kB)": "Product_RAM_kB",
+    "Data E2PROM (B) nom": "Product_EEPROM_B",
+}
 # Select only relevant columns to avoid duplicate column name issues if any exist beyond the renamed ones
 cols_to_keep_product = [
     "Part Number",
@@ -98,103 +27,199 @@ cols_to_keep_product = [
     "Product_RAM_kB",
     "Product_EEPROM_B",
 ]
-all_products_df = pd.concat(
-    [products_l0_df[cols_to_keep_product], products_l1_df[cols_to_keep_product]],
-    ignore_index=True,
-)
-
-# Drop duplicates in case a part number appears in both (though unlikely for L0 vs L1)
-all_products_df.drop_duplicates(subset=["Part Number"], keep="first", inplace=True)
-
-
-# --- Merge research data with combined product data ---
-print("Merging dataframes...")
-merged_df = pd.merge(
-    research_df,
-    all_products_df,
-    left_on="part_number",
-    right_on="Part Number",
-    how="left",
-)
-
-# --- Perform Checks ---
-mismatches_found = False
-print("\n--- Checking Data ---")
-
-for index, row in merged_df.iterrows():
-    part_num = row["part_number"]
-    current_mismatches = []
 
-    # Check if product was found
-    if pd.isna(row["Part Number"]):
-        print(
-            f"MISMATCH Part Number: {part_num} - Not found in Product Lists L0 or L1."
+# (research column, product column, message label, unit, hard failure)
+CHECKS = [
+    ("flash_size_kb_prog", "Product_Flash_kB", "Flash", "kB", True),
+    ("ram_size_kb", "Product_RAM_kB", "RAM", "kB", True),
+    ("total_eeprom_b_from_export", "Product_EEPROM_B", "EEPROM (Export)", "B", True),
+    # This one is expected to mismatch sometimes, as per your 'notes' in research.csv.
+    # It is only reported, not counted as a failure.
+    ("eeprom_total_size_b_from_doc", "Product_EEPROM_B", "EEPROM (Doc)", "B", False),
+]
+DOC_CHECK_NOTE = " -- Note: This can differ based on 'notes'"
+
+
+# --- Arrow path: load, cast, concat, join and compare without leaving Arrow ---
+def load_csv_table(filename, columns, skip_sub_header=False):
+    """Loads only the given columns of a CSV as an Arrow table of strings.
+
+    ST product lists have a sub-header in the second row, skip_sub_header drops it.
+    """
+    try:
+        return pv.read_csv(
+            filename,
+            read_options=pv.ReadOptions(
+                skip_rows_after_names=1 if skip_sub_header else 0
+            ),
+            convert_options=pv.ConvertOptions(
+                include_columns=columns,
+                column_types={col: pa.string() for col in columns},
+            ),
         )
-        mismatches_found = True
-        continue  # Skip further checks for this part
-
-    # Flash Size
-    # Need to handle NaN comparison carefully. (a == a) is False if a is NaN.
-    # (pd.isna(x) and pd.isna(y)) or (x == y)
-    if not (
-        (pd.isna(row["flash_size_kb_prog"]) and pd.isna(row["Product_Flash_kB"]))
-        or row["flash_size_kb_prog"] == row["Product_Flash_kB"]
-    ):
-        current_mismatches.append(
-            f"Flash (Research: {row['flash_size_kb_prog']} kB, ProductList: {row['Product_Flash_kB']} kB)"
+    except Exception as e:
+        print(f"Error loading {filename} with PyArrow, falling back to Pandas: {e}")
+        # Fallback to pandas for robustness, especially with tricky CSVs
+        df = pd.read_csv(
+            filename,
+            skiprows=[1] if skip_sub_header else None,
+            usecols=columns,
+            dtype=str,
         )
-        mismatches_found = True
+        return pa.Table.from_pandas(df[columns], preserve_index=False)
 
-    # RAM Size
-    if not (
-        (pd.isna(row["ram_size_kb"]) and pd.isna(row["Product_RAM_kB"]))
-        or row["ram_size_kb"] == row["Product_RAM_kB"]
-    ):
-        current_mismatches.append(
-            f"RAM (Research: {row['ram_size_kb']} kB, ProductList: {row['Product_RAM_kB']} kB)"
-        )
-        mismatches_found = True
 
-    # EEPROM Size (total_eeprom_b_from_export vs Product_EEPROM_B)
-    if not (
-        (
-            pd.isna(row["total_eeprom_b_from_export"])
-            and pd.isna(row["Product_EEPROM_B"])
-        )
-        or row["total_eeprom_b_from_export"] == row["Product_EEPROM_B"]
-    ):
-        current_mismatches.append(
-            f"EEPROM (Export) (Research: {row['total_eeprom_b_from_export']} B, ProductList: {row['Product_EEPROM_B']} B)"
+def to_int64(column):
+    """Arrow counterpart of pd.to_numeric(errors="coerce").astype("Int64")."""
+    column = pc.utf8_trim_whitespace(column)
+    is_number = pc.fill_null(
+        pc.match_substring_regex(column, r"^[+-]?\d+(\.0*)?$"), False
+    )
+    numbers = pc.cast(
+        pc.cast(pc.if_else(is_number, column, None), pa.float64()), pa.int64()
+    )
+    return numbers
+
+
+def cast_columns(table, columns):
+    for col in columns:
+        table = table.set_column(
+            table.schema.get_field_index(col), col, to_int64(table[col])
         )
-        mismatches_found = True
-
-    # EEPROM Size (eeprom_total_size_b_from_doc vs Product_EEPROM_B) - Additional check
-    # This one is expected to mismatch sometimes, as per your 'notes' in research.csv
-    if not (
-        (
-            pd.isna(row["eeprom_total_size_b_from_doc"])
-            and pd.isna(row["Product_EEPROM_B"])
+    return table
+
+
+def load_products_table(filename):
+    table = load_csv_table(
+        filename, list(PRODUCT_COLUMNS_RENAME) + ["Part Number"], skip_sub_header=True
+    )
+    table = table.rename_columns(
+        [PRODUCT_COLUMNS_RENAME.get(c, c) for c in table.column_names]
+    )
+    return cast_columns(table.select(cols_to_keep_product), cols_to_keep_product[1:])
+
+
+def drop_duplicate_keys(table, key):
+    """Keeps the first row of every key, like drop_duplicates(keep="first")."""
+    table = table.append_column("__row", pa.array(range(table.num_rows), pa.int64()))
+    first_rows = table.group_by(key, use_threads=False).aggregate([("__row", "min")])
+    keep = pc.is_in(table["__row"], value_set=first_rows["__row_min"])
+    return table.filter(keep).drop_columns(["__row"])
+
+
+def _mismatch(a, b):
+    """True where the values differ; two nulls count as equal."""
+    both_null = pc.and_(pc.is_null(a), pc.is_null(b))
+    equal = pc.fill_null(pc.equal(a, b), False)
+    return pc.invert(pc.or_(both_null, equal))
+
+
+def build_report_arrow():
+    """Returns (report lines, mismatches_found) computed on Arrow tables."""
+    print(f"Loading {research_file}...")
+    research = load_csv_table(research_file, ["part_number"] + RESEARCH_NUMERIC_COLUMNS)
+    research = cast_columns(research, RESEARCH_NUMERIC_COLUMNS)
+    research = research.append_column(
+        "__order", pa.array(range(research.num_rows), pa.int64())
+    )
+
+    print(f"Loading {products_l0_file}...")
+    products_l0 = load_products_table(products_l0_file)
+    print(f"Loading {products_l1_file}...")
+    products_l1 = load_products_table(products_l1_file)
+
+    # Drop duplicates in case a part number appears in both (though unlikely for L0 vs L1)
+    all_products = drop_duplicate_keys(
+        pa.concat_tables([products_l0, products_l1]), "Part Number"
+    )
+    all_products = all_products.append_column(
+        "__found", pa.array([True] * all_products.num_rows, pa.bool_())
+    )
+
+    print("Merging tables...")
+    merged = research.join(
+        all_products,
+        keys="part_number",
+        right_keys="Part Number",
+        join_type="left outer",
+        use_threads=False,
+    )
+    merged = merged.sort_by("__order")
+
+    not_found = pc.is_null(merged["__found"])
+    mismatch_masks = [
+        pc.and_(pc.invert(not_found), _mismatch(merged[res_col], merged[prod_col]))
+        for res_col, prod_col, _, _, _ in CHECKS
+    ]
+    hard_masks = [mask for mask, check in zip(mismatch_masks, CHECKS) if check[4]]
+    mismatches_found = pc.any(not_found).as_py() or any(
+        pc.any(m).as_py() for m in hard_masks
+    )
+
+    report_mask = not_found
+    for mask in mismatch_masks:
+        report_mask = pc.or_(report_mask, mask)
+    mismatch_columns = [f"__mismatch_{i}" for i in range(len(CHECKS))]
+    for name, mask in zip(mismatch_columns, mismatch_masks):
+        merged = merged.append_column(name, mask)
+    merged = merged.append_column("__not_found", not_found)
+
+    # The only conversion to Python objects: rows that end up in the report
+    lines = []
+    for row in merged.filter(report_mask).to_pylist():
+        lines.extend(
+            _report_row_lines(
+                row["part_number"],
+                row["__not_found"],
+                [
+                    (row[res_col], row[prod_col])
+                    for res_col, prod_col, _, _, _ in CHECKS
+                ],
+                [row[name] for name in mismatch_columns],
+            )
         )
-        or row["eeprom_total_size_b_from_doc"] == row["Product_EEPROM_B"]
+    return lines, mismatches_found
+
+
+def _fmt(value):
+    # Same rendering as a missing value of a pandas Int64 column
+    return "<NA>" if value is None or value is pd.NA else value
+
+
+def _report_row_lines(part_num, not_found, values, mismatches):
+    if not_found:
+        return [
+            f"MISMATCH Part Number: {part_num} - Not found in Product Lists L0 or L1."
+        ]
+    current_mismatches = []
+    for label_check, (research_value, product_value), is_mismatch in zip(
+        CHECKS, values, mismatches
     ):
+        if not is_mismatch:
+            continue
+        _, _, label, unit, hard = label_check
         current_mismatches.append(
-            f"EEPROM (Doc) (Research: {row['eeprom_total_size_b_from_doc']} B, ProductList: {row['Product_EEPROM_B']} B) -- Note: This can differ based on 'notes'"
+            f"{label} (Research: {_fmt(research_value)} {unit}, ProductList: {_fmt(product_value)} {unit})"
+            + ("" if hard else DOC_CHECK_NOTE)
         )
-        # Not necessarily setting mismatches_found = True here, as it's an advisory check
-        # You can decide if this should be a hard failure. For now, it just reports.
+    if not current_mismatches:
+        return []
+    return [f"MISMATCH Part Number: {part_num}"] + [
+        f"  - {mis}" for mis in current_mismatches
+    ]
 
-    if current_mismatches:
-        print(f"MISMATCH Part Number: {part_num}")
-        for mis in current_mismatches:
-            print(f"  - {mis}")
 
-if not mismatches_found:
-    print(
-        "\n--- All Checked Values Match Product Lists (for flash, ram, total_eeprom_b_from_export) ---"
-    )
-else:
-    print("\n--- Some Mismatches Found ---")
+if __name__ == "__main__":
+    lines, mismatches_found = build_report_arrow()
 
-# You can inspect merged_df for more details if needed
-# print("\nFirst 5 rows of merged data for inspection:")
-# print(merged_df.head())
+    # --- Perform Checks ---
+    print("\n--- Checking Data ---")
+    for line in lines:
+        print(line)
+
+    if not mismatches_found:
+        print(
+            "\n--- All Checked Values Match Product Lists (for flash, ram, total_eeprom_b_from_export) ---"
+        )
+    else:
+        print("\n--- Some Mismatches Found ---")
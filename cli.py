@@ -0,0 +1,114 @@
+"""One entry point for the pipeline scripts: python cli.py <command> [args...].
+
+Only the standard library is imported here. Every command loads what it needs when
+it runs, so `list` and `search`, which are served from the part number index, start
+without importing pandas, pyarrow, numpy or deepdiff. `list --part/--family` read
+the catalogue through list.py instead, touching only the row groups they need.
+"""
+
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+# --- Configuration ---
+products_parquet_file = "all_stm_products.parquet"
+# The scripts live next to this file; their data files are taken from the current
+# directory, as when a script is started directly
+scripts_dir = Path(__file__).resolve().parent
+
+# command -> (script, help); the script runs as if started directly
+SCRIPT_COMMANDS = {
+    "ingest": ("main.py", "Parse ProductsList_L*.csv into the Parquet catalogue"),
+    "research": ("add_csv.py", "Create the research CSV from the catalogue"),
+    "fix": ("fix_csv.py", "Apply the L0 series and category rules to the research CSV"),
+    "update": ("update.py", "Apply the L1 EEPROM rules to the research CSV"),
+    "check": ("check.py", "Compare the research CSV with the product lists"),
+    "json-check": ("json_check.py", "Compare chip JSONs and validate L0/L1 EEPROM"),
+}
+
+
+def run_script(script, argv):
+    path = str(scripts_dir / script)
+    sys.argv = [path] + argv
+    runpy.run_path(path, run_name="__main__")
+
+
+def _load_index(parquet):
+    from pn_search import load_index
+
+    try:
+        return load_index(parquet)
+    except FileNotFoundError:
+        print(f"Error: file not found: {parquet}")
+        raise SystemExit(1)
+
+
+def cmd_list(args):
+    if args.part or args.family:
+        # Read only the row groups that can hold the part or the family
+        from list import find_family, find_part
+
+        try:
+            if args.part:
+                rows = find_part(args.parquet, args.part)
+                if rows.empty:
+                    print(f"{args.part}: not found")
+                    raise SystemExit(1)
+                print(rows.T.to_string(header=False))
+            else:
+                family = find_family(args.parquet, args.family, ["part_number"])
+                for part_number in family["part_number"]:
+                    print(part_number)
+        except FileNotFoundError:
+            print(f"Error: file not found: {args.parquet}")
+            raise SystemExit(1)
+        return
+    for part_number in sorted(_load_index(args.parquet).part_numbers()):
+        print(part_number)
+
+
+def cmd_search(args):
+    index = _load_index(args.parquet)
+    for query in args.queries:
+        print(f"{query}:")
+        matches = index.search(query, args.limit)
+        if not matches:
+            print("  no matches")
+        for part_number, score in matches:
+            print(f"  {part_number:<16} {score:.2f}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="STM32 product list and EEPROM research tools."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, (_, help_text) in SCRIPT_COMMANDS.items():
+        # Listed for --help only, the arguments go to the script untouched
+        commands.add_parser(name, help=help_text, add_help=False)
+
+    sub = commands.add_parser("list", help="Print all part numbers of the catalogue")
+    sub.add_argument("--parquet", default=products_parquet_file)
+    lookup = sub.add_mutually_exclusive_group()
+    lookup.add_argument("--part", help="Print all columns of this part number")
+    lookup.add_argument(
+        "--family", help="Print the part numbers starting with this prefix"
+    )
+    sub.set_defaults(func=cmd_list)
+
+    sub = commands.add_parser("search", help="Fuzzy search of part numbers")
+    sub.add_argument("queries", nargs="+", help="Part numbers, complete or not")
+    sub.add_argument("--parquet", default=products_parquet_file)
+    sub.add_argument("--limit", type=int, default=10)
+    sub.set_defaults(func=cmd_search)
+    return parser
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in SCRIPT_COMMANDS:
+        run_script(SCRIPT_COMMANDS[sys.argv[1]][0], sys.argv[2:])
+    else:
+        args = build_parser().parse_args()
+        args.func(args)
@@ -0,0 +1,219 @@
+"""Data-quality constraints for ST product lists.
+
+Constraints are plain data: a name, a kind, the columns involved and the kind's
+parameters. Every kind is evaluated as a vectorized expression over whole columns,
+so checking the full catalogue is one pass over the frame with no per-row Python.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Usual flash sizes: powers of two and 1.5x powers of two (192, 384, 768, 1536 KB).
+# This is not a list of every size ST sells, so other sizes are only a warning.
+FLASH_SIZE_CODES_KB = sorted(
+    {2**k for k in range(2, 13)} | {3 * 2**k for k in range(2, 11)}
+)
+MARKETING_STATUSES = ["Active", "NRND", "Preview", "Proposal", "Evaluation", "Obsolete"]
+# Families with data EEPROM
+EEPROM_FAMILY_PREFIXES = ["STM32L0", "STM32L1", "STM8"]
+
+# (name, kind, columns, params, severity)
+PRODUCT_CONSTRAINTS = [
+    ("part_number_present", "not_null", ["part_number"], {}, "error"),
+    ("part_number_unique", "unique", ["part_number"], {}, "error"),
+    (
+        "part_number_format",
+        "regex",
+        ["part_number"],
+        {"pattern": r"^STM(?:32|8)[A-Z0-9]+(?:-[A-Z])?$"},
+        "error",
+    ),
+    (
+        "marketing_status_known",
+        "isin",
+        ["marketing_status"],
+        {"values": MARKETING_STATUSES},
+        "error",
+    ),
+    (
+        "flash_size_valid_code",
+        "isin",
+        ["flash_size_kb_prog"],
+        {"values": FLASH_SIZE_CODES_KB, "numeric": True},
+        "warning",
+    ),
+    ("ram_size_positive", "range", ["ram_size_kb"], {"min": 1}, "error"),
+    (
+        "supply_voltage_ordered",
+        "le",
+        ["supply_voltage_v_min", "supply_voltage_v_max"],
+        {},
+        "error",
+    ),
+    (
+        "supply_voltage_range",
+        "range",
+        ["supply_voltage_v_min"],
+        {"min": 1.0, "max": 5.5},
+        "warning",
+    ),
+    (
+        "operating_temperature_ordered",
+        "le",
+        ["operating_temperature_degc_min", "operating_temperature_degc_max"],
+        {},
+        "error",
+    ),
+    (
+        "eeprom_only_in_eeprom_families",
+        "zero_unless_prefix",
+        ["data_e2prom_b", "part_number"],
+        {"prefixes": EEPROM_FAMILY_PREFIXES},
+        "error",
+    ),
+]
+
+VIOLATION_COLUMNS = [
+    "row",
+    "part_number",
+    "constraint",
+    "severity",
+    "columns",
+    "values",
+]
+
+
+# --- Vectorized evaluators: each returns a boolean mask of violating rows ---
+def _numeric(df, col):
+    return pd.to_numeric(df[col], errors="coerce")
+
+
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == "")
+
+
+def _not_null(df, cols, params):
+    return _blank(df[cols[0]])
+
+
+def _unique(df, cols, params):
+    return df.duplicated(subset=cols, keep="first") & ~_blank(df[cols[0]])
+
+
+def _regex(df, cols, params):
+    values = df[cols[0]].astype(str)
+    return ~values.str.fullmatch(params["pattern"]) & ~_blank(df[cols[0]])
+
+
+def _isin(df, cols, params):
+    if params.get("numeric"):
+        values = _numeric(df, cols[0])
+        return values.notna() & ~values.isin(params["values"])
+    values = df[cols[0]]
+    return ~_blank(values) & ~values.astype(str).str.strip().isin(params["values"])
+
+
+def _range(df, cols, params):
+    values = _numeric(df, cols[0])
+    bad = pd.Series(False, index=df.index)
+    if "min" in params:
+        bad |= values < params["min"]
+    if "max" in params:
+        bad |= values > params["max"]
+    return bad
+
+
+def _le(df, cols, params):
+    # Missing values on either side are not this constraint's business
+    return (_numeric(df, cols[0]) > _numeric(df, cols[1])).fillna(False)
+
+
+def _zero_unless_prefix(df, cols, params):
+    values = _numeric(df, cols[0]).fillna(0)
+    allowed = df[cols[1]].astype(str).str.startswith(tuple(params["prefixes"]))
+    return (values > 0) & ~allowed
+
+
+EVALUATORS = {
+    "not_null": _not_null,
+    "unique": _unique,
+    "regex": _regex,
+    "isin": _isin,
+    "range": _range,
+    "le": _le,
+    "zero_unless_prefix": _zero_unless_prefix,
+}
+
+
+def check_constraints(df, constraints=PRODUCT_CONSTRAINTS):
+    """Evaluates all constraints over df. Returns a violations table, one row per
+    (row, constraint), with the row position and the offending values."""
+    parts = []
+    positions = np.arange(len(df))
+    part_numbers = (
+        df["part_number"].astype(str).to_numpy()
+        if "part_number" in df.columns
+        else np.full(len(df), "")
+    )
+    for name, kind, cols, params, severity in constraints:
+        missing = [col for col in cols if col not in df.columns]
+        if missing:
+            # A missing column holds no violating value (e.g. an export of a family
+            # without data EEPROM), so it is only noted, whatever the severity
+            parts.append(
+                pd.DataFrame(
+                    {
+                        "row": [-1],
+                        "part_number": [""],
+                        "constraint": [name],
+                        "severity": ["warning"],
+                        "columns": [",".join(cols)],
+                        "values": [f"missing column(s): {', '.join(missing)}"],
+                    }
+                )
+            )
+            continue
+        bad = EVALUATORS[kind](df, cols, params).to_numpy(dtype=bool)
+        if not bad.any():
+            continue
+        # Only the violating cells are rendered as text
+        values = df.loc[bad, cols].astype(str)
+        rendered = values[cols[0]] if len(cols) == 1 else values.agg(" / ".join, axis=1)
+        parts.append(
+            pd.DataFrame(
+                {
+                    "row": positions[bad],
+                    "part_number": part_numbers[bad],
+                    "constraint": name,
+                    "severity": severity,
+                    "columns": ",".join(cols),
+                    "values": rendered.to_numpy(),
+                }
+            )
+        )
+    if not parts:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return pd.concat(parts, ignore_index=True).sort_values(
+        ["row", "constraint"], kind="stable", ignore_index=True
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check a product catalogue Parquet file against the data-quality constraints."
+    )
+    parser.add_argument("parquet", nargs="?", default="all_stm_products.parquet")
+    parser.add_argument("--output", help="Write the violations to this CSV")
+    args = parser.parse_args()
+
+    df = pd.read_parquet(args.parquet)
+    violations = check_constraints(df)
+    if args.output:
+        violations.to_csv(args.output, index=False, encoding="utf-8")
+    print(f"{len(df)} rows, {len(violations)} violations.")
+    if not violations.empty:
+        print(violations.to_string(index=False))
+        if (violations["severity"] == "error").any():
+            raise SystemExit(1)
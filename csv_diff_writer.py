@@ -0,0 +1,130 @@
+"""Minimal-diff CSV writer for the research CSV.
+
+The updated frame is compared cell by cell with the file on disk, rows matched by
+part_number. Unchanged rows are copied as their original text, changed rows keep the
+original text of every cell that did not change, so hand-entered formatting survives
+and a run that changes nothing leaves the file untouched.
+"""
+
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def cell_text(value):
+    """How a new value is written: no 'nan', no '.0' on whole numbers."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _same_number(old, new):
+    """'32' == '32.0' == '32.00'; text that is not a number never matches here."""
+    try:
+        return float(old) == float(new)
+    except ValueError:
+        return False
+
+
+def read_csv_records(csv_filepath):
+    """Header, parsed records and the original text of every record (with newline)."""
+    with open(csv_filepath, "r", encoding="utf-8", newline="") as f:
+        lines = f.readlines()
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    records, raw = [], []
+    start = reader.line_num
+    for record in reader:
+        records.append(record)
+        raw.append("".join(lines[start : reader.line_num]))
+        start = reader.line_num
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    return header, records, raw, newline
+
+
+def _row_keys(keys):
+    """part_number plus occurrence number, so duplicated part numbers still pair up."""
+    keys = pd.Series(keys, dtype=str)
+    return list(zip(keys, keys.groupby(keys).cumcount()))
+
+
+def write_csv_minimal_diff(df, csv_filepath, key="part_number"):
+    """Writes df to csv_filepath changing as little text as possible.
+
+    Returns (changed, added, removed) row counts. Falls back to a plain to_csv when
+    the file does not exist or its header differs from the frame's columns.
+    """
+    columns = [str(c) for c in df.columns]
+    if not os.path.exists(csv_filepath):
+        df.to_csv(csv_filepath, index=False, encoding="utf-8")
+        return 0, len(df), 0
+    header, records, raw, newline = read_csv_records(csv_filepath)
+    if header != columns:
+        print(f"Columns of '{csv_filepath}' changed, rewriting the whole file.")
+        df.to_csv(csv_filepath, index=False, encoding="utf-8")
+        return len(df), 0, 0
+
+    width = len(columns)
+    old_cells = np.array(
+        [(r + [""] * width)[:width] for r in records], dtype=object
+    ).reshape(len(records), width)
+    new_cells = np.array(
+        [[cell_text(v) for v in col] for col in df.itertuples(index=False, name=None)],
+        dtype=object,
+    ).reshape(len(df), width)
+
+    key_idx = columns.index(key)
+    old_pos = {k: i for i, k in enumerate(_row_keys(old_cells[:, key_idx]))}
+    new_keys = _row_keys(new_cells[:, key_idx])
+    matched_new = np.array([k in old_pos for k in new_keys], dtype=bool)
+    matched_old = np.array([old_pos.get(k, -1) for k in new_keys], dtype=np.int64)
+
+    # Cell comparison in one go for all matched rows; only unequal text gets the
+    # numeric check ("32" vs "32.0")
+    same = np.zeros(new_cells.shape, dtype=bool)
+    rows = np.flatnonzero(matched_new)
+    if len(rows):
+        aligned_old = old_cells[matched_old[rows]]
+        same[rows] = aligned_old == new_cells[rows]
+        for r, c in zip(*np.nonzero(~same[rows])):
+            if _same_number(aligned_old[r, c], new_cells[rows[r], c]):
+                same[rows[r], c] = True
+    row_unchanged = same.all(axis=1) & matched_new
+
+    removed = len(records) - len(set(matched_old[rows].tolist()))
+    changed = int((matched_new & ~row_unchanged).sum())
+    added = int((~matched_new).sum())
+    in_order = np.array_equal(matched_old[rows], np.arange(len(records))) and added == 0
+    if changed == 0 and removed == 0 and in_order:
+        return 0, 0, 0
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator=newline)
+    # The original header line is kept as is
+    with open(csv_filepath, "r", encoding="utf-8", newline="") as f:
+        pieces = [f.readline()]
+    for i in range(len(df)):
+        if row_unchanged[i]:
+            # Unchanged rows are not serialized again
+            text = raw[matched_old[i]]
+            pieces.append(text if text.endswith(("\n", "\r")) else text + newline)
+            continue
+        if matched_new[i]:
+            cells = np.where(same[i], old_cells[matched_old[i]], new_cells[i])
+        else:
+            cells = new_cells[i]
+        writer.writerow(list(cells))
+        pieces.append(out.getvalue())
+        out.seek(0)
+        out.truncate()
+
+    tmp_path = f"{csv_filepath}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write("".join(pieces))
+    os.replace(tmp_path, csv_filepath)
+    return changed, added, removed
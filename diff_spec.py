@@ -0,0 +1,107 @@
+"""Allowed differences between two versions of a chip JSON.
+
+A spec entry names a part of the document by a path pattern and the chips it applies
+to by a regex on the chip name:
+
+    ("l0_l1_eeprom", "memory[*][kind=eeprom]", r"STM32L[01].*")
+
+Path patterns are dict keys separated by dots and list positions in brackets:
+
+    name        the dict key "name"             *       any dict key
+    [3]         list element 3                  [*]     any list element
+    [key=value] any list element that is a dict with key == value (last segment only)
+
+The spec is compiled into a DeepDiff exclude_obj_callback, so matching subtrees are
+skipped during the comparison walk: nothing is copied and pruned parts are never
+hashed or diffed.
+"""
+
+import json
+import re
+
+# (name, path pattern, chip name regex)
+ALLOWED_DIFFERENCES = [
+    # The EEPROM regions of L0/L1 are what the w_eeprom generator adds; they are
+    # validated against the research CSV separately
+    ("l0_l1_eeprom", "memory[*][kind=eeprom]", r"STM32L[01].*"),
+]
+
+_SEGMENT = re.compile(r"\[([^\]]*)\]|\.?([^.\[\]]+)")
+
+
+def _parse_pattern(pattern):
+    """Path pattern -> (regex over DeepDiff paths, (key, value) predicate or None)."""
+    parts = ["root"]
+    predicate = None
+    pos = 0
+    while pos < len(pattern):
+        match = _SEGMENT.match(pattern, pos)
+        if not match:
+            raise ValueError(f"Bad path pattern {pattern!r} at position {pos}")
+        if predicate is not None:
+            raise ValueError(
+                f"Bad path pattern {pattern!r}: [key=value] is only allowed last"
+            )
+        index, key = match.groups()
+        if key is not None:
+            parts.append(r"\['[^']*'\]" if key == "*" else re.escape(f"['{key}']"))
+        elif index == "*":
+            parts.append(r"\[\d+\]")
+        elif index.isdigit():
+            parts.append(re.escape(f"[{index}]"))
+        elif "=" in index:
+            field, _, value = index.partition("=")
+            parts.append(r"\[\d+\]")
+            predicate = (field.strip(), value.strip())
+        else:
+            raise ValueError(f"Bad path pattern {pattern!r}: [{index}]")
+        pos = match.end()
+    return re.compile("".join(parts)), predicate
+
+
+def compile_spec(spec=ALLOWED_DIFFERENCES):
+    """[(name, path regex, predicate, chip regex)] for the spec entries."""
+    compiled = []
+    for name, pattern, chips in spec:
+        path_regex, predicate = _parse_pattern(pattern)
+        compiled.append((name, path_regex, predicate, re.compile(chips)))
+    return compiled
+
+
+def load_spec(path):
+    """Spec entries from a JSON list of {"name", "path", "chips"} objects."""
+    with open(path, "r") as f:
+        entries = json.load(f)
+    return [(entry["name"], entry["path"], entry["chips"]) for entry in entries]
+
+
+class DiffPruner:
+    """exclude_obj_callback for one chip; remembers which entries pruned something."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.hits = set()
+
+    def __call__(self, obj, path):
+        for name, path_regex, predicate, _ in self.rules:
+            if not path_regex.fullmatch(path):
+                continue
+            if predicate is not None:
+                field, value = predicate
+                if not (isinstance(obj, dict) and str(obj.get(field)) == value):
+                    continue
+            self.hits.add(name)
+            return True
+        return False
+
+    def keep(self, items, base_path):
+        """Items of the list at base_path that are not pruned (for rendering only)."""
+        return [
+            item for i, item in enumerate(items) if not self(item, f"{base_path}[{i}]")
+        ]
+
+
+def pruner_for(chip_name, compiled_spec):
+    """DiffPruner with the entries that apply to chip_name, None if there are none."""
+    rules = [rule for rule in compiled_spec if rule[3].fullmatch(chip_name)]
+    return DiffPruner(rules) if rules else None
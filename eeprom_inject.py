@@ -0,0 +1,208 @@
+"""EEPROM regions from the research CSV, written straight into stm32-data chip JSONs.
+
+Instead of editing the MEMS table, rebuilding stm32-data-gen and regenerating every
+chip, this copies the original chip JSON tree and adds the EEPROM regions of the
+research CSV to the L0/L1 chips, the way the EEPROM patch of memory.rs does:
+
+    one bank    {"name": "EEPROM", "kind": "eeprom", "address": ..., "size": ..., "access": rw}
+    two banks   EEPROM_BANK_1 and EEPROM_BANK_2 (or only EEPROM_BANK_2 when bank 1 is empty)
+
+The regions are appended to every memory layout of the chip, after any EEPROM
+regions already there are removed, so running it again gives the same files. Only
+L0/L1 files are rewritten; the other chips are copied when missing or changed. Files
+are processed on a thread pool and every file is written atomically.
+
+The output can be checked with json_check.py --w-eeprom-dir, or compared with the
+Rust-generated w_eeprom tree with --compare.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+# --- Configuration ---
+research_file_csv = "stm32_l0_l1_eeprom_research.csv"
+# Same directories as in json_check.py
+original_json_dir = Path("/home/okhsunrog/temp/generated_data/original/data/chips")
+w_eeprom_json_dir = Path("/home/okhsunrog/temp/generated_data/w_eeprom/data/chips")
+injected_json_dir = Path("/home/okhsunrog/temp/generated_data/py_eeprom/data/chips")
+
+EEPROM_ACCESS = {"read": True, "write": True, "execute": False}
+
+
+def is_l0_l1_chip(chip_name):
+    return chip_name.startswith(("STM32L0", "STM32L1"))
+
+
+def _region(name, address, size):
+    return {
+        "name": name,
+        "kind": "eeprom",
+        "address": int(address, 16),
+        "size": int(size),
+        "access": dict(EEPROM_ACCESS),
+    }
+
+
+def eeprom_regions(row):
+    """EEPROM regions of one research CSV row (a dict of strings)."""
+    bank1 = (row["eeprom_bank1_start_addr"], row["eeprom_bank1_size_b"])
+    bank2 = (row["eeprom_bank2_start_addr"], row["eeprom_bank2_size_b"])
+    if not all(bank2):
+        return [_region("EEPROM", *bank1)] if all(bank1) else []
+    regions = [_region("EEPROM_BANK_1", *bank1)] if all(bank1) else []
+    return regions + [_region("EEPROM_BANK_2", *bank2)]
+
+
+def load_eeprom_table(csv_filepath=research_file_csv):
+    """{part number: EEPROM regions} for the L0/L1 rows of the research CSV."""
+    df = pd.read_csv(csv_filepath, dtype=str, keep_default_na=False)
+    df["part_number"] = df["part_number"].str.strip()
+    df = df[df["part_number"].map(is_l0_l1_chip)]
+    return {row["part_number"]: eeprom_regions(row) for row in df.to_dict("records")}
+
+
+def inject(chip_data, regions):
+    """Chip data with the EEPROM regions of every memory layout replaced by regions."""
+    layouts = []
+    for layout in chip_data.get("memory", []):
+        kept = [
+            r for r in layout if not (isinstance(r, dict) and r.get("kind") == "eeprom")
+        ]
+        layouts.append(kept + [dict(region) for region in regions])
+    return {**chip_data, "memory": layouts}
+
+
+def write_text_atomic(path, text):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _up_to_date(src, dst):
+    if not dst.exists():
+        return False
+    a, b = src.stat(), dst.stat()
+    return a.st_size == b.st_size and int(a.st_mtime) == int(b.st_mtime)
+
+
+def process_file(src, dst, table):
+    """Writes one chip file of the output tree. Returns its status."""
+    chip_name = src.stem
+    regions = table.get(chip_name) if is_l0_l1_chip(chip_name) else None
+    if regions is None:
+        if _up_to_date(src, dst):
+            return "unchanged"
+        tmp_path = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+        # L0/L1 chips the research CSV does not know are copied as they are
+        return "not_in_csv" if is_l0_l1_chip(chip_name) else "copied"
+
+    text = src.read_text(encoding="utf-8")
+    data = inject(json.loads(text), regions)
+    new_text = json.dumps(data, indent=2) + ("\n" if text.endswith("\n") else "")
+    if dst.exists() and dst.read_text(encoding="utf-8") == new_text:
+        return "unchanged"
+    write_text_atomic(dst, new_text)
+    return "injected"
+
+
+def inject_tree(src_dir, dst_dir, table, max_workers=None):
+    """Writes the output tree. Returns ({status: count}, [(file, error)])."""
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    files = sorted(src_dir.glob("*.json"))
+    counts = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(process_file, src, dst_dir / src.name, table): src
+            for src in files
+        }
+        for future, src in futures.items():
+            try:
+                status = future.result()
+            except Exception as e:
+                errors.append((src.name, e))
+                continue
+            counts[status] = counts.get(status, 0) + 1
+    return counts, errors
+
+
+def _eeprom_of(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    return [
+        [r for r in layout if r.get("kind") == "eeprom"]
+        for layout in data.get("memory", [])
+    ]
+
+
+def compare_trees(dst_dir, reference_dir, chips):
+    """[(chip, message)] where the EEPROM regions differ from the reference tree."""
+    differences = []
+    for chip_name in chips:
+        ours = dst_dir / f"{chip_name}.json"
+        theirs = reference_dir / f"{chip_name}.json"
+        if not theirs.exists():
+            differences.append((chip_name, "missing in the reference tree"))
+            continue
+        a, b = _eeprom_of(ours), _eeprom_of(theirs)
+        if a != b:
+            differences.append((chip_name, f"injected {a} vs reference {b}"))
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the EEPROM regions of the research CSV into a copy of the original chip JSONs."
+    )
+    parser.add_argument("--csv", default=research_file_csv)
+    parser.add_argument("--source", type=Path, default=original_json_dir)
+    parser.add_argument("--output", type=Path, default=injected_json_dir)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        type=Path,
+        const=w_eeprom_json_dir,
+        metavar="REFERENCE_DIR",
+        help=f"Compare the EEPROM regions of the L0/L1 chips with a generated tree (default {w_eeprom_json_dir})",
+    )
+    args = parser.parse_args()
+
+    if not args.source.is_dir():
+        print(f"Error: source directory {args.source} not found.")
+        raise SystemExit(1)
+    if args.output.resolve() == args.source.resolve():
+        print("Error: the output directory must not be the source directory.")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    table = load_eeprom_table(args.csv)
+    counts, errors = inject_tree(args.source, args.output, table, args.workers)
+    summary = ", ".join(
+        f"{status}: {count}" for status, count in sorted(counts.items())
+    )
+    print(f"{args.output}: {summary} ({time.perf_counter() - start:.1f} s)")
+    for name, error in errors:
+        print(f"ERROR: {name}: {error}")
+
+    differences = []
+    if args.compare:
+        chips = sorted(p.stem for p in args.output.glob("*.json") if p.stem in table)
+        differences = compare_trees(args.output, args.compare, chips)
+        for chip_name, message in differences:
+            print(f"DIFF  {chip_name}: {message}")
+        print(
+            f"{len(chips) - len(differences)}/{len(chips)} L0/L1 chips have the same EEPROM as {args.compare}."
+        )
+
+    raise SystemExit(1 if errors or differences else 0)
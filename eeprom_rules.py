@@ -0,0 +1,197 @@
+"""Series line and EEPROM layout rules for the research CSV, as data.
+
+The rules are interpreted by the engines in engine.py, so the same table drives the
+pandas and the Arrow implementation of add_csv.py, fix_csv.py and update.py.
+
+Series line rules: {part number prefix: (labels by the two digits after the prefix,
+label when there are no two digits, label for unknown digits)}. "{digits}" in the
+unknown label is replaced by the digits.
+
+EEPROM rules: (name, conditions, assignments). All conditions of all rules are
+evaluated on the table as it was before any rule ran; assignments are then applied
+rule by rule, so a later rule wins where two rules match the same row.
+
+Conditions: (kind, column, value)
+    eq          column == value
+    gt          column > value
+    isin        column in value (list)
+    startswith  column starts with any of value (list)
+    not_rule    row is not matched by any of the named earlier rules (column is None)
+
+Assignments: (column, value); value is a string or ("format", template, column),
+where "{}" in the template is replaced by the column's value as an integer.
+"""
+
+EEPROM_BANK1_ADDR = "0x08080000"
+L0_EEPROM_BANK2_ADDR = "0x08080C00"
+L1_CAT4_EEPROM_BANK2_ADDR = "0x08081800"
+L1_CAT5_6_EEPROM_BANK2_ADDR = "0x08082000"
+
+_L0_LINES = {
+    "10": "L0x0",
+    **{d: "L0x1" for d in ["11", "21", "31", "41", "51", "61", "71", "81"]},
+    **{d: "L0x2" for d in ["52", "62", "72", "82"]},
+    **{d: "L0x3" for d in ["53", "63", "73", "83"]},
+}
+_L1_LINES = {d: f"L1{d}" for d in ["00", "51", "52", "62"]}
+
+# fix_csv.py: unknown L1 lines are flagged
+SERIES_LINE_RULES = {
+    "STM32L0": (_L0_LINES, "L0_Malformed_PN", "L0_Unknown_Digits"),
+    "STM32L1": (_L1_LINES, "L1_Malformed_PN", "L1_Unknown_Digits"),
+}
+# add_csv.py: unknown L1 lines keep their digits (L1XX)
+RESEARCH_SERIES_LINE_RULES = {
+    "STM32L0": (_L0_LINES, "L0_Malformed_PN", "L0_Unknown_Digits"),
+    "STM32L1": (_L1_LINES, "L1_Malformed_PN", "L1{digits}"),
+}
+
+# add_csv.py: L0/L1 parts with data EEPROM
+RESEARCH_FILTER = [
+    ("startswith", "part_number", ["STM32L0", "STM32L1"]),
+    ("gt", "data_e2prom_b", 0),
+]
+
+_NO_BANK2 = [("eeprom_bank2_start_addr", ""), ("eeprom_bank2_size_b", "")]
+
+
+def _single_bank(category, size):
+    return [
+        ("category_from_doc", category),
+        ("eeprom_bank1_start_addr", EEPROM_BANK1_ADDR),
+        ("eeprom_bank1_size_b", size),
+        ("eeprom_total_size_b_from_doc", size),
+    ] + _NO_BANK2
+
+
+def _two_banks(category, bank2_addr, bank_size, total):
+    return [
+        ("category_from_doc", category),
+        ("eeprom_bank1_start_addr", EEPROM_BANK1_ADDR),
+        ("eeprom_bank1_size_b", bank_size),
+        ("eeprom_bank2_start_addr", bank2_addr),
+        ("eeprom_bank2_size_b", bank_size),
+        ("eeprom_total_size_b_from_doc", total),
+    ]
+
+
+# fix_csv.py: L0x1 categories (RM0377)
+_L0X1 = ("eq", "series_line", "L0x1")
+L0X1_EEPROM_RULES = [
+    (
+        "l0x1_cat1",
+        [
+            _L0X1,
+            ("isin", "flash_size_kb_prog", [8, 16]),
+            ("eq", "total_eeprom_b_from_export", 512),
+        ],
+        _single_bank("Category 1", "512"),
+    ),
+    (
+        "l0x1_cat2",
+        [
+            _L0X1,
+            ("isin", "flash_size_kb_prog", [16, 32]),
+            ("eq", "total_eeprom_b_from_export", 1024),
+        ],
+        _single_bank("Category 2", "1024"),
+    ),
+    (
+        "l0x1_cat3",
+        [
+            _L0X1,
+            ("isin", "flash_size_kb_prog", [32, 64]),
+            ("eq", "total_eeprom_b_from_export", 2048),
+        ],
+        _single_bank("Category 3", "2048"),
+    ),
+    # 64 KB Flash: 3072 B of EEPROM in bank 2 only
+    (
+        "l0x1_cat5_64k",
+        [
+            _L0X1,
+            ("eq", "flash_size_kb_prog", 64),
+            ("eq", "total_eeprom_b_from_export", 3072),
+        ],
+        [
+            ("category_from_doc", "Category 5 (64K Flash)"),
+            ("eeprom_bank1_start_addr", ""),
+            ("eeprom_bank1_size_b", ""),
+            ("eeprom_bank2_start_addr", L0_EEPROM_BANK2_ADDR),
+            ("eeprom_bank2_size_b", "3072"),
+            ("eeprom_total_size_b_from_doc", "3072"),
+        ],
+    ),
+    # 128/192 KB Flash: 6144 B of EEPROM in two banks of 3072 B
+    (
+        "l0x1_cat5_large",
+        [
+            _L0X1,
+            ("isin", "flash_size_kb_prog", [128, 192]),
+            ("eq", "total_eeprom_b_from_export", 6144),
+        ],
+        _two_banks(
+            ("format", "Category 5 ({}K Flash)", "flash_size_kb_prog"),
+            L0_EEPROM_BANK2_ADDR,
+            "3072",
+            "6144",
+        ),
+    ),
+]
+
+# update.py: L1 categories (RM0038). STM32L100 is classified by RPN (Table 2), the
+# other lines by the EEPROM size from the product list.
+_L1 = ("startswith", "part_number", ["STM32L1"])
+_L100 = ("eq", "series_line", "L100")
+_NOT_L100 = ("not_rule", None, ["l100_cat1", "l100_cat2", "l100_cat3"])
+L1_EEPROM_RULES = [
+    (
+        "l100_cat1",
+        [
+            (
+                "startswith",
+                "part_number",
+                ["STM32L100C6", "STM32L100R8", "STM32L100RB"],
+            ),
+            _L100,
+        ],
+        _single_bank("Cat.1 (L100)", "4096"),
+    ),
+    (
+        "l100_cat2",
+        [
+            (
+                "startswith",
+                "part_number",
+                ["STM32L100C6-A", "STM32L100R8-A", "STM32L100RB-A"],
+            ),
+            _L100,
+        ],
+        _single_bank("Cat.2 (L100)", "4096"),
+    ),
+    (
+        "l100_cat3",
+        [("startswith", "part_number", ["STM32L100RC"]), _L100],
+        _single_bank("Cat.3 (L100)", "8192"),
+    ),
+    (
+        "l1_cat1_2",
+        [_L1, _NOT_L100, ("eq", "total_eeprom_b_from_export", 4096)],
+        _single_bank("Cat.1/Cat.2 (L1)", "4096"),
+    ),
+    (
+        "l1_cat3",
+        [_L1, _NOT_L100, ("eq", "total_eeprom_b_from_export", 8192)],
+        _single_bank("Cat.3 (L1)", "8192"),
+    ),
+    (
+        "l1_cat4",
+        [_L1, _NOT_L100, ("eq", "total_eeprom_b_from_export", 12288)],
+        _two_banks("Cat.4 (L1)", L1_CAT4_EEPROM_BANK2_ADDR, "6144", "12288"),
+    ),
+    (
+        "l1_cat5_6",
+        [_L1, _NOT_L100, ("eq", "total_eeprom_b_from_export", 16384)],
+        _two_banks("Cat.5/Cat.6 (L1)", L1_CAT5_6_EEPROM_BANK2_ADDR, "8192", "16384"),
+    ),
+]
@@ -0,0 +1,405 @@
+"""Dataframe engines for the research CSV stages.
+
+add_csv.py, fix_csv.py and update.py express their filters, series line derivation
+and EEPROM rules (eeprom_rules.py) against the small interface below. PandasEngine
+is the reference; ArrowEngine does the same with pyarrow.compute kernels, which run
+outside the GIL, so the rule conditions are evaluated on a thread pool.
+
+Parity is tested in tests/test_engine_parity.py, on small edge-case frames for
+every condition kind, rule feature and stage (python -m pytest). Running this
+module checks the stages on the checked-in files only:
+
+    python engine.py
+"""
+
+import argparse
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from csv_diff_writer import cell_text
+
+# What pd.read_csv treats as missing by default
+PANDAS_NA_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+NUMBER_PATTERN = r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$"
+
+
+def _split_template(template, placeholder):
+    """(prefix, suffix) around the placeholder, None if there is none."""
+    if placeholder not in template:
+        return None
+    prefix, _, suffix = template.partition(placeholder)
+    return prefix, suffix
+
+
+def _excluded_rules(conditions):
+    for kind, _, value in conditions:
+        if kind == "not_rule":
+            yield from value
+
+
+class PandasEngine:
+    name = "pandas"
+
+    # --- Input / output ---
+    def read_csv(self, path):
+        """All columns as strings, missing cells as ""."""
+        return pd.read_csv(path, dtype=str).fillna("")
+
+    def read_parquet(self, path):
+        return pd.read_parquet(path)
+
+    def to_pandas(self, table):
+        return table
+
+    def num_rows(self, table):
+        return len(table)
+
+    def column_names(self, table):
+        return list(table.columns)
+
+    def column_values(self, table, column):
+        return table[column].tolist()
+
+    def with_column(self, table, column, value):
+        table = table.copy()
+        table[column] = value
+        return table
+
+    # --- Transformations ---
+    def to_numeric(self, table, columns, as_int=False):
+        """Columns as numbers, anything that is not a number becomes 0."""
+        table = table.copy()
+        for col in columns:
+            values = pd.to_numeric(table[col], errors="coerce").fillna(0)
+            table[col] = values.astype(int) if as_int else values
+        return table
+
+    def _condition(self, table, kind, column, value):
+        if kind == "eq":
+            return table[column] == value
+        if kind == "gt":
+            return table[column] > value
+        if kind == "isin":
+            return table[column].isin(value)
+        if kind == "startswith":
+            return table[column].astype(str).str.startswith(tuple(value))
+        raise ValueError(f"Unknown condition kind: {kind}")
+
+    def _mask(self, table, conditions):
+        mask = pd.Series(True, index=table.index)
+        for kind, column, value in conditions:
+            if kind != "not_rule":
+                mask &= self._condition(table, kind, column, value)
+        return mask
+
+    def count_rows(self, table, conditions):
+        return int(self._mask(table, conditions).sum())
+
+    def filter_rows(self, table, conditions):
+        return table[self._mask(table, conditions)].copy()
+
+    def derive_series_line(self, table, rules, keep_unmatched=False):
+        """series_line from part_number; rows of other series keep their value when
+        keep_unmatched is set, otherwise they get "Unknown_Series"."""
+        pn = table["part_number"].astype(str)
+        if keep_unmatched and "series_line" in table.columns:
+            series = table["series_line"].copy()
+        else:
+            series = pd.Series("Unknown_Series", index=table.index, dtype=object)
+        for prefix, (lines, malformed, unknown) in rules.items():
+            has_prefix = pn.str.startswith(prefix)
+            digits = pn.str.extract(f"^{prefix}(\\d{{2}})", expand=False)
+            labels = digits.map(lines)
+            around = _split_template(unknown, "{digits}")
+            unknown_labels = around[0] + digits + around[1] if around else unknown
+            series = series.mask(has_prefix & digits.isna(), malformed)
+            series = series.mask(
+                has_prefix & digits.notna() & labels.isna(), unknown_labels
+            )
+            series = series.mask(has_prefix & labels.notna(), labels)
+        return self.with_column(table, "series_line", series)
+
+    def apply_rules(self, table, rules):
+        """Applies EEPROM rules. Returns (table, {rule name: matched rows})."""
+        table = table.copy()
+        masks = {}
+        for name, conditions, _ in rules:
+            mask = self._mask(table, conditions)
+            for excluded in _excluded_rules(conditions):
+                mask &= ~masks[excluded]
+            masks[name] = mask
+        for name, _, assignments in rules:
+            mask = masks[name]
+            for column, value in assignments:
+                if isinstance(value, tuple):
+                    _, template, source = value
+                    prefix, suffix = _split_template(template, "{}")
+                    numbers = table.loc[mask, source].astype(int).astype(str)
+                    value = prefix + numbers + suffix
+                table.loc[mask, column] = value
+        return table, {name: int(mask.sum()) for name, mask in masks.items()}
+
+
+class ArrowEngine:
+    name = "arrow"
+
+    def __init__(self, threads=None):
+        self.threads = threads or os.cpu_count() or 1
+
+    # --- Input / output ---
+    def read_csv(self, path):
+        """All columns as strings, missing cells as "" (same cells as pd.read_csv)."""
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            header = next(csv.reader(f), [])
+        table = pv.read_csv(
+            path,
+            convert_options=pv.ConvertOptions(
+                column_types={col: pa.string() for col in header},
+                null_values=PANDAS_NA_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        for i, col in enumerate(table.column_names):
+            table = table.set_column(i, col, pc.fill_null(table[col], ""))
+        return table
+
+    def read_parquet(self, path):
+        return pq.read_table(path)
+
+    def to_pandas(self, table):
+        return table.to_pandas()
+
+    def num_rows(self, table):
+        return table.num_rows
+
+    def column_names(self, table):
+        return table.column_names
+
+    def column_values(self, table, column):
+        return table[column].to_pylist()
+
+    def with_column(self, table, column, value):
+        if isinstance(value, str):
+            value = pa.array([value] * table.num_rows, pa.string())
+        if column in table.column_names:
+            return table.set_column(table.schema.get_field_index(column), column, value)
+        return table.append_column(column, value)
+
+    # --- Transformations ---
+    def _number(self, values, as_int):
+        if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+            trimmed = pc.utf8_trim_whitespace(values)
+            valid = pc.fill_null(
+                pc.match_substring_regex(trimmed, NUMBER_PATTERN), False
+            )
+            values = pc.cast(pc.if_else(valid, trimmed, None), pa.float64())
+        values = pc.fill_null(values, 0)
+        # astype(int) truncates, so the cast is not checked
+        return pc.cast(values, pa.int64(), safe=False) if as_int else values
+
+    def to_numeric(self, table, columns, as_int=False):
+        """Columns as numbers, anything that is not a number becomes 0."""
+        for col in columns:
+            table = self.with_column(table, col, self._number(table[col], as_int))
+        return table
+
+    def _condition(self, table, kind, column, value):
+        values = table[column]
+        if kind == "eq":
+            return pc.equal(values, value)
+        if kind == "gt":
+            return pc.greater(values, value)
+        if kind == "isin":
+            return pc.is_in(values, value_set=pa.array(value).cast(values.type))
+        if kind == "startswith":
+            if not pa.types.is_string(values.type):
+                values = pc.cast(values, pa.string())
+            masks = [pc.starts_with(values, pattern=prefix) for prefix in value]
+            mask = masks[0]
+            for other in masks[1:]:
+                mask = pc.or_(mask, other)
+            return mask
+        raise ValueError(f"Unknown condition kind: {kind}")
+
+    def _mask(self, table, conditions):
+        mask = pa.array([True] * table.num_rows, pa.bool_())
+        for kind, column, value in conditions:
+            if kind != "not_rule":
+                mask = pc.and_(mask, self._condition(table, kind, column, value))
+        return pc.fill_null(mask, False)
+
+    def count_rows(self, table, conditions):
+        return pc.sum(self._mask(table, conditions)).as_py() or 0
+
+    def filter_rows(self, table, conditions):
+        return table.filter(self._mask(table, conditions))
+
+    def derive_series_line(self, table, rules, keep_unmatched=False):
+        """series_line from part_number; rows of other series keep their value when
+        keep_unmatched is set, otherwise they get "Unknown_Series"."""
+        pn = table["part_number"]
+        if keep_unmatched and "series_line" in table.column_names:
+            series = table["series_line"]
+        else:
+            series = pa.array(["Unknown_Series"] * table.num_rows, pa.string())
+        for prefix, (lines, malformed, unknown) in rules.items():
+            has_prefix = pc.fill_null(pc.starts_with(pn, pattern=prefix), False)
+            digits = pc.struct_field(
+                pc.extract_regex(pn, f"^{prefix}(?P<digits>\\d{{2}})"), [0]
+            )
+            labels = pc.take(
+                pa.array(list(lines.values()), pa.string()),
+                pc.index_in(digits, value_set=pa.array(list(lines), pa.string())),
+            )
+            around = _split_template(unknown, "{digits}")
+            if around:
+                unknown_labels = pc.binary_join_element_wise(
+                    around[0], digits, around[1], ""
+                )
+            else:
+                unknown_labels = pa.scalar(unknown, pa.string())
+            has_digits = pc.is_valid(digits)
+            has_label = pc.is_valid(labels)
+            series = pc.if_else(
+                pc.and_(has_prefix, pc.invert(has_digits)), malformed, series
+            )
+            series = pc.if_else(
+                pc.and_(pc.and_(has_prefix, has_digits), pc.invert(has_label)),
+                unknown_labels,
+                series,
+            )
+            series = pc.if_else(pc.and_(has_prefix, has_label), labels, series)
+        return self.with_column(table, "series_line", series)
+
+    def apply_rules(self, table, rules):
+        """Applies EEPROM rules. Returns (table, {rule name: matched rows})."""
+        # The conditions only read the table as it was before the rules, so they
+        # are evaluated concurrently; the kernels release the GIL
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            base_masks = list(pool.map(lambda rule: self._mask(table, rule[1]), rules))
+        masks = {}
+        for (name, conditions, _), mask in zip(rules, base_masks):
+            for excluded in _excluded_rules(conditions):
+                mask = pc.and_(mask, pc.invert(masks[excluded]))
+            masks[name] = mask
+        for name, _, assignments in rules:
+            mask = masks[name]
+            for column, value in assignments:
+                if isinstance(value, tuple):
+                    _, template, source = value
+                    prefix, suffix = _split_template(template, "{}")
+                    numbers = pc.cast(
+                        pc.cast(table[source], pa.int64(), safe=False), pa.string()
+                    )
+                    value = pc.binary_join_element_wise(prefix, numbers, suffix, "")
+                else:
+                    value = pa.scalar(value, pa.string())
+                if column not in table.column_names:
+                    table = table.append_column(
+                        column, pa.nulls(table.num_rows, pa.string())
+                    )
+                table = self.with_column(
+                    table, column, pc.if_else(mask, value, table[column])
+                )
+        counts = {name: pc.sum(mask).as_py() or 0 for name, mask in masks.items()}
+        return table, counts
+
+
+ENGINES = {"pandas": PandasEngine, "arrow": ArrowEngine}
+
+
+def get_engine(name="pandas"):
+    return ENGINES[name]()
+
+
+def add_engine_argument(parser):
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        default="pandas",
+        help="Dataframe engine for filters and rules (default: pandas)",
+    )
+
+
+# --- Parity ---
+def compare_frames(expected, actual, limit=10):
+    """Cells that would be written differently, as (row, column, expected, actual)."""
+    if list(expected.columns) != list(actual.columns):
+        return [(-1, "columns", list(expected.columns), list(actual.columns))]
+    if len(expected) != len(actual):
+        return [(-1, "rows", len(expected), len(actual))]
+    differences = []
+    for col in expected.columns:
+        for row, (a, b) in enumerate(zip(expected[col], actual[col])):
+            if cell_text(a) != cell_text(b):
+                differences.append((row, col, cell_text(a), cell_text(b)))
+                if len(differences) >= limit:
+                    return differences
+    return differences
+
+
+def check_parity(research_csv, parquet):
+    """Runs every stage's transformation with each engine. Returns {stage: differences}."""
+    from add_csv import build_research_frame
+    from fix_csv import apply_fix_rules
+    from update import apply_l1_rules
+
+    stages = {
+        "add_csv": lambda engine: build_research_frame(engine, parquet),
+        "fix_csv": lambda engine: engine.to_pandas(
+            apply_fix_rules(engine, engine.read_csv(research_csv))[0]
+        ),
+        "update": lambda engine: engine.to_pandas(
+            apply_l1_rules(engine, engine.read_csv(research_csv))[0]
+        ),
+    }
+    results = {}
+    for stage, run in stages.items():
+        outputs = {name: run(get_engine(name)) for name in ENGINES}
+        results[stage] = compare_frames(outputs["pandas"], outputs["arrow"])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that the pandas and Arrow engines produce identical outputs."
+    )
+    parser.add_argument("--csv", default="stm32_l0_l1_eeprom_research.csv")
+    parser.add_argument("--parquet", default="all_stm_products.parquet")
+    args = parser.parse_args()
+
+    failed = False
+    for stage, differences in check_parity(args.csv, args.parquet).items():
+        print(f"{stage}: {'identical' if not differences else 'DIFFERENT'}")
+        for row, col, expected, actual in differences:
+            print(f"  row {row}, {col}: pandas {expected!r}, arrow {actual!r}")
+        failed |= bool(differences)
+    if failed:
+        raise SystemExit(1)
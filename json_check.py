@@ -1,5 +1,10 @@
+import argparse
+import hashlib
+import heapq
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
 import numpy as np
@@ -7,15 +12,21 @@ import pandas as pd
 import pyarrow.csv as pv
 from deepdiff import DeepDiff  # pip install deepdiff
 
+from catalog_diff import read_recheck_chips
+from diff_spec import ALLOWED_DIFFERENCES, compile_spec, load_spec, pruner_for
+
 # --- Configuration ---
 research_file_csv = "stm32_l0_l1_eeprom_research.csv"
 original_json_dir = Path("/home/okhsunrog/temp/generated_data/original/data/chips")
 w_eeprom_json_dir = Path("/home/okhsunrog/temp/generated_data/w_eeprom/data/chips")
+report_jsonl_file = "json_check_report.jsonl"
+matrix_csv_file = "json_check_matrix.csv"
 
-DEBUG_PRINT_ADDED_EEPROM = True  # <--- Set this to True to print EEPROM sections
-DEBUG_VERBOSE_JSON_DIFF = (
-    True  # <--- Set this for verbose DeepDiff output on structure mismatches
+REPORT_ADDED_EEPROM = (
+    True  # <--- Store the EEPROM sections of L0/L1 chips in the report
 )
+# Parts of the chip JSONs that may differ, see diff_spec.py
+default_allowed_differences = compile_spec(ALLOWED_DIFFERENCES)
 
 
 # --- Helper function to load CSV ---
@@ -28,19 +39,20 @@ def load_csv_pa_to_pd(filename):
         return pd.read_csv(filename, low_memory=False)
 
 
-# --- Load the research CSV ---
-print(f"Loading {research_file_csv}...")
-research_df = load_csv_pa_to_pd(research_file_csv)
-research_df["part_number"] = research_df["part_number"].str.strip()
-research_df["eeprom_total_size_b_from_doc"] = pd.to_numeric(
-    research_df["eeprom_total_size_b_from_doc"], errors="coerce"
-).astype("Int64")
-research_df["eeprom_bank1_size_b"] = pd.to_numeric(
-    research_df["eeprom_bank1_size_b"], errors="coerce"
-).astype("Int64")
-research_df["eeprom_bank2_size_b"] = pd.to_numeric(
-    research_df["eeprom_bank2_size_b"], errors="coerce"
-).astype("Int64")
+# --- Helper function to load the research CSV ---
+def load_research_df(filename):
+    research_df = load_csv_pa_to_pd(filename)
+    research_df["part_number"] = research_df["part_number"].str.strip()
+    research_df["eeprom_total_size_b_from_doc"] = pd.to_numeric(
+        research_df["eeprom_total_size_b_from_doc"], errors="coerce"
+    ).astype("Int64")
+    research_df["eeprom_bank1_size_b"] = pd.to_numeric(
+        research_df["eeprom_bank1_size_b"], errors="coerce"
+    ).astype("Int64")
+    research_df["eeprom_bank2_size_b"] = pd.to_numeric(
+        research_df["eeprom_bank2_size_b"], errors="coerce"
+    ).astype("Int64")
+    return research_df
 
 
 # --- Helper function to load a JSON file ---
@@ -72,282 +84,712 @@ def get_memory_regions_by_kind(chip_data, kind):
 
 
 # --- Helper function to compare two JSON objects ---
-def compare_json_objects_smart(obj1, obj2, chip_name, verbose_diff=False):
-    is_l0_l1_chip_local = chip_name.startswith("STM32L0") or chip_name.startswith(
-        "STM32L1"
+def compare_json_objects_smart(obj1, obj2, chip_name, allowed=None):
+    """Returns the DeepDiff of both objects (empty if they match) and the names of the
+    allowed differences that were skipped for this chip."""
+    pruner = pruner_for(chip_name, allowed or default_allowed_differences)
+    diff = DeepDiff(
+        obj1,
+        obj2,
+        ignore_order=True,
+        report_repetition=True,
+        # verbose_level=0 drops values_changed altogether, changed values would pass
+        verbose_level=1,
+        exclude_obj_callback=pruner,
     )
+    return diff, sorted(pruner.hits) if pruner else []
 
-    obj1_copy = json.loads(json.dumps(obj1))
-    obj2_copy = json.loads(json.dumps(obj2))
-
-    if is_l0_l1_chip_local:
-        # Remove EEPROM entries from 'memory' sections from BOTH copies
-        if "memory" in obj1_copy and isinstance(obj1_copy["memory"], list):
-            for bank_list_idx in range(len(obj1_copy["memory"])):
-                if isinstance(obj1_copy["memory"][bank_list_idx], list):
-                    obj1_copy["memory"][bank_list_idx] = [
-                        mem
-                        for mem in obj1_copy["memory"][bank_list_idx]
-                        if not (isinstance(mem, dict) and mem.get("kind") == "eeprom")
-                    ]
-        if "memory" in obj2_copy and isinstance(obj2_copy["memory"], list):
-            for bank_list_idx in range(len(obj2_copy["memory"])):
-                if isinstance(obj2_copy["memory"][bank_list_idx], list):
-                    obj2_copy["memory"][bank_list_idx] = [
-                        mem
-                        for mem in obj2_copy["memory"][bank_list_idx]
-                        if not (isinstance(mem, dict) and mem.get("kind") == "eeprom")
-                    ]
 
+# --- Human-readable diff, only rendered on demand (--explain) ---
+def render_structure_diff(obj1, obj2, chip_name, allowed=None):
+    pruner = pruner_for(chip_name, allowed or default_allowed_differences)
     diff = DeepDiff(
-        obj1_copy, obj2_copy, ignore_order=True, report_repetition=True, verbose_level=0
+        obj1,
+        obj2,
+        ignore_order=True,
+        report_repetition=True,
+        verbose_level=1,
+        exclude_obj_callback=pruner,
     )
-
-    if diff:
-        if verbose_diff:  # Controlled by DEBUG_VERBOSE_JSON_DIFF
-            print(
-                f"DEBUG: Detailed differences for {chip_name} (after removing EEPROM for L0/L1):"
+    if not diff:
+        return f"{chip_name}: JSON structures match (allowed differences excluded)."
+
+    lines = [f"Detailed differences for {chip_name} (allowed differences excluded):"]
+    is_mem0_diff = False
+    if (
+        "iterable_item_added" in diff
+        and "root['memory'][0]" in diff["iterable_item_added"]
+    ):
+        is_mem0_diff = True
+    if (
+        "iterable_item_removed" in diff
+        and "root['memory'][0]" in diff["iterable_item_removed"]
+    ):
+        is_mem0_diff = True
+
+    if (
+        is_mem0_diff
+        and obj1.get("memory")
+        and isinstance(obj1["memory"], list)
+        and len(obj1["memory"]) > 0
+        and isinstance(obj1["memory"][0], list)
+        and obj2.get("memory")
+        and isinstance(obj2["memory"], list)
+        and len(obj2["memory"]) > 0
+        and isinstance(obj2["memory"][0], list)
+    ):
+        lines.append("  Specific diff for root['memory'][0] (allowed parts excluded):")
+        mem0_obj1 = obj1["memory"][0]
+        mem0_obj2 = obj2["memory"][0]
+        if pruner:
+            mem0_obj1 = pruner.keep(mem0_obj1, "root['memory'][0]")
+            mem0_obj2 = pruner.keep(mem0_obj2, "root['memory'][0]")
+        try:
+            mem0_obj1_sorted = sorted(
+                mem0_obj1,
+                key=lambda x: x.get("name", "") if isinstance(x, dict) else "",
             )
-            is_mem0_diff = False
-            if (
-                "iterable_item_added" in diff
-                and "root['memory'][0]" in diff["iterable_item_added"]
-            ):
-                is_mem0_diff = True
-            if (
-                "iterable_item_removed" in diff
-                and "root['memory'][0]" in diff["iterable_item_removed"]
-            ):
-                is_mem0_diff = True
-
-            if (
-                is_mem0_diff
-                and obj1_copy.get("memory")
-                and isinstance(obj1_copy["memory"], list)
-                and len(obj1_copy["memory"]) > 0
-                and isinstance(obj1_copy["memory"][0], list)
-                and obj2_copy.get("memory")
-                and isinstance(obj2_copy["memory"], list)
-                and len(obj2_copy["memory"]) > 0
-                and isinstance(obj2_copy["memory"][0], list)
-            ):
-
-                print("  Specific diff for root['memory'][0] (non-EEPROM parts):")
-                mem0_obj1 = obj1_copy["memory"][0]
-                mem0_obj2 = obj2_copy["memory"][0]
-                try:
-                    mem0_obj1_sorted = sorted(
-                        mem0_obj1,
-                        key=lambda x: x.get("name", "") if isinstance(x, dict) else "",
-                    )
-                    mem0_obj2_sorted = sorted(
-                        mem0_obj2,
-                        key=lambda x: x.get("name", "") if isinstance(x, dict) else "",
-                    )
-                    item_diff = DeepDiff(
-                        mem0_obj1_sorted,
-                        mem0_obj2_sorted,
-                        ignore_order=False,
-                        report_repetition=True,
-                    )
-                    if item_diff:
-                        print(
-                            f"    Diff of non-EEPROM memory[0] (sorted by name): {item_diff.pretty()}"
-                        )
-                    else:
-                        print(
-                            f"    Non-EEPROM Memory[0] lists are semantically identical when sorted by name."
-                        )
-                except TypeError:
-                    print(
-                        f"    Could not sort memory[0] items by name for detailed diff."
-                    )
-                    print(
-                        f"    Original non-EEPROM memory[0]: {json.dumps(mem0_obj1, indent=2)}"
-                    )
-                    print(
-                        f"    W_EEPROM non-EEPROM memory[0]: {json.dumps(mem0_obj2, indent=2)}"
-                    )
+            mem0_obj2_sorted = sorted(
+                mem0_obj2,
+                key=lambda x: x.get("name", "") if isinstance(x, dict) else "",
+            )
+            item_diff = DeepDiff(
+                mem0_obj1_sorted,
+                mem0_obj2_sorted,
+                ignore_order=False,
+                report_repetition=True,
+            )
+            if item_diff:
+                lines.append(
+                    f"    Diff of memory[0] (sorted by name): {item_diff.pretty()}"
+                )
             else:
-                print(diff.pretty())
-        return False
-    return True
+                lines.append(
+                    "    Memory[0] lists are semantically identical when sorted by name."
+                )
+        except TypeError:
+            lines.append(
+                "    Could not sort memory[0] items by name for detailed diff."
+            )
+            lines.append(f"    Original memory[0]: {json.dumps(mem0_obj1, indent=2)}")
+            lines.append(f"    W_EEPROM memory[0]: {json.dumps(mem0_obj2, indent=2)}")
+    else:
+        lines.append(diff.pretty())
+    return "\n".join(lines)
 
 
-# --- Main Checking Logic ---
-print("\n--- Starting JSON Comparison and EEPROM Validation ---")
-overall_mismatches_found = False
-files_processed = 0
-l0_l1_chips_found_in_csv = set(
-    research_df[research_df["part_number"].str.startswith(("STM32L0", "STM32L1"))][
-        "part_number"
-    ]
-)
+# --- Structured report (one compact JSON record per chip) ---
+def add_issue(record, level, code, message):
+    record["issues"].append({"level": level, "code": code, "msg": message})
+    if level in ("error", "mismatch"):
+        record["ok"] = False
+
 
-for original_json_file in original_json_dir.glob("*.json"):
-    files_processed += 1
-    chip_name_from_filename = original_json_file.stem
+def write_report_record(report_file, record):
+    report_file.write(json.dumps(record, separators=(",", ":")) + "\n")
 
-    w_eeprom_json_file = w_eeprom_json_dir / original_json_file.name
 
-    original_data = load_json_file(original_json_file)
-    w_eeprom_data = load_json_file(w_eeprom_json_file)
+def read_report(report_path, with_headers=False):
+    with open(report_path, "r") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                # Shard reports start with a header record without a chip
+                if "chip" in record or with_headers:
+                    yield record
+
+
+# --- Per-chip checking logic ---
+def check_chip(original_json_file, w_eeprom_json_file, research_rows, allowed=None):
+    return check_chip_data(
+        original_json_file.stem,
+        load_json_file(original_json_file),
+        load_json_file(w_eeprom_json_file),
+        research_rows,
+        allowed,
+        original_json_file,
+        w_eeprom_json_file,
+    )
+
+
+def check_chip_data(
+    chip_name_from_filename,
+    original_data,
+    w_eeprom_data,
+    research_rows,
+    allowed=None,
+    original_json_file=None,
+    w_eeprom_json_file=None,
+    original_digests=None,
+):
+    """check_chip on loaded JSONs. With the canonical digests of the original, only
+    the top-level keys whose digests differ are diffed."""
+    record = {"chip": chip_name_from_filename, "ok": True, "issues": []}
 
     if original_data is None:
-        print(f"ERROR: Could not load original JSON: {original_json_file}")
-        overall_mismatches_found = True
-        continue
+        add_issue(
+            record,
+            "error",
+            "ERROR",
+            f"Could not load original JSON: {original_json_file}",
+        )
+        return record
 
     if w_eeprom_data is None:
-        print(
-            f"ERROR: Could not load w_eeprom JSON: {w_eeprom_json_file} (corresponding to {original_json_file.name})"
+        add_issue(
+            record,
+            "error",
+            "ERROR",
+            f"Could not load w_eeprom JSON: {w_eeprom_json_file} (corresponding to {original_json_file.name})",
         )
-        overall_mismatches_found = True
-        continue
+        return record
 
     is_l0_l1_chip = chip_name_from_filename.startswith(
         "STM32L0"
     ) or chip_name_from_filename.startswith("STM32L1")
 
     # 1. Compare JSONs (original vs. w_eeprom)
-    if not compare_json_objects_smart(
-        original_data,
-        w_eeprom_data,
-        chip_name_from_filename,
-        verbose_diff=DEBUG_VERBOSE_JSON_DIFF,
-    ):
-        # The MISMATCH_STRUCTURE message is now printed inside compare_json_objects_smart if verbose_diff is True
-        # or we can add a general one here if needed.
-        if (
-            not DEBUG_VERBOSE_JSON_DIFF
-        ):  # Print general message if detailed diff wasn't shown
-            print(
-                f"MISMATCH_STRUCTURE: Chip {chip_name_from_filename} - JSON structures differ (excluding EEPROM for L0/L1)."
-            )
-        overall_mismatches_found = True
+    obj1, obj2 = original_data, w_eeprom_data
+    if original_digests is not None:
+        w_eeprom_digests = canonical_digests(w_eeprom_data)
+        changed = {
+            key
+            for key in original_digests.keys() | w_eeprom_digests.keys()
+            if original_digests.get(key) != w_eeprom_digests.get(key)
+        }
+        # Paths stay rooted at the document, so the allowed differences still apply
+        obj1 = {k: v for k, v in original_data.items() if k in changed}
+        obj2 = {k: v for k, v in w_eeprom_data.items() if k in changed}
+    diff, pruned = compare_json_objects_smart(
+        obj1, obj2, chip_name_from_filename, allowed
+    )
+    if pruned:
+        record["allowed_differences"] = pruned
+    if diff:
+        # Only the cheap summary goes to the report; run with --explain for the full diff
+        record["diff_types"] = sorted(diff.keys())
+        record["diff_root_keys"] = sorted(str(k) for k in diff.affected_root_keys)
+        add_issue(
+            record,
+            "mismatch",
+            "MISMATCH_STRUCTURE",
+            f"Chip {chip_name_from_filename} - JSON structures differ (allowed differences excluded).",
+        )
     else:
         if not is_l0_l1_chip:
             eeprom_regions_w_eeprom = get_memory_regions_by_kind(
                 w_eeprom_data, "eeprom"
             )
             if eeprom_regions_w_eeprom:
-                print(
-                    f"MISMATCH_UNEXPECTED_EEPROM: Chip {chip_name_from_filename} (non-L0/L1) - has EEPROM in w_eeprom version."
+                add_issue(
+                    record,
+                    "mismatch",
+                    "MISMATCH_UNEXPECTED_EEPROM",
+                    f"Chip {chip_name_from_filename} (non-L0/L1) - has EEPROM in w_eeprom version.",
                 )
-                overall_mismatches_found = True
         else:
             eeprom_regions_original = get_memory_regions_by_kind(
                 original_data, "eeprom"
             )
             if eeprom_regions_original:
-                print(
-                    f"INFO: Chip {chip_name_from_filename} (L0/L1) - original JSON already contained EEPROM. This is unusual if your branch was meant to add it."
+                add_issue(
+                    record,
+                    "info",
+                    "INFO",
+                    f"Chip {chip_name_from_filename} (L0/L1) - original JSON already contained EEPROM. This is unusual if your branch was meant to add it.",
                 )
 
+    if not is_l0_l1_chip:
+        return record
+
     # 2. Validate EEPROM in `w_eeprom` JSONs against `research.csv` (for L0/L1 chips)
-    if is_l0_l1_chip:
-        json_eeprom_regions = get_memory_regions_by_kind(w_eeprom_data, "eeprom")
+    json_eeprom_regions = get_memory_regions_by_kind(w_eeprom_data, "eeprom")
+
+    if REPORT_ADDED_EEPROM and json_eeprom_regions:
+        record["eeprom"] = json_eeprom_regions
+
+    csv_row = research_rows.get(chip_name_from_filename)
+    if csv_row is None:
+        if json_eeprom_regions:  # If JSON has EEPROM but chip not in CSV
+            add_issue(
+                record,
+                "info",
+                "INFO",
+                f"Chip {chip_name_from_filename} (L0/L1) - Has EEPROM in JSON but not found in research CSV for validation.",
+            )
+        return record
+
+    csv_eeprom_total_b = csv_row["eeprom_total_size_b_from_doc"]
+    csv_eeprom_b1_size = csv_row["eeprom_bank1_size_b"]
+    csv_eeprom_b2_size = csv_row["eeprom_bank2_size_b"]
+
+    if not json_eeprom_regions:
+        if not pd.isna(csv_eeprom_total_b) and csv_eeprom_total_b > 0:
+            add_issue(
+                record,
+                "mismatch",
+                "MISMATCH_EEPROM_MISSING",
+                f"Chip {chip_name_from_filename} - Expected EEPROM size {csv_eeprom_total_b}B from CSV, but no EEPROM found in w_eeprom JSON.",
+            )
+        return record
 
-        if DEBUG_PRINT_ADDED_EEPROM and json_eeprom_regions:
-            print(
-                f"DEBUG_EEPROM_JSON ({chip_name_from_filename}): Found EEPROM sections in w_eeprom JSON:"
+    json_total_eeprom_b = sum(r.get("size", 0) for r in json_eeprom_regions)
+
+    if pd.isna(csv_eeprom_total_b):
+        if json_total_eeprom_b > 0:
+            add_issue(
+                record,
+                "mismatch",
+                "MISMATCH_EEPROM_UNEXPECTED_JSON",
+                f"Chip {chip_name_from_filename} - CSV has no EEPROM size, but JSON has {json_total_eeprom_b}B.",
             )
-            for region in json_eeprom_regions:
-                print(f"  - {json.dumps(region)}")
+    elif json_total_eeprom_b != csv_eeprom_total_b:
+        add_issue(
+            record,
+            "mismatch",
+            "MISMATCH_EEPROM_TOTAL_SIZE",
+            f"Chip {chip_name_from_filename} - Total EEPROM size mismatch. CSV: {csv_eeprom_total_b}B, JSON: {json_total_eeprom_b}B.",
+        )
 
-        if chip_name_from_filename not in l0_l1_chips_found_in_csv:
-            if json_eeprom_regions:  # If JSON has EEPROM but chip not in CSV
-                print(
-                    f"INFO: Chip {chip_name_from_filename} (L0/L1) - Has EEPROM in JSON but not found in research CSV for validation."
-                )
-        else:
-            csv_row_series = research_df[
-                research_df["part_number"] == chip_name_from_filename
-            ]
-            if csv_row_series.empty:
-                print(
-                    f"WARNING: Chip {chip_name_from_filename} was in l0_l1_chips_found_in_csv but no row found. Skipping CSV validation."
-                )
-                continue
-            csv_row = csv_row_series.iloc[0]
-
-            csv_eeprom_total_b = csv_row["eeprom_total_size_b_from_doc"]
-            csv_eeprom_b1_size = csv_row["eeprom_bank1_size_b"]
-            csv_eeprom_b2_size = csv_row["eeprom_bank2_size_b"]
-
-            if not json_eeprom_regions:
-                if not pd.isna(csv_eeprom_total_b) and csv_eeprom_total_b > 0:
-                    print(
-                        f"MISMATCH_EEPROM_MISSING: Chip {chip_name_from_filename} - Expected EEPROM size {csv_eeprom_total_b}B from CSV, but no EEPROM found in w_eeprom JSON."
-                    )
-                    overall_mismatches_found = True
-                continue
+    json_bank1_size = pd.NA
+    json_bank2_size = pd.NA
 
-            json_total_eeprom_b = sum(r.get("size", 0) for r in json_eeprom_regions)
-
-            if pd.isna(csv_eeprom_total_b):
-                if json_total_eeprom_b > 0:
-                    print(
-                        f"MISMATCH_EEPROM_UNEXPECTED_JSON: Chip {chip_name_from_filename} - CSV has no EEPROM size, but JSON has {json_total_eeprom_b}B."
-                    )
-                    overall_mismatches_found = True
-            elif json_total_eeprom_b != csv_eeprom_total_b:
-                print(
-                    f"MISMATCH_EEPROM_TOTAL_SIZE: Chip {chip_name_from_filename} - Total EEPROM size mismatch. CSV: {csv_eeprom_total_b}B, JSON: {json_total_eeprom_b}B."
-                )
+    temp_json_eeproms_by_name = {
+        r.get("name", f"UNNAMED_EEPROM_{i}").upper(): r.get("size", 0)
+        for i, r in enumerate(json_eeprom_regions)
+    }
+
+    if "EEPROM_BANK_1" in temp_json_eeproms_by_name:
+        json_bank1_size = temp_json_eeproms_by_name["EEPROM_BANK_1"]
+    elif "EEPROM" in temp_json_eeproms_by_name and (
+        "EEPROM_BANK_2" not in temp_json_eeproms_by_name
+        and len(json_eeprom_regions) == 1
+    ):
+        json_bank1_size = temp_json_eeproms_by_name["EEPROM"]
+
+    if "EEPROM_BANK_2" in temp_json_eeproms_by_name:
+        json_bank2_size = temp_json_eeproms_by_name["EEPROM_BANK_2"]
+
+    if not pd.isna(csv_eeprom_b1_size):
+        if pd.isna(json_bank1_size) or csv_eeprom_b1_size != json_bank1_size:
+            add_issue(
+                record,
+                "mismatch",
+                "MISMATCH_EEPROM_B1_SIZE",
+                f"Chip {chip_name_from_filename} - EEPROM Bank 1. CSV: {csv_eeprom_b1_size}B, JSON detected: {json_bank1_size}B.",
+            )
+    elif not pd.isna(json_bank1_size) and pd.isna(csv_eeprom_b1_size):
+        if not pd.isna(csv_eeprom_total_b) and csv_eeprom_total_b > 0:
+            add_issue(
+                record,
+                "info",
+                "INFO",
+                f"Chip {chip_name_from_filename} - JSON has EEPROM Bank 1 ({json_bank1_size}B), but CSV does not define Bank 1 size explicitly (Total: {csv_eeprom_total_b}B).",
+            )
+
+    if not pd.isna(csv_eeprom_b2_size):
+        if pd.isna(json_bank2_size) or csv_eeprom_b2_size != json_bank2_size:
+            add_issue(
+                record,
+                "mismatch",
+                "MISMATCH_EEPROM_B2_SIZE",
+                f"Chip {chip_name_from_filename} - EEPROM Bank 2. CSV: {csv_eeprom_b2_size}B, JSON detected: {json_bank2_size}B.",
+            )
+    elif not pd.isna(json_bank2_size) and pd.isna(csv_eeprom_b2_size):
+        if not pd.isna(csv_eeprom_total_b) and csv_eeprom_total_b > 0:
+            add_issue(
+                record,
+                "info",
+                "INFO",
+                f"Chip {chip_name_from_filename} - JSON has EEPROM Bank 2 ({json_bank2_size}B), but CSV does not define Bank 2 size explicitly (Total: {csv_eeprom_total_b}B).",
+            )
+
+    return record
+
+
+# --- Main Checking Logic ---
+def list_chip_files(chips=None):
+    """Original chip JSON files in a stable order, optionally limited to some chips."""
+    files = sorted(original_json_dir.glob("*.json"))
+    if chips is not None:
+        # Limited to the given chips, e.g. the ones changed in a catalogue release
+        files = [f for f in files if f.stem in chips]
+    return files
+
+
+# --- Sharding across CI nodes ---
+def parse_shard(value):
+    """'i/N' (1-based) -> (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got '{value}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 1..{count}")
+    return index, count
+
+
+def _stable_hash(name):
+    # Python's hash() is salted per process, every node has to agree on the order
+    return int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big")
+
+
+def assign_shards(files, shard_count):
+    """Splits files into shard_count lists of about equal total size.
+
+    Largest files first, each to the currently lightest shard; ties are broken by a
+    stable hash of the chip name and by shard index, so every node computes the
+    same assignment from the same file set.
+    """
+    sized = sorted(
+        ((os.path.getsize(f), f) for f in files),
+        key=lambda item: (-item[0], _stable_hash(item[1].stem)),
+    )
+    shards = [[] for _ in range(shard_count)]
+    loads = [(0, idx) for idx in range(shard_count)]
+    heapq.heapify(loads)
+    for size, json_file in sized:
+        load, idx = heapq.heappop(loads)
+        shards[idx].append(json_file)
+        heapq.heappush(loads, (load + size, idx))
+    return shards
+
+
+def shard_report_path(report_path, shard):
+    index, count = shard
+    path = Path(report_path)
+    return str(path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}"))
+
+
+def research_rows_of(research_df):
+    """{part number: research CSV row} of the L0/L1 parts."""
+    l0_l1_df = research_df[
+        research_df["part_number"].str.startswith(("STM32L0", "STM32L1"))
+    ].drop_duplicates(subset=["part_number"], keep="first")
+    return l0_l1_df.set_index("part_number").to_dict(orient="index")
+
+
+def run_checks(research_df, report_path, json_files, shard=None, allowed=None):
+    print("\n--- Starting JSON Comparison and EEPROM Validation ---")
+    overall_mismatches_found = False
+    files_processed = 0
+    research_rows = research_rows_of(research_df)
+
+    with open(report_path, "w") as report_file:
+        if shard is not None:
+            # Header record, lets the merge step see which shards are missing
+            write_report_record(
+                report_file,
+                {"shard": shard[0], "shards": shard[1], "chips": len(json_files)},
+            )
+        for original_json_file in json_files:
+            files_processed += 1
+            record = check_chip(
+                original_json_file,
+                w_eeprom_json_dir / original_json_file.name,
+                research_rows,
+                allowed,
+            )
+            write_report_record(report_file, record)
+            for issue in record["issues"]:
+                print(f"{issue['code']}: {issue['msg']}")
+            if not record["ok"]:
                 overall_mismatches_found = True
 
-            json_bank1_size = pd.NA
-            json_bank2_size = pd.NA
-
-            temp_json_eeproms_by_name = {
-                r.get("name", f"UNNAMED_EEPROM_{i}").upper(): r.get("size", 0)
-                for i, r in enumerate(json_eeprom_regions)
-            }
-
-            if "EEPROM_BANK_1" in temp_json_eeproms_by_name:
-                json_bank1_size = temp_json_eeproms_by_name["EEPROM_BANK_1"]
-            elif "EEPROM" in temp_json_eeproms_by_name and (
-                "EEPROM_BANK_2" not in temp_json_eeproms_by_name
-                and len(json_eeprom_regions) == 1
-            ):
-                json_bank1_size = temp_json_eeproms_by_name["EEPROM"]
-
-            if "EEPROM_BANK_2" in temp_json_eeproms_by_name:
-                json_bank2_size = temp_json_eeproms_by_name["EEPROM_BANK_2"]
-
-            if not pd.isna(csv_eeprom_b1_size):
-                if pd.isna(json_bank1_size) or csv_eeprom_b1_size != json_bank1_size:
-                    print(
-                        f"MISMATCH_EEPROM_B1_SIZE: Chip {chip_name_from_filename} - EEPROM Bank 1. CSV: {csv_eeprom_b1_size}B, JSON detected: {json_bank1_size}B."
-                    )
-                    overall_mismatches_found = True
-            elif not pd.isna(json_bank1_size) and pd.isna(csv_eeprom_b1_size):
-                if not pd.isna(csv_eeprom_total_b) and csv_eeprom_total_b > 0:
-                    print(
-                        f"INFO: Chip {chip_name_from_filename} - JSON has EEPROM Bank 1 ({json_bank1_size}B), but CSV does not define Bank 1 size explicitly (Total: {csv_eeprom_total_b}B)."
-                    )
-
-            if not pd.isna(csv_eeprom_b2_size):
-                if pd.isna(json_bank2_size) or csv_eeprom_b2_size != json_bank2_size:
-                    print(
-                        f"MISMATCH_EEPROM_B2_SIZE: Chip {chip_name_from_filename} - EEPROM Bank 2. CSV: {csv_eeprom_b2_size}B, JSON detected: {json_bank2_size}B."
-                    )
-                    overall_mismatches_found = True
-            elif not pd.isna(json_bank2_size) and pd.isna(csv_eeprom_b2_size):
-                if not pd.isna(csv_eeprom_total_b) and csv_eeprom_total_b > 0:
-                    print(
-                        f"INFO: Chip {chip_name_from_filename} - JSON has EEPROM Bank 2 ({json_bank2_size}B), but CSV does not define Bank 2 size explicitly (Total: {csv_eeprom_total_b}B)."
-                    )
-
-# --- Final Summary ---
-if files_processed == 0:
-    print("No JSON files found in the original directory to process.")
-elif not overall_mismatches_found:
-    print(
-        "\n--- All Checks Passed: JSON structures match (conditionally), and L0/L1 EEPROM data aligns with CSV. ---"
+    print(f"Report written to {report_path} ({files_processed} chips).")
+    return files_processed, overall_mismatches_found
+
+
+def merge_shard_reports(shard_paths, report_path):
+    """Combines shard reports into one report. Returns (chips, mismatches_found, problems)."""
+    problems = []
+    seen_shards = {}
+    records = {}
+    for shard_path in shard_paths:
+        header = None
+        chips_in_file = 0
+        for record in read_report(shard_path, with_headers=True):
+            if "shard" in record:
+                header = record
+                continue
+            chips_in_file += 1
+            if record["chip"] in records:
+                problems.append(f"{record['chip']} appears in more than one shard")
+            records[record["chip"]] = record
+        if header is None:
+            problems.append(f"{shard_path} has no shard header")
+            continue
+        if chips_in_file != header["chips"]:
+            problems.append(
+                f"{shard_path} is incomplete: {chips_in_file} of {header['chips']} chips"
+            )
+        seen_shards.setdefault(header["shards"], set()).add(header["shard"])
+
+    if len(seen_shards) > 1:
+        problems.append(f"Shard files of different splits: {sorted(seen_shards)}")
+    for count, indexes in seen_shards.items():
+        missing = sorted(set(range(1, count + 1)) - indexes)
+        if missing:
+            problems.append(f"Missing shards of {count}: {missing}")
+
+    mismatches_found = False
+    with open(report_path, "w") as report_file:
+        for chip in sorted(records):
+            record = records[chip]
+            write_report_record(report_file, record)
+            for issue in record["issues"]:
+                print(f"{issue['code']}: {issue['msg']}")
+            if not record["ok"]:
+                mismatches_found = True
+    print(f"Merged report written to {report_path} ({len(records)} chips).")
+    return len(records), mismatches_found, problems
+
+
+# --- N-way comparison: several candidate trees against one baseline ---
+def canonical_digests(data):
+    """{top-level key: digest of its canonical JSON}, equal digests mean equal values."""
+    return {
+        key: hashlib.sha1(
+            json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+        ).hexdigest()
+        for key, value in data.items()
+    }
+
+
+def load_baseline(json_files):
+    """{chip: (data, canonical digests, file)} of the original tree, loaded once."""
+    baseline = {}
+    for json_file in json_files:
+        data = load_json_file(json_file)
+        digests = canonical_digests(data) if data is not None else None
+        baseline[json_file.stem] = (data, digests, json_file)
+    return baseline
+
+
+# Set once per worker process by the pool initializer
+_nway_state = {}
+
+
+def _init_nway_worker(baseline, research_rows, allowed):
+    _nway_state.update(baseline=baseline, research_rows=research_rows, allowed=allowed)
+
+
+def _check_chip_nway(chip_name, candidate_dirs):
+    original_data, original_digests, original_json_file = _nway_state["baseline"][
+        chip_name
+    ]
+    records = []
+    for candidate_dir in candidate_dirs:
+        candidate_file = candidate_dir / original_json_file.name
+        records.append(
+            check_chip_data(
+                chip_name,
+                original_data,
+                load_json_file(candidate_file),
+                _nway_state["research_rows"],
+                _nway_state["allowed"],
+                original_json_file,
+                candidate_file,
+                original_digests,
+            )
+        )
+    return chip_name, records
+
+
+def verdict_of(record):
+    """ "ok", or the codes of the mismatches and errors of a chip record."""
+    codes = sorted(
+        {
+            issue["code"]
+            for issue in record["issues"]
+            if issue["level"] in ("error", "mismatch")
+        }
     )
-else:
-    print(
-        "\n--- Some Mismatches or Errors Encountered. Please review the output above. ---"
+    return "|".join(codes) if codes else "ok"
+
+
+def run_nway(
+    research_df, json_files, candidate_dirs, matrix_path, allowed=None, max_workers=None
+):
+    """Checks every candidate tree against the original tree. Returns the chip x
+    candidate verdict matrix, also written to matrix_path."""
+    print(f"Loading {len(json_files)} baseline chips from {original_json_dir}...")
+    baseline = load_baseline(json_files)
+    labels = [str(candidate_dir) for candidate_dir in candidate_dirs]
+    verdicts = {}
+    # The baseline is handed to every worker once, not with every chip
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_nway_worker,
+        initargs=(baseline, research_rows_of(research_df), allowed),
+    ) as pool:
+        for chip_name, records in pool.map(
+            _check_chip_nway,
+            sorted(baseline),
+            repeat(candidate_dirs),
+            chunksize=16,
+        ):
+            verdicts[chip_name] = [verdict_of(record) for record in records]
+
+    matrix = pd.DataFrame.from_dict(verdicts, orient="index", columns=labels)
+    matrix.index.name = "chip"
+    matrix.to_csv(matrix_path)
+    print(f"Verdict matrix written to {matrix_path} ({len(matrix)} chips).")
+    return matrix
+
+
+def print_nway_summary(matrix, limit=20):
+    for label in matrix.columns:
+        ok = int((matrix[label] == "ok").sum())
+        print(f"{label}: {ok}/{len(matrix)} ok")
+    # Chips the candidates do not agree on are the interesting ones
+    split = matrix[matrix.nunique(axis=1) > 1]
+    if len(split):
+        print(f"\nChips with different verdicts across candidates: {len(split)}")
+        print(split.head(limit).to_string())
+        if len(split) > limit:
+            print(f"... (+{len(split) - limit})")
+
+
+def print_summary(files_processed, overall_mismatches_found):
+    if files_processed == 0:
+        print("No JSON files found in the original directory to process.")
+    elif not overall_mismatches_found:
+        print(
+            "\n--- All Checks Passed: JSON structures match (conditionally), and L0/L1 EEPROM data aligns with CSV. ---"
+        )
+    else:
+        print(
+            "\n--- Some Mismatches or Errors Encountered. Please review the output above. ---"
+        )
+        print(
+            "--- Run `python json_check.py --explain CHIP ...` for the detailed diff of a chip. ---"
+        )
+
+
+def explain_chips(chip_names, allowed=None):
+    for chip_name in chip_names:
+        original_data = load_json_file(original_json_dir / f"{chip_name}.json")
+        w_eeprom_data = load_json_file(w_eeprom_json_dir / f"{chip_name}.json")
+        if original_data is None or w_eeprom_data is None:
+            print(f"ERROR: Could not load both JSON files for {chip_name}.")
+            continue
+        print(render_structure_diff(original_data, w_eeprom_data, chip_name, allowed))
+        if REPORT_ADDED_EEPROM:
+            for region in get_memory_regions_by_kind(w_eeprom_data, "eeprom"):
+                print(f"  - {json.dumps(region)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare original and w_eeprom chip JSONs and validate L0/L1 EEPROM against the research CSV."
+    )
+    parser.add_argument(
+        "--report", default=report_jsonl_file, help="JSONL file for per-chip results"
+    )
+    parser.add_argument(
+        "--explain",
+        nargs="+",
+        metavar="CHIP",
+        help="Print the detailed diff for the given chips instead of running the check",
+    )
+    parser.add_argument(
+        "--chips-from",
+        metavar="CHANGES_JSONL",
+        help="Only check chips added or changed in a catalog_diff.py change set",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="i/N",
+        help="Only check shard i of N (balanced by file size), writing a per-shard report",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="SHARD_REPORT",
+        help="Merge shard reports into --report and exit with the overall status",
+    )
+    parser.add_argument(
+        "--allowed-differences",
+        metavar="SPEC_JSON",
+        help='More allowed differences, a JSON list of {"name", "path", "chips"}',
+    )
+    parser.add_argument(
+        "--candidates",
+        nargs="+",
+        type=Path,
+        metavar="DIR",
+        help="Check several generated chip trees against the original tree at once",
+    )
+    parser.add_argument(
+        "--matrix",
+        default=matrix_csv_file,
+        help="CSV for the chip x candidate verdicts of --candidates",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes for --candidates"
     )
+    parser.add_argument(
+        "--w-eeprom-dir",
+        type=Path,
+        help="Chip JSONs to check instead of the w_eeprom tree (e.g. eeprom_inject.py output)",
+    )
+    args = parser.parse_args()
+
+    if args.w_eeprom_dir:
+        w_eeprom_json_dir = args.w_eeprom_dir
+
+    allowed = default_allowed_differences
+    if args.allowed_differences:
+        allowed = compile_spec(
+            ALLOWED_DIFFERENCES + load_spec(args.allowed_differences)
+        )
+
+    if args.explain:
+        explain_chips(args.explain, allowed)
+        raise SystemExit(0)
+
+    if args.merge:
+        files_processed, overall_mismatches_found, problems = merge_shard_reports(
+            args.merge, args.report
+        )
+        for problem in problems:
+            print(f"SHARD_ERROR: {problem}")
+        print_summary(files_processed, overall_mismatches_found)
+        raise SystemExit(1 if overall_mismatches_found or problems else 0)
+
+    # --- Load the research CSV ---
+    print(f"Loading {research_file_csv}...")
+    research_df = load_research_df(research_file_csv)
+
+    chips = None
+    if args.chips_from:
+        chips = read_recheck_chips(args.chips_from)
+        print(f"Checking {len(chips)} chips from {args.chips_from}.")
+
+    json_files = list_chip_files(chips)
+    if args.candidates:
+        matrix = run_nway(
+            research_df,
+            json_files,
+            args.candidates,
+            args.matrix,
+            allowed,
+            args.workers,
+        )
+        print_nway_summary(matrix)
+        raise SystemExit(0 if (matrix == "ok").all(axis=None) else 1)
+
+    report_path = args.report
+    if args.shard:
+        json_files = assign_shards(json_files, args.shard[1])[args.shard[0] - 1]
+        report_path = shard_report_path(args.report, args.shard)
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: {len(json_files)} chips.")
+
+    files_processed, overall_mismatches_found = run_checks(
+        research_df, report_path, json_files, args.shard, allowed
+    )
+
+    # --- Final Summary ---
+    print_summary(files_processed, overall_mismatches_found)
@@ -1,4 +1,37 @@
 import pandas as pd
+import pyarrow.parquet as pq
+
+
+def _prefix_upper_bound(prefix):
+    """
+    Наименьшая строка, большая всех строк с данным префиксом ("STM32L0" -> "STM32L1").
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def find_part(parquet_filepath, part_number, columns=None):
+    """
+    Возвращает строки с данным part_number. Фильтр передается в pyarrow, и по
+    статистике row group (min/max part_number) читается только та row group, где
+    может быть этот номер. Page index pq.read_table не использует.
+    """
+    table = pq.read_table(parquet_filepath, columns=columns, filters=[('part_number', '==', part_number)])
+    return table.to_pandas()
+
+
+def find_family(parquet_filepath, prefix, columns=None):
+    """
+    Возвращает все продукты, чей part_number начинается с prefix (семейство "STM32L0",
+    серия "STM32L05" и т.п.). Каталог отсортирован по part_number, так что это
+    непрерывный диапазон номеров.
+    """
+    table = pq.read_table(
+        parquet_filepath,
+        columns=columns,
+        filters=[('part_number', '>=', prefix), ('part_number', '<', _prefix_upper_bound(prefix))],
+    )
+    return table.to_pandas()
+
 
 def print_all_part_numbers_from_parquet(parquet_filepath):
     """
@@ -1,118 +1,405 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import argparse
+import os
 import pprint
 import glob # Для поиска файлов по шаблону
+import tempfile
 
-def parse_csv_product_list(filepath):
+from constraints import PRODUCT_CONSTRAINTS, VIOLATION_COLUMNS, check_constraints
+from pn_search import index_path_for, update_index
+
+# Параметры раскладки Parquet для выборочного чтения.
+# Строки отсортированы по part_number: префикс номера задаёт семейство и серию
+# (STM32L0 < STM32L1, STM32L010 < STM32L011), поэтому одна сортировка группирует и их.
+PARQUET_ROW_GROUP_SIZE = 1024  # строк в row group: семейство попадает в одну-две группы
+# Маленькие страницы -> точнее page index для читателей, которые его используют;
+# pq.read_table с фильтром отсекает только row group по статистике
+PARQUET_DATA_PAGE_SIZE = 8 * 1024
+
+# Потоковая загрузка: CSV читается пакетами, пиковая память ограничена пакетом,
+# а не размером выгрузки или самой большой корзиной сортировки (серией)
+CSV_BATCH_SIZE = 50_000
+SORT_BUCKET_PREFIX_LEN = 9  # "STM32L010": корзина = серия
+ROW_COLUMN = '__row'  # номер строки в выгрузке, для отчета о нарушениях
+
+def clean_column_names(columns, filepath, verbose=True):
     """
-    Парсит данные о продуктах из CSV файла с учетом специфической структуры заголовков.
+    Имена столбцов CSV с учетом специфической структуры заголовков: {исходное: новое}.
+    verbose=False - без сообщений о переименованиях (второй проход по тем же файлам).
     """
+    # Начальная очистка имен столбцов (snake_case, удаление спецсимволов)
+    cleaned_column_names = {}
+    for original_col_name in columns:
+        new_name = str(original_col_name).strip().lower()
+        new_name = new_name.replace(' ', '_').replace('-', '_')
+        new_name = new_name.replace('(', '').replace(')', '').replace('/', '_').replace('.', '_') # . -> _
+        new_name = new_name.replace('@', 'at') # Заменяем @
+        new_name = new_name.replace('µ', 'u')  # Заменяем µ на u
+        new_name = new_name.replace('°', 'deg') # Заменяем ° на deg
+
+        # Убираем суффиксы _typ, _nom
+        if new_name.endswith('_typ'):
+            new_name = new_name[:-4]
+        if new_name.endswith('_nom'):
+            new_name = new_name[:-4]
+
+        # Столбцы "unnamed_X" переименовываются ниже по контексту
+        cleaned_column_names[original_col_name] = new_name
+
+    # Теперь более точное переименование столбцов, которые могли стать "unnamed_X"
+    # или для которых нужно объединить информацию из многоуровневого заголовка
+
+    # Для "A/D Converters 12-bit" и следующего за ним (бывший "Number of Channels typ")
+    target_base_col_adc = 'a_d_converters_12_bit'
+    columns_list = list(cleaned_column_names)
+    names_list = list(cleaned_column_names.values())
+
     try:
-        df = pd.read_csv(filepath, header=0, skiprows=[1])
-        df = df.fillna('') # Заменяем NaN на пустые строки для консистентности
-
-        # Начальная очистка имен столбцов (snake_case, удаление спецсимволов)
-        cleaned_column_names = {}
-        for original_col_name in df.columns:
-            new_name = str(original_col_name).strip().lower()
-            new_name = new_name.replace(' ', '_').replace('-', '_')
-            new_name = new_name.replace('(', '').replace(')', '').replace('/', '_').replace('.', '_') # . -> _
-            new_name = new_name.replace('@', 'at') # Заменяем @
-            new_name = new_name.replace('µ', 'u')  # Заменяем µ на u
-            new_name = new_name.replace('°', 'deg') # Заменяем ° на deg
-            
-            # Убираем суффиксы _typ, _nom
-            if new_name.endswith('_typ'):
-                new_name = new_name[:-4]
-            if new_name.endswith('_nom'):
-                new_name = new_name[:-4]
-            
-            # Убираем суффиксы типа _1, _2 от pandas для дублирующихся "Unnamed" столбцов
-            # Это более общая очистка для "unnamed_X"
-            if new_name.startswith("unnamed_") and new_name.split('_')[-1].isdigit():
-                 # Мы оставим этот столбец пока с таким именем, переименуем его ниже более точно
-                 pass # Пока не трогаем, разберемся ниже по контексту
-            
-            cleaned_column_names[original_col_name] = new_name
-        
-        df.rename(columns=cleaned_column_names, inplace=True)
-
-        # Теперь более точное переименование столбцов, которые могли стать "unnamed_X"
-        # или для которых нужно объединить информацию из многоуровневого заголовка
-        
-        # Для "A/D Converters 12-bit" и следующего за ним (бывший "Number of Channels typ")
-        target_base_col_adc = 'a_d_converters_12_bit'
-        columns_list = list(df.columns)
-        
-        try:
-            idx_adc_base = columns_list.index(target_base_col_adc)
-            # Следующий столбец должен быть "Number of Channels typ"
-            if idx_adc_base + 1 < len(columns_list):
-                col_for_channels_original_name_in_df = columns_list[idx_adc_base + 1]
-                # Переименовываем его в любом случае, если он следует за target_base_col_adc
-                df.rename(columns={col_for_channels_original_name_in_df: target_base_col_adc + '_number_of_channels'}, inplace=True)
-                print(f"Столбец '{col_for_channels_original_name_in_df}' переименован в '{target_base_col_adc}_number_of_channels'.")
-                # Столбец target_base_col_adc (бывший "A/D Converters 12-bit") переименуем в "a_d_converters_12_bit_converters"
-                df.rename(columns={target_base_col_adc: target_base_col_adc + '_converters'}, inplace=True)
+        idx_adc_base = names_list.index(target_base_col_adc)
+        # Следующий столбец должен быть "Number of Channels typ"
+        if idx_adc_base + 1 < len(columns_list):
+            col_for_channels = columns_list[idx_adc_base + 1]
+            # Переименовываем его в любом случае, если он следует за target_base_col_adc
+            if verbose:
+                print(f"Столбец '{cleaned_column_names[col_for_channels]}' переименован в '{target_base_col_adc}_number_of_channels'.")
+            cleaned_column_names[col_for_channels] = target_base_col_adc + '_number_of_channels'
+            # Столбец target_base_col_adc (бывший "A/D Converters 12-bit") переименуем в "a_d_converters_12_bit_converters"
+            cleaned_column_names[columns_list[idx_adc_base]] = target_base_col_adc + '_converters'
+            if verbose:
                 print(f"Столбец '{target_base_col_adc}' переименован в '{target_base_col_adc}_converters'.")
 
-        except ValueError:
+    except ValueError:
+        if verbose:
             print(f"Предупреждение: Не удалось найти базовый столбец '{target_base_col_adc}' для переименования столбцов A/D конвертера в файле {filepath}.")
-        except IndexError:
-            print(f"Предупреждение: Недостаточно столбцов после '{target_base_col_adc}' для переименования каналов A/D в файле {filepath}.")
 
+    return cleaned_column_names
 
-        products_data = df.to_dict(orient='records')
-        return products_data
 
-    except FileNotFoundError:
-        print(f"Ошибка: Файл не найден по пути: {filepath}")
-        return []
-    except Exception as e:
-        print(f"Ошибка при парсинге CSV файла {filepath}: {e}")
-        return []
+def iter_product_batches(filepath, batch_size=CSV_BATCH_SIZE, verbose=True):
+    """
+    Читает CSV файл пакетами по batch_size строк. Значения остаются строками
+    (пустые -> ''), типы столбцов определяются по всему каталогу (infer_column_types).
+    """
+    header = pd.read_csv(filepath, header=0, skiprows=[1], nrows=0).columns
+    renames = clean_column_names(header, filepath, verbose)
+    reader = pd.read_csv(filepath, header=0, skiprows=[1], dtype=str, chunksize=batch_size)
+    for batch in reader:
+        batch = batch.fillna('') # Заменяем NaN на пустые строки для консистентности
+        yield batch.rename(columns=renames)
+
+
+def infer_column_types(csv_files, batch_size=CSV_BATCH_SIZE):
+    """
+    Первый проход: порядок столбцов всего каталога и их типы.
+
+    Столбец числовой, если числом является каждое значение во всех файлах (как
+    pd.to_numeric по всему столбцу); целый, если к тому же нет пустых значений и
+    столбец есть во всех файлах. Возвращает (столбцы, {столбец: dtype}, {файл: строк}).
+    """
+    columns = {}  # столбец -> [числовой, целый]
+    rows_per_file = {}
+    for csv_file_path in csv_files:
+        print(f"\n--- Обработка файла: {csv_file_path} ---")
+        rows = 0
+        file_columns = set()
+        try:
+            for batch in iter_product_batches(csv_file_path, batch_size):
+                rows += len(batch)
+                for col in batch.columns:
+                    file_columns.add(col)
+                    state = columns.setdefault(col, [True, True])
+                    if not state[0]:
+                        continue
+                    try:
+                        values = pd.to_numeric(batch[col])
+                    except (ValueError, TypeError):
+                        state[0] = False
+                        continue
+                    if values.dtype.kind != 'i':
+                        state[1] = False
+        except FileNotFoundError:
+            print(f"Ошибка: Файл не найден по пути: {csv_file_path}")
+            continue
+        except Exception as e:
+            print(f"Ошибка при парсинге CSV файла {csv_file_path}: {e}")
+            continue
+        if rows == 0:
+            print(f"Не удалось извлечь данные из файла: {csv_file_path}")
+            continue
+        # Столбец, которого нет в части файлов, получит там NaN
+        for col, state in columns.items():
+            if col not in file_columns:
+                state[1] = False
+        rows_per_file[csv_file_path] = rows
+        print(f"Из файла '{csv_file_path}' извлечено записей: {rows}")
+
+    dtypes = {
+        col: ('int64' if is_int else 'float64') if is_numeric else 'object'
+        for col, (is_numeric, is_int) in columns.items()
+    }
+    return list(columns), dtypes, rows_per_file
+
+
+def convert_batch(batch, columns, dtypes):
+    """
+    Пакет строк -> столбцы каталога в порядке columns с типами dtypes.
+    """
+    batch = batch.reindex(columns=columns)
+    for col in columns:
+        if dtypes[col] != 'object':
+            batch[col] = pd.to_numeric(batch[col]).astype(dtypes[col])
+    return batch
+
+
+def _schema_for(columns, dtypes):
+    # Схема (и метаданные pandas) такие же, как у pa.Table.from_pandas всего каталога
+    prototype = pd.DataFrame({
+        col: pd.Series(['']) if dtypes[col] == 'object' else pd.Series([0], dtype=dtypes[col])
+        for col in columns
+    })
+    return pa.Schema.from_pandas(prototype, preserve_index=False)
+
+
+def _parquet_writer_options(schema):
+    return dict(
+        data_page_size=PARQUET_DATA_PAGE_SIZE,
+        write_statistics=True,
+        write_page_index=True,
+        sorting_columns=[pq.SortingColumn(schema.get_field_index('part_number'))],
+    )
+
+
+def write_products_parquet(df, parquet_output_path, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Записывает каталог, отсортированный по part_number, со статистикой столбцов:
+    по ней поиск по номеру или по семейству читает одну row group. Page index
+    пишется для читателей, которые умеют по нему отсекать страницы.
+    """
+    df = df.sort_values('part_number', kind='stable').reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        parquet_output_path,
+        row_group_size=row_group_size,
+        **_parquet_writer_options(table.schema),
+    )
+
+
+def _bucket_key(part_numbers):
+    # Префиксы одной длины упорядочены так же, как сами номера, поэтому корзины,
+    # отсортированные каждая отдельно и записанные по порядку, дают общую сортировку
+    return part_numbers.astype(str).str[:SORT_BUCKET_PREFIX_LEN]
+
+
+def _sort_by_part_number(df):
+    # Внутри корзины номера строк выгрузки возрастают, поэтому стабильная сортировка
+    # по part_number - это сортировка по (part_number, номер строки)
+    return df.sort_values(['part_number', ROW_COLUMN], kind='stable')
+
+
+def _read_runs(spill_path, run_lengths):
+    """
+    Итераторы по отсортированным сериям корзины: каждая серия записана подряд
+    идущими row group, читаются они по одной.
+    """
+    spill = pq.ParquetFile(spill_path)
+    row_groups = iter(range(spill.num_row_groups))
+    runs = []
+    for length in run_lengths:
+        groups = []
+        while length > 0:
+            i = next(row_groups)
+            groups.append(i)
+            length -= spill.metadata.row_group(i).num_rows
+        runs.append(spill.read_row_group(i).to_pandas() for i in groups)
+    return runs
+
+
+def merge_runs(runs):
+    """
+    Слияние отсортированных серий по (part_number, номер строки) кусками: в памяти
+    по одной row group от каждой серии. Выдает отсортированные куски корзины.
+    """
+    pending = []  # прочитанные, но еще не выданные строки
+    tails = {}  # серия -> номер строки последней прочитанной строки, пока серия не кончилась
+    to_read = list(range(len(runs)))
+    while True:
+        for i in to_read:
+            frame = next(runs[i], None)
+            if frame is None:
+                tails.pop(i, None)
+            else:
+                pending.append(frame)
+                tails[i] = frame[ROW_COLUMN].iat[-1]
+        if not pending:
+            return
+        merged = _sort_by_part_number(pd.concat(pending, ignore_index=True))
+        if not tails:
+            yield merged
+            return
+        # Все, что не больше последней прочитанной строки каждой серии, уже на месте
+        position = pd.Series(np.arange(len(merged)), index=merged[ROW_COLUMN].to_numpy())
+        cut = min(position[row] for row in tails.values()) + 1
+        yield merged.iloc[:cut]
+        pending = [merged.iloc[cut:]] if cut < len(merged) else []
+        # Серии, выданные до последней прочитанной строки, читают следующую row group
+        to_read = [i for i, row in tails.items() if position[row] < cut]
+
+
+def _global_rows(found, rows):
+    # Номера строк куска -> номера строк всего каталога
+    found['row'] = np.where(found['row'] >= 0, rows[found['row'].clip(lower=0)], -1)
+    return found
+
+
+def ingest_products(csv_files, parquet_output_path, batch_size=CSV_BATCH_SIZE,
+                    row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Потоковая загрузка выгрузок ST в Parquet с пиковой памятью порядка пакета.
+
+    1. Проход по CSV пакетами: порядок и типы столбцов всего каталога.
+    2. Второй проход: пакеты приводятся к этим типам, построчные ограничения
+       проверяются сразу, а строки пакета раскладываются по корзинам (префикс
+       part_number, т.е. серия): каждая корзина - один временный Parquet файл, куда
+       пакет дописывает свою отсортированную серию мелкими row group.
+    3. Корзины по порядку: слияние серий (merge_runs), проверка уникальности
+       part_number на слитом потоке и дозапись в ParquetWriter row group за row group.
+
+    Серий в корзине не больше, чем пакетов, а row group серии - пакет, деленный на
+    число пакетов, так что при слиянии в памяти не больше одного пакета строк, как
+    бы ни была велика корзина. Результат совпадает с write_products_parquet для
+    всего каталога; файл заменяется, только если нет ошибок. Возвращает (строк,
+    нарушения).
+    """
+    columns, dtypes, rows_per_file = infer_column_types(csv_files, batch_size)
+    total_rows = sum(rows_per_file.values())
+    if total_rows == 0:
+        return 0, pd.DataFrame(columns=VIOLATION_COLUMNS)
+    print(f"\n--- Всего собрано записей о продуктах: {total_rows} ---")
+
+    batch_count = sum(-(-rows // batch_size) for rows in rows_per_file.values())
+    run_group_size = max(1, batch_size // batch_count)
+    row_constraints = [c for c in PRODUCT_CONSTRAINTS if c[1] != 'unique']
+    unique_constraints = [c for c in PRODUCT_CONSTRAINTS if c[1] == 'unique']
+
+    schema = _schema_for(columns, dtypes)
+    spill_schema = schema.append(pa.field(ROW_COLUMN, pa.int64()))
+    violations = []
+    tmp_path = f"{parquet_output_path}.tmp"
+    try:
+        with tempfile.TemporaryDirectory(prefix='products_') as spill_dir:
+            buckets = {}  # префикс -> (ParquetWriter корзины, ее файл, длины серий)
+            row_offset = 0
+            try:
+                for csv_file_path in rows_per_file:
+                    for batch in iter_product_batches(csv_file_path, batch_size, verbose=False):
+                        batch = convert_batch(batch, columns, dtypes)
+                        if row_offset == 0:
+                            print("\nДанные первых 2 продуктов (из общего списка):")
+                            pprint.pprint(batch.head(2).to_dict(orient='records'))
+                        rows = np.arange(row_offset, row_offset + len(batch))
+                        row_offset += len(batch)
+                        found = check_constraints(batch, row_constraints)
+                        if not found.empty:
+                            violations.append(_global_rows(found, rows))
+                        batch[ROW_COLUMN] = rows
+                        for key, group in batch.groupby(_bucket_key(batch['part_number']), sort=False):
+                            if key not in buckets:
+                                path = os.path.join(spill_dir, f"bucket-{len(buckets)}.parquet")
+                                buckets[key] = (pq.ParquetWriter(path, spill_schema), path, [])
+                            writer, _, run_lengths = buckets[key]
+                            group = _sort_by_part_number(group)
+                            writer.write_table(
+                                pa.Table.from_pandas(group, schema=spill_schema, preserve_index=False),
+                                row_group_size=run_group_size,
+                            )
+                            run_lengths.append(len(group))
+            finally:
+                for writer, _, _ in buckets.values():
+                    writer.close()
+
+            pending = []
+            with pq.ParquetWriter(tmp_path, schema, **_parquet_writer_options(schema)) as writer:
+                for key in sorted(buckets):
+                    _, spill_path, run_lengths = buckets[key]
+                    previous = None  # последняя строка предыдущего куска корзины
+                    for chunk in merge_runs(_read_runs(spill_path, run_lengths)):
+                        # Дубликат может быть первым в куске: к куску добавляется
+                        # предыдущая строка, ее собственные нарушения отбрасываются
+                        checked = chunk if previous is None else pd.concat([previous, chunk])
+                        found = check_constraints(checked, unique_constraints)
+                        if previous is not None:
+                            found = found[found['row'] != 0].assign(row=lambda f: f['row'] - 1)
+                        if not found.empty:
+                            violations.append(_global_rows(found, chunk[ROW_COLUMN].to_numpy()))
+                        previous = chunk.iloc[-1:]
+                        pending.append(pa.Table.from_pandas(
+                            chunk.drop(columns=[ROW_COLUMN]), schema=schema, preserve_index=False))
+                        # Row group пишется целиком, как в pq.write_table
+                        table = pa.concat_tables(pending)
+                        while len(table) >= row_group_size:
+                            writer.write_table(table.slice(0, row_group_size), row_group_size=row_group_size)
+                            table = table.slice(row_group_size)
+                        pending = [table]
+                table = pa.concat_tables(pending)
+                if len(table):
+                    writer.write_table(table, row_group_size=row_group_size)
+
+        violations = (
+            pd.concat(violations, ignore_index=True)
+            # Отсутствующий столбец находится в каждом пакете, сообщаем о нем один раз
+            .drop_duplicates(subset=['row', 'constraint', 'values'])
+            .sort_values(['row', 'constraint'], kind='stable', ignore_index=True)
+            if violations else pd.DataFrame(columns=VIOLATION_COLUMNS)
+        )
+        if not (violations['severity'] == 'error').any():
+            os.replace(tmp_path, parquet_output_path)
+    finally:
+        # При ошибках (в данных или при записи) старый Parquet файл остается как был
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return total_rows, violations
+
 
 # --- Основное выполнение ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Собирает выгрузки ST ProductsList_L*.csv в один Parquet файл.")
+    parser.add_argument('--batch-size', type=int, default=CSV_BATCH_SIZE,
+                        help="Строк в пакете при чтении CSV (ограничивает пиковую память)")
+    args = parser.parse_args()
+
     # Ищем все CSV файлы, начинающиеся с "ProductsList_L"
     csv_files = glob.glob("ProductsList_L*.csv")
-    
+
     if not csv_files:
         print("Не найдены CSV файлы по шаблону 'ProductsList_L*.csv'")
     else:
         print(f"Найдены следующие CSV файлы для обработки: {csv_files}")
 
-    all_products_data = []
-    for csv_file_path in csv_files:
-        print(f"\n--- Обработка файла: {csv_file_path} ---")
-        product_data_from_file = parse_csv_product_list(csv_file_path)
-        if product_data_from_file:
-            print(f"Из файла '{csv_file_path}' извлечено записей: {len(product_data_from_file)}")
-            all_products_data.extend(product_data_from_file)
-        else:
-            print(f"Не удалось извлечь данные из файла: {csv_file_path}")
-
-    if all_products_data:
-        print(f"\n--- Всего собрано записей о продуктах: {len(all_products_data)} ---")
-
-        if len(all_products_data) > 0:
-            print("\nДанные первых 2 продуктов (из общего списка):")
-            pprint.pprint(all_products_data[:2])
+    parquet_output_path = "all_stm_products.parquet"
+    try:
+        total_rows, violations = ingest_products(csv_files, parquet_output_path, args.batch_size)
+    except Exception as e:
+        print(f"Ошибка при сохранении в Parquet файл: {e}")
+        raise SystemExit(1)
 
-            # Создаем Pandas DataFrame из общего списка словарей
-            final_df = pd.DataFrame(all_products_data)
-            
-            # Проверим типы данных и попытаемся преобразовать строки в числа, где это возможно
-            # Это важно для корректной записи в Parquet и для дальнейшего анализа
-            for col in final_df.columns:
-                # Попытка преобразовать в числовой тип, если это возможно
-                # errors='ignore' оставит столбец как есть, если преобразование не удалось
-                final_df[col] = pd.to_numeric(final_df[col], errors='ignore')
+    if total_rows:
+        # Проверка качества данных перед записью: ошибки в выгрузке ST не должны
+        # молча попасть в Parquet
+        if not violations.empty:
+            print(f"\nНарушения ограничений качества данных ({len(violations)}):")
+            print(violations.to_string(index=False))
+        if (violations['severity'] == 'error').any():
+            print("\nParquet файл не записан: исправьте ошибки в исходных CSV файлах.")
+            raise SystemExit(1)
 
-            parquet_output_path = "all_stm_products.parquet"
-            try:
-                final_df.to_parquet(parquet_output_path, engine='pyarrow', index=False)
-                print(f"\nВсе данные успешно сохранены в Parquet файл: {parquet_output_path}")
-            except Exception as e:
-                print(f"Ошибка при сохранении в Parquet файл: {e}")
+        print(f"\nВсе данные успешно сохранены в Parquet файл: {parquet_output_path}")
+        # Индекс поиска по part_number: n-граммы считаются только для новых номеров
+        index, added, rebuilt = update_index(parquet_output_path)
+        state = "построен заново" if rebuilt else f"обновлен, новых номеров: {added}"
+        print(f"Индекс поиска {index_path_for(parquet_output_path)} {state}.")
     else:
         print("\nНе удалось собрать данные ни из одного файла.")
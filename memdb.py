@@ -0,0 +1,224 @@
+"""Compact binary part -> memory layout database.
+
+File layout (all little-endian):
+
+    header   HEADER_DTYPE, one record
+    parts    PART_DTYPE[n_parts], sorted by part name
+    regions  REGION_DTYPE[n_regions], grouped by part in the same order, by address
+
+Each part points at its slice of the region table. Both tables are fixed-size
+records, so a reader maps the file and views them as NumPy structured arrays
+without parsing or copying anything. tests/test_memdb.py checks the round trip
+against the research CSV.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from memmap_check import (
+    research_file_csv,
+    regions_from_chip_json_dir,
+    regions_from_research_csv,
+)
+
+# --- Configuration ---
+memdb_file = "stm32_memory_layout.bin"
+
+MAGIC = b"STMMEMDB"
+FORMAT_VERSION = 1
+
+NAME_LEN = 24
+KIND_CODES = {"flash": 1, "ram": 2, "eeprom": 3}
+KIND_NAMES = {code: kind for kind, code in KIND_CODES.items()}
+KIND_OTHER = 0
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("n_parts", "<u4"),
+        ("n_regions", "<u4"),
+        ("parts_offset", "<u4"),
+        ("regions_offset", "<u4"),
+        ("reserved", "<u4"),
+    ]
+)
+PART_DTYPE = np.dtype(
+    [
+        ("part", f"S{NAME_LEN}"),
+        ("first_region", "<u4"),
+        ("n_regions", "<u4"),
+    ]
+)
+REGION_DTYPE = np.dtype(
+    [
+        ("name", f"S{NAME_LEN}"),
+        ("kind", "<u4"),
+        ("reserved", "<u4"),
+        ("address", "<u8"),
+        ("size", "<u8"),
+    ]
+)
+
+
+# --- Writing ---
+def _encode_names(values, what):
+    encoded = values.astype(str).str.encode("ascii")
+    too_long = encoded.str.len() > NAME_LEN
+    if too_long.any():
+        raise ValueError(
+            f"{what} longer than {NAME_LEN} bytes: {', '.join(values[too_long].head(5))}"
+        )
+    return encoded.to_numpy(dtype=f"S{NAME_LEN}")
+
+
+def build_tables(regions):
+    """Turns a flat (chip, name, kind, address, size) table into the part and region arrays."""
+    regions = regions.sort_values(["chip", "address", "name"], kind="stable")
+    regions = regions.reset_index(drop=True)
+
+    region_table = np.zeros(len(regions), dtype=REGION_DTYPE)
+    region_table["name"] = _encode_names(regions["name"], "Region names")
+    region_table["kind"] = (
+        regions["kind"].map(KIND_CODES).fillna(KIND_OTHER).astype("uint32").to_numpy()
+    )
+    region_table["address"] = regions["address"].to_numpy(dtype="uint64")
+    region_table["size"] = regions["size"].to_numpy(dtype="uint64")
+
+    # Regions are sorted by chip, so every chip is one contiguous run
+    chips, first, counts = np.unique(
+        regions["chip"].to_numpy(dtype=str), return_index=True, return_counts=True
+    )
+    part_table = np.zeros(len(chips), dtype=PART_DTYPE)
+    part_table["part"] = _encode_names(pd.Series(chips), "Part names")
+    part_table["first_region"] = first
+    part_table["n_regions"] = counts
+    return part_table, region_table
+
+
+def write_memdb(regions, path):
+    part_table, region_table = build_tables(regions)
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = FORMAT_VERSION
+    header["n_parts"] = len(part_table)
+    header["n_regions"] = len(region_table)
+    header["parts_offset"] = HEADER_DTYPE.itemsize
+    header["regions_offset"] = HEADER_DTYPE.itemsize + part_table.nbytes
+
+    with open(path, "wb") as f:
+        f.write(header.tobytes())
+        f.write(part_table.tobytes())
+        f.write(region_table.tobytes())
+    return len(part_table), len(region_table)
+
+
+# --- Reading ---
+class MemDB:
+    """Read-only view of a memory layout database, mapped from disk.
+
+    The OS page cache is shared, so any number of processes can open the same file
+    without each holding a copy of it.
+    """
+
+    def __init__(self, path=memdb_file):
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        header = self._mm[: HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a memory layout database")
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has format version {header['version']}, expected {FORMAT_VERSION}"
+            )
+        self.parts = self._table(
+            header["parts_offset"], int(header["n_parts"]), PART_DTYPE
+        )
+        self.regions = self._table(
+            header["regions_offset"], int(header["n_regions"]), REGION_DTYPE
+        )
+
+    def _table(self, offset, count, dtype):
+        start = int(offset)
+        return self._mm[start : start + count * dtype.itemsize].view(dtype)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def __contains__(self, part):
+        return self._find(part) is not None
+
+    def part_names(self):
+        return [p.decode("ascii") for p in self.parts["part"]]
+
+    def _find(self, part):
+        key = part.encode("ascii")
+        idx = int(np.searchsorted(self.parts["part"], key))
+        if idx < len(self.parts) and self.parts["part"][idx] == key:
+            return idx
+        return None
+
+    def lookup(self, part):
+        """Regions of a part as a structured array view (no copy), or None if unknown."""
+        idx = self._find(part)
+        if idx is None:
+            return None
+        first = int(self.parts["first_region"][idx])
+        return self.regions[first : first + int(self.parts["n_regions"][idx])]
+
+    def lookup_dicts(self, part):
+        """Regions of a part as plain dicts, in the column order of memmap_check."""
+        regions = self.lookup(part)
+        if regions is None:
+            return None
+        return [
+            {
+                "name": r["name"].decode("ascii"),
+                "kind": KIND_NAMES.get(int(r["kind"]), "other"),
+                "address": int(r["address"]),
+                "size": int(r["size"]),
+            }
+            for r in regions
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export per-part memory layouts to a memory-mappable binary file."
+    )
+    parser.add_argument("--csv", default=research_file_csv, help="Research CSV")
+    parser.add_argument(
+        "--json-dir",
+        help="Take layouts from stm32-data chip JSON files instead of the research CSV",
+    )
+    parser.add_argument("--output", default=memdb_file, help="Binary output file")
+    parser.add_argument(
+        "--lookup", nargs="+", metavar="PART", help="Print the layout of these parts"
+    )
+    args = parser.parse_args()
+
+    if args.lookup:
+        db = MemDB(args.output)
+        for part in args.lookup:
+            regions = db.lookup_dicts(part)
+            if regions is None:
+                print(f"{part}: not found")
+                continue
+            print(f"{part}:")
+            for region in regions:
+                print(
+                    f"  {region['name']:<16} {region['kind']:<7} 0x{region['address']:08X} {region['size']:>8}"
+                )
+        raise SystemExit(0)
+
+    if args.json_dir:
+        print(f"Loading memory regions from {args.json_dir}...")
+        regions = regions_from_chip_json_dir(args.json_dir)
+    else:
+        print(f"Loading memory regions from {args.csv}...")
+        regions = regions_from_research_csv(args.csv)
+
+    n_parts, n_regions = write_memdb(regions, args.output)
+    print(f"Wrote {n_parts} parts and {n_regions} regions to {args.output}.")
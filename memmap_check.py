@@ -0,0 +1,276 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+research_file_csv = "stm32_l0_l1_eeprom_research.csv"
+
+FLASH_BASE_ADDR = 0x08000000
+SRAM_BASE_ADDR = 0x20000000
+
+# Chips are swept together in one sorted array; every chip gets its own
+# address window of this size so that regions of different chips never interact.
+CHIP_ADDR_WINDOW = 1 << 33
+
+REGION_COLUMNS = ["chip", "name", "kind", "address", "size"]
+
+
+# --- Loading memory regions ---
+def regions_from_research_csv(csv_path):
+    """Builds a flat region table (chip, name, kind, address, size) from the research CSV.
+
+    Flash and SRAM are placed at their usual L0/L1 base addresses with the sizes from
+    the product export; EEPROM banks are taken as written in the CSV.
+    """
+    df = pd.read_csv(csv_path, dtype=str).fillna("")
+    df["part_number"] = df["part_number"].str.strip()
+
+    def _kb(col):
+        return pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64") * 1024
+
+    def _int(col):
+        return pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+
+    def _addr(col):
+        return df[col].map(lambda v: int(v, 16) if v else 0).astype("int64")
+
+    parts = [
+        pd.DataFrame(
+            {
+                "chip": df["part_number"],
+                "name": "BANK_1",
+                "kind": "flash",
+                "address": FLASH_BASE_ADDR,
+                "size": _kb("flash_size_kb_prog"),
+            }
+        ),
+        pd.DataFrame(
+            {
+                "chip": df["part_number"],
+                "name": "SRAM",
+                "kind": "ram",
+                "address": SRAM_BASE_ADDR,
+                "size": _kb("ram_size_kb"),
+            }
+        ),
+    ]
+    for bank in (1, 2):
+        parts.append(
+            pd.DataFrame(
+                {
+                    "chip": df["part_number"],
+                    "name": f"EEPROM_BANK_{bank}",
+                    "kind": "eeprom",
+                    "address": _addr(f"eeprom_bank{bank}_start_addr"),
+                    "size": _int(f"eeprom_bank{bank}_size_b"),
+                }
+            )
+        )
+
+    regions = pd.concat(parts, ignore_index=True)
+    # Empty banks (no address or no size in the CSV) are not regions
+    return regions[(regions["size"] > 0) & (regions["address"] > 0)].reset_index(
+        drop=True
+    )
+
+
+def regions_from_chip_json_dir(json_dir):
+    """Builds the same flat region table from stm32-data chip JSON files.
+
+    A chip with several memory layouts (``memory`` is a list of lists) gets one
+    pseudo-chip per layout, named ``CHIP#<layout index>``.
+    """
+    chips, names, kinds, addresses, sizes = [], [], [], [], []
+    for json_file in sorted(Path(json_dir).glob("*.json")):
+        try:
+            with open(json_file, "r") as f:
+                chip_data = json.load(f)
+        except Exception as e:
+            print(f"Warning: Error reading JSON file {json_file}: {e}")
+            continue
+
+        memory = chip_data.get("memory")
+        if not isinstance(memory, list):
+            continue
+        for layout_idx, layout in enumerate(memory):
+            if not isinstance(layout, list):
+                continue
+            chip = json_file.stem if len(memory) == 1 else f"{json_file.stem}#{layout_idx}"
+            for region in layout:
+                if not isinstance(region, dict):
+                    continue
+                chips.append(chip)
+                names.append(region.get("name", ""))
+                kinds.append(region.get("kind", ""))
+                addresses.append(region.get("address", 0))
+                sizes.append(region.get("size", 0))
+
+    return pd.DataFrame(
+        {
+            "chip": chips,
+            "name": names,
+            "kind": kinds,
+            "address": np.asarray(addresses, dtype="int64"),
+            "size": np.asarray(sizes, dtype="int64"),
+        },
+        columns=REGION_COLUMNS,
+    )
+
+
+# --- Sorted-interval sweeps ---
+def _sweep(group_ids, starts, ends):
+    """One sweep over intervals sorted by (group, start).
+
+    Returns, for every interval, the largest end seen so far in its group before it
+    and the index of the interval that reached it (-1 for the first of a group).
+    """
+    offset = group_ids.astype("int64") * CHIP_ADDR_WINDOW
+    shifted_ends = ends + offset
+    running_max = np.maximum.accumulate(shifted_ends)
+    idx = np.arange(len(ends))
+    running_arg = np.maximum.accumulate(np.where(shifted_ends == running_max, idx, 0))
+
+    prev_max_end = np.empty_like(running_max)
+    prev_arg = np.empty_like(running_arg)
+    if len(ends):
+        prev_max_end[0] = -1
+        prev_arg[0] = -1
+        prev_max_end[1:] = running_max[:-1]
+        prev_arg[1:] = running_arg[:-1]
+
+    first_of_group = np.ones(len(ends), dtype=bool)
+    first_of_group[1:] = group_ids[1:] != group_ids[:-1]
+    prev_max_end = np.where(first_of_group, -1, prev_max_end - offset)
+    prev_arg = np.where(first_of_group, -1, prev_arg)
+    return prev_max_end, prev_arg
+
+
+def find_overlaps(regions):
+    """Regions of the same chip that share at least one address."""
+    regions = regions.sort_values(["chip", "address", "size"], kind="stable")
+    regions = regions.reset_index(drop=True)
+    starts = regions["address"].to_numpy(dtype="int64")
+    ends = starts + regions["size"].to_numpy(dtype="int64")
+    group_ids = pd.factorize(regions["chip"])[0]
+
+    prev_max_end, prev_arg = _sweep(group_ids, starts, ends)
+    hit = (prev_arg >= 0) & (starts < prev_max_end)
+
+    other = regions.iloc[prev_arg[hit]].reset_index(drop=True)
+    this = regions[hit].reset_index(drop=True)
+    return pd.DataFrame(
+        {
+            "chip": this["chip"],
+            "region": this["name"],
+            "region_start": this["address"],
+            "region_end": this["address"] + this["size"],
+            "overlaps": other["name"],
+            "overlaps_start": other["address"],
+            "overlaps_end": other["address"] + other["size"],
+        }
+    )
+
+
+def find_gaps(regions, kinds=("flash", "eeprom")):
+    """Holes between consecutive regions of the same kind (e.g. EEPROM bank 1 and bank 2)."""
+    regions = regions[regions["kind"].isin(kinds)]
+    regions = regions.sort_values(["chip", "kind", "address"], kind="stable")
+    regions = regions.reset_index(drop=True)
+    starts = regions["address"].to_numpy(dtype="int64")
+    ends = starts + regions["size"].to_numpy(dtype="int64")
+    group_ids = pd.factorize(regions["chip"] + "\0" + regions["kind"])[0]
+
+    prev_max_end, prev_arg = _sweep(group_ids, starts, ends)
+    hit = (prev_arg >= 0) & (starts > prev_max_end)
+
+    prev = regions.iloc[prev_arg[hit]].reset_index(drop=True)
+    this = regions[hit].reset_index(drop=True)
+    return pd.DataFrame(
+        {
+            "chip": this["chip"],
+            "kind": this["kind"],
+            "after": prev["name"],
+            "before": this["name"],
+            "gap_start": prev_max_end[hit],
+            "gap_size": starts[hit] - prev_max_end[hit],
+        }
+    )
+
+
+# --- Size consistency of the research CSV ---
+def find_size_inconsistencies(csv_path):
+    """Rows where eeprom_bank1_size_b + eeprom_bank2_size_b != eeprom_total_size_b_from_doc."""
+    df = pd.read_csv(csv_path, dtype=str).fillna("")
+
+    def _int(col):
+        return pd.to_numeric(df[col], errors="coerce").astype("Int64")
+
+    bank1 = _int("eeprom_bank1_size_b")
+    bank2 = _int("eeprom_bank2_size_b")
+    total = _int("eeprom_total_size_b_from_doc")
+    banks_sum = bank1.fillna(0) + bank2.fillna(0)
+
+    has_any = total.notna() | bank1.notna() | bank2.notna()
+    bad = has_any & (banks_sum != total.fillna(0))
+    return pd.DataFrame(
+        {
+            "chip": df.loc[bad, "part_number"].str.strip(),
+            "bank1_size_b": bank1[bad],
+            "bank2_size_b": bank2[bad],
+            "banks_sum_b": banks_sum[bad],
+            "total_from_doc_b": total[bad],
+        }
+    ).reset_index(drop=True)
+
+
+def _print_table(title, df, addr_cols=()):
+    print(f"\n--- {title}: {len(df)} ---")
+    if df.empty:
+        return
+    df = df.copy()
+    for col in addr_cols:
+        df[col] = df[col].map(lambda v: f"0x{v:08X}")
+    print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check memory maps of all chips for overlapping regions, gaps and EEPROM size inconsistencies."
+    )
+    parser.add_argument(
+        "--json-dir",
+        help="Load regions from stm32-data chip JSON files instead of the research CSV",
+    )
+    parser.add_argument("--csv", default=research_file_csv, help="Research CSV")
+    args = parser.parse_args()
+
+    if args.json_dir:
+        print(f"Loading memory regions from {args.json_dir}...")
+        regions = regions_from_chip_json_dir(args.json_dir)
+    else:
+        print(f"Loading memory regions from {args.csv}...")
+        regions = regions_from_research_csv(args.csv)
+    print(f"Loaded {len(regions)} regions of {regions['chip'].nunique()} chips.")
+
+    overlaps = find_overlaps(regions)
+    gaps = find_gaps(regions)
+    _print_table(
+        "Overlapping regions",
+        overlaps,
+        addr_cols=("region_start", "region_end", "overlaps_start", "overlaps_end"),
+    )
+    _print_table("Gaps between regions of the same kind", gaps, addr_cols=("gap_start",))
+
+    size_issues = pd.DataFrame()
+    if not args.json_dir:
+        size_issues = find_size_inconsistencies(args.csv)
+        _print_table("EEPROM bank sizes not adding up to the total", size_issues)
+
+    if overlaps.empty and size_issues.empty:
+        print("\n--- Memory maps are consistent. ---")
+    else:
+        print("\n--- Memory map problems found. ---")
+        raise SystemExit(1)
@@ -0,0 +1,250 @@
+"""Memory research table for the whole catalogue, one Parquet partition per family.
+
+Every part of the product catalogue is matched against the MEMS table of stm32-data
+(mems.py) and gets one row per memory region of each layout of its entry, next to
+what the product list says: flash and RAM size, data EEPROM size and dual bank
+flash. Per part and layout the totals are compared:
+
+    flash_ok   flash banks add up to the catalogue flash size
+    ram_ok     RAM regions add up to the catalogue RAM size
+    eeprom_ok  EEPROM regions add up to the catalogue data EEPROM size
+    banks_ok   the layout has two flash banks exactly when the part is dual bank
+
+Families (STM32L0, STM32L1, STM32F4, ...) are independent, so each one is built and
+written by its own worker process, to <output>/family=<family>/part-0.parquet.
+
+The L0/L1 EEPROM table (eeprom_view) is the EEPROM regions of the L0 and L1
+partitions, laid out like the bank columns of the research CSV.
+"""
+
+import argparse
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from mems import default_mems_source, match_chip, read_mems, region_kind
+
+# --- Configuration ---
+products_parquet_file = "all_stm_products.parquet"
+output_dir = "memory_research"
+
+FAMILY_RE = re.compile(r"^(STM32[A-Z]+\d)")
+CATALOGUE_COLUMNS = [
+    "part_number",
+    "flash_size_kb_prog",
+    "ram_size_kb",
+    "data_e2prom_b",
+    "dual_bank_flash",
+]
+SCHEMA = pa.schema(
+    [
+        ("part_number", pa.string()),
+        ("mems_line", pa.int64()),
+        ("mems_pattern", pa.string()),
+        ("layout", pa.int64()),
+        ("region", pa.string()),
+        ("kind", pa.string()),
+        ("address", pa.int64()),
+        ("size_b", pa.int64()),
+        ("access", pa.string()),
+        ("catalogue_flash_b", pa.int64()),
+        ("catalogue_ram_b", pa.int64()),
+        ("catalogue_eeprom_b", pa.int64()),
+        ("catalogue_dual_bank", pa.bool_()),
+        ("layout_flash_b", pa.int64()),
+        ("layout_ram_b", pa.int64()),
+        ("layout_eeprom_b", pa.int64()),
+        ("layout_flash_banks", pa.int64()),
+        ("flash_ok", pa.bool_()),
+        ("ram_ok", pa.bool_()),
+        ("eeprom_ok", pa.bool_()),
+        ("banks_ok", pa.bool_()),
+    ]
+)
+
+
+def family_of(part_number):
+    match = FAMILY_RE.match(part_number)
+    return match.group(1) if match else "other"
+
+
+def _kb_to_b(value):
+    return None if pd.isna(value) else int(value) * 1024
+
+
+def _part_rows(part, entries, compiled):
+    """Rows of one catalogue part: one per region and layout, one if MEMS has no entry."""
+    catalogue = {
+        "part_number": part["part_number"],
+        "catalogue_flash_b": _kb_to_b(part["flash_size_kb_prog"]),
+        "catalogue_ram_b": _kb_to_b(part["ram_size_kb"]),
+        "catalogue_eeprom_b": (
+            0 if pd.isna(part["data_e2prom_b"]) else int(part["data_e2prom_b"])
+        ),
+        "catalogue_dual_bank": str(part["dual_bank_flash"]).strip().lower() == "yes",
+    }
+    entry = match_chip(entries, part["part_number"], compiled)
+    if entry is None:
+        return [catalogue]
+
+    rows = []
+    for layout_no, layout in enumerate(entry.layouts):
+        totals = {"flash": 0, "ram": 0, "eeprom": 0}
+        flash_banks = 0
+        for name, _, size, _ in layout:
+            kind = region_kind(name)
+            totals[kind] += size
+            flash_banks += name.startswith("BANK")
+        checks = {
+            "layout_flash_b": totals["flash"],
+            "layout_ram_b": totals["ram"],
+            "layout_eeprom_b": totals["eeprom"],
+            "layout_flash_banks": flash_banks,
+            "flash_ok": totals["flash"] == catalogue["catalogue_flash_b"],
+            "ram_ok": totals["ram"] == catalogue["catalogue_ram_b"],
+            "eeprom_ok": totals["eeprom"] == catalogue["catalogue_eeprom_b"],
+            "banks_ok": (flash_banks > 1) == catalogue["catalogue_dual_bank"],
+        }
+        for name, address, size, access in layout:
+            rows.append(
+                {
+                    **catalogue,
+                    "mems_line": entry.line,
+                    "mems_pattern": entry.pattern,
+                    "layout": layout_no,
+                    "region": name,
+                    "kind": region_kind(name),
+                    "address": address,
+                    "size_b": size,
+                    "access": access,
+                    **checks,
+                }
+            )
+    return rows
+
+
+def build_family(family, parts, entries, out_dir):
+    """Builds and writes the partition of one family. Returns (family, parts, unmatched)."""
+    compiled = [entry.regex for entry in entries]
+    rows = []
+    unmatched = 0
+    for part in parts:
+        part_rows = _part_rows(part, entries, compiled)
+        unmatched += "region" not in part_rows[0]
+        rows.extend(part_rows)
+    table = pa.Table.from_pylist(rows, schema=SCHEMA)
+
+    partition = os.path.join(out_dir, f"family={family}")
+    os.makedirs(partition, exist_ok=True)
+    pq.write_table(table, os.path.join(partition, "part-0.parquet"))
+    return family, len(parts), unmatched
+
+
+def build_memory_research(
+    parquet_filepath=products_parquet_file,
+    mems_source=default_mems_source,
+    out_dir=output_dir,
+    max_workers=None,
+):
+    """Writes the partitioned table. Returns [(family, parts, unmatched)] by family."""
+    catalogue = pd.read_parquet(parquet_filepath, columns=CATALOGUE_COLUMNS)
+    catalogue["part_number"] = catalogue["part_number"].str.strip()
+    catalogue["family"] = catalogue["part_number"].map(family_of)
+    entries = read_mems(mems_source)
+
+    # The output is rebuilt as a whole, so families that disappeared leave nothing
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(
+                build_family,
+                family,
+                group[CATALOGUE_COLUMNS].to_dict(orient="records"),
+                entries,
+                out_dir,
+            )
+            for family, group in catalogue.groupby("family", sort=True)
+        ]
+        return [future.result() for future in futures]
+
+
+def load_memory_research(path=output_dir, families=None):
+    """The table as pandas, optionally only some families (partitions are pruned)."""
+    filters = [("family", "in", families)] if families else None
+    return pq.read_table(path, filters=filters).to_pandas()
+
+
+def eeprom_view(path=output_dir):
+    """L0/L1 EEPROM in the layout of the research CSV bank columns, one row per part."""
+    df = load_memory_research(path, families=["STM32L0", "STM32L1"])
+    df = df[(df["kind"] == "eeprom") & (df["layout"] == 0)]
+    bank = df["region"].map({"EEPROM": 1, "EEPROM_BANK_1": 1, "EEPROM_BANK_2": 2})
+    df = df.assign(bank=bank, address=df["address"].map(lambda a: f"0x{a:08X}"))
+    view = df.pivot_table(
+        index="part_number",
+        columns="bank",
+        values=["address", "size_b"],
+        aggfunc="first",
+    )
+    result = pd.DataFrame(index=view.index)
+    result["eeprom_total_size_b"] = df.groupby("part_number")["size_b"].sum()
+    for no in (1, 2):
+        result[f"eeprom_bank{no}_start_addr"] = view.get(("address", no), "")
+        size = view.get(("size_b", no))
+        result[f"eeprom_bank{no}_size_b"] = (
+            size.astype("Int64") if size is not None else pd.NA
+        )
+    return result.reset_index()
+
+
+def print_summary(results, path=output_dir):
+    df = load_memory_research(path)
+    per_layout = df.dropna(subset=["region"]).drop_duplicates(
+        subset=["part_number", "layout"]
+    )
+    print(
+        f"{'family':<10} {'parts':>6} {'no MEMS':>8} {'flash':>6} {'ram':>6} {'eeprom':>7} {'banks':>6}"
+    )
+    for family, parts, unmatched in results:
+        rows = per_layout[per_layout["family"] == family]
+        # A part is fine when one of its layouts agrees with the catalogue
+        bad = {
+            check: parts - unmatched - rows[rows[check]]["part_number"].nunique()
+            for check in ("flash_ok", "ram_ok", "eeprom_ok", "banks_ok")
+        }
+        print(
+            f"{family:<10} {parts:>6} {unmatched:>8} {bad['flash_ok']:>6} "
+            f"{bad['ram_ok']:>6} {bad['eeprom_ok']:>7} {bad['banks_ok']:>6}"
+        )
+    print("(counts of parts whose layouts disagree with the catalogue)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the per-family memory research table from the MEMS table of stm32-data."
+    )
+    parser.add_argument("--parquet", default=products_parquet_file)
+    parser.add_argument(
+        "--mems",
+        default=default_mems_source,
+        help="memory.rs of stm32-data-gen, or a patch of it (only its MEMS rows are used)",
+    )
+    parser.add_argument("--output", default=output_dir)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--eeprom-view", metavar="CSV", help="Also write the L0/L1 EEPROM view to CSV"
+    )
+    args = parser.parse_args()
+
+    results = build_memory_research(args.parquet, args.mems, args.output, args.workers)
+    print(f"Memory research table written to {args.output}/ ({len(results)} families).")
+    print_summary(results, args.output)
+    if args.eeprom_view:
+        eeprom_view(args.output).to_csv(args.eeprom_view, index=False)
+        print(f"L0/L1 EEPROM view written to {args.eeprom_view}.")
@@ -0,0 +1,131 @@
+"""The MEMS table of stm32-data (stm32-data-gen/src/memory.rs) as Python data.
+
+MEMS is a RegexMap from chip name patterns to memory layouts, written with the mem!
+macro:
+
+    ("STM32L1...D",  &[mem!(BANK_1 { 0x08000000 192 }, BANK_2 { 0x08030000 192 }, SRAM { 0x20000000 48 })]),
+
+Sizes are in KB unless followed by "bytes". An entry may list several layouts (e.g.
+single and dual bank). The first entry whose pattern matches the whole chip name
+wins, as in RegexMap::get.
+
+The table is read from memory.rs itself or, when only the EEPROM patch is at hand,
+from the post-patch side of its MEMS hunks (those rows only).
+"""
+
+import re
+from dataclasses import dataclass, field
+
+default_mems_source = "eeprom_initial_attempt.patch"
+
+_ENTRY_RE = re.compile(r'\(\s*"([^"]+)"\s*,\s*&\[')
+_MEM_RE = re.compile(r"mem!\((.*?)\)", re.DOTALL)
+_ROW_RE = re.compile(
+    r"(\w+)\s*\{\s*(0x[0-9A-Fa-f_]+|\d+)\s+(\d+)(\s+bytes)?(?:\s+(\w+))?\s*\}"
+)
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@(.*)$")
+
+
+@dataclass
+class MemsEntry:
+    line: int  # line of the entry in memory.rs (post-patch when read from a patch)
+    pattern: str
+    # layouts -> regions (name, address, size in bytes, access or None)
+    layouts: list = field(default_factory=list)
+
+    @property
+    def regex(self):
+        return re.compile(self.pattern)
+
+
+def region_kind(name):
+    """Memory kind as memory.rs assigns it: flash, eeprom or ram."""
+    if name.startswith("BANK") or name == "OTP":
+        return "flash"
+    if name.startswith("EEPROM"):
+        return "eeprom"
+    if "FLASH" in name or "AXIICP" in name:
+        return "flash"
+    return "ram"
+
+
+def _strip_comments(text):
+    return re.sub(r"//[^\n]*", "", text)
+
+
+def parse_mems_block(text, first_line=1):
+    """MemsEntry list from the text of (a part of) the MEMS table."""
+    text = _strip_comments(text)
+    starts = list(_ENTRY_RE.finditer(text))
+    entries = []
+    for i, match in enumerate(starts):
+        body_end = starts[i + 1].start() if i + 1 < len(starts) else len(text)
+        body = text[match.end() : body_end]
+        layouts = []
+        for mem in _MEM_RE.finditer(body):
+            layouts.append(
+                [
+                    (
+                        name,
+                        int(addr.replace("_", ""), 0),
+                        int(size) * (1 if in_bytes else 1024),
+                        access or None,
+                    )
+                    for name, addr, size, in_bytes, access in _ROW_RE.findall(
+                        mem.group(1)
+                    )
+                ]
+            )
+        line = first_line + text.count("\n", 0, match.start())
+        entries.append(MemsEntry(line, match.group(1), layouts))
+    return entries
+
+
+def _mems_block_of_rs(text):
+    start = text.index("static MEMS")
+    end = text.index("]);", start)
+    return text[start:end], text.count("\n", 0, start) + 1
+
+
+def _mems_hunks_of_patch(text):
+    """(post-patch text, first line) of every memory.rs hunk inside the MEMS table."""
+    hunks = []
+    current_file = None
+    hunk = None
+    for line in text.splitlines():
+        if line.startswith("+++ "):
+            current_file = line[4:]
+            hunk = None
+            continue
+        match = _HUNK_RE.match(line)
+        if match:
+            hunk = None
+            if current_file.endswith("memory.rs") and "static MEMS" in match.group(2):
+                hunk = [int(match.group(1)), []]
+                hunks.append(hunk)
+            continue
+        if hunk is not None and line[:1] in (" ", "+"):
+            hunk[1].append(line[1:])
+    return [("\n".join(lines), first_line) for first_line, lines in hunks]
+
+
+def read_mems(path=default_mems_source):
+    """MemsEntry list in table order from memory.rs or a patch of it."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith((".patch", ".diff")):
+        entries = []
+        for block, first_line in _mems_hunks_of_patch(text):
+            entries.extend(parse_mems_block(block, first_line))
+        return sorted(entries, key=lambda entry: entry.line)
+    block, first_line = _mems_block_of_rs(text)
+    return parse_mems_block(block, first_line)
+
+
+def match_chip(entries, chip, compiled=None):
+    """First entry whose pattern matches the whole chip name, or None."""
+    for i, entry in enumerate(entries):
+        regex = compiled[i] if compiled is not None else entry.regex
+        if regex.fullmatch(chip):
+            return entry
+    return None
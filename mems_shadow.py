@@ -0,0 +1,190 @@
+"""Shadowed and overlapping entries of the MEMS table against the product catalogue.
+
+MEMS is a first-match RegexMap (see mems.py), so an entry only gets the chips that no
+earlier entry matches. For every entry this computes the catalogue parts it matches
+and the ones it wins, and reports:
+
+    shadowed     entries that match catalogue parts but win none of them
+    partly       entries that lose some of their parts to earlier entries
+    overlaps     parts matched by more than one entry (the first one wins)
+    unmatched    catalogue parts no entry matches
+    no parts     entries that match no catalogue part (other families, typos)
+
+All parts are matched against all patterns in one pass: every pattern becomes an
+optional lookahead with its own named group in a single regex, and one
+Series.str.extract over the part numbers gives the whole match matrix.
+
+Every entry takes part in the first-match order, but only the entries of families
+the catalogue has parts of (STM32L0, STM32L1) are reported; the others cannot
+match a catalogue part and would all show up as matching nothing.
+
+The default source is the EEPROM patch, which holds only the MEMS rows inside
+its hunks (plus their context lines). Entries outside the hunks are not seen,
+so shadowing by them is missed; run with --mems path/to/memory.rs for a
+complete analysis.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from memory_research import family_of
+from mems import default_mems_source, read_mems
+
+# --- Configuration ---
+products_parquet_file = "all_stm_products.parquet"
+
+
+def match_matrix(entries, part_numbers):
+    """Boolean matrix (parts x entries): pattern of the entry matches the whole part."""
+    groups = [f"e{i}" for i in range(len(entries))]
+    combined = "".join(
+        rf"(?:(?=(?P<{group}>(?:{entry.pattern}))\Z))?"
+        for group, entry in zip(groups, entries)
+    )
+    extracted = pd.Series(part_numbers, dtype=object).str.extract(combined)
+    return extracted[groups].notna().to_numpy()
+
+
+def analyze(entries, part_numbers):
+    """Per entry (entry, matched parts, won parts, {part: winning entry} for lost parts),
+    plus the overlapping and the unmatched parts."""
+    part_numbers = np.asarray(part_numbers, dtype=object)
+    matrix = match_matrix(entries, part_numbers)
+    matched_any = matrix.any(axis=1)
+    # First matching entry per part (argmax of a row without matches is 0, masked below)
+    winner = np.where(matched_any, matrix.argmax(axis=1), -1)
+
+    per_entry = []
+    for i, entry in enumerate(entries):
+        matched = matrix[:, i]
+        won = winner == i
+        lost = matched & ~won
+        per_entry.append(
+            (
+                entry,
+                part_numbers[matched].tolist(),
+                part_numbers[won].tolist(),
+                {part: entries[w] for part, w in zip(part_numbers[lost], winner[lost])},
+            )
+        )
+
+    overlapping = {
+        part: [entries[i] for i in np.flatnonzero(row)]
+        for part, row in zip(part_numbers, matrix)
+        if row.sum() > 1
+    }
+    unmatched = part_numbers[~matched_any].tolist()
+    return per_entry, overlapping, unmatched
+
+
+def catalogue_entries(per_entry, part_numbers):
+    """Items of analyze() for the entries of families the catalogue has parts of,
+    plus the families of the other entries."""
+    families = {family_of(part) for part in part_numbers}
+    reported = [item for item in per_entry if family_of(item[0].pattern) in families]
+    others = sorted(
+        {family_of(item[0].pattern) for item in per_entry} - families - {"other"}
+    )
+    return reported, others
+
+
+def _entry_label(entry):
+    return f"line {entry.line} {entry.pattern!r}"
+
+
+def _shorten(parts, limit):
+    shown = ", ".join(parts[:limit])
+    return shown + (f", ... (+{len(parts) - limit})" if len(parts) > limit else "")
+
+
+def print_report(per_entry, overlapping, unmatched, limit=8):
+    print(f"{'line':>5} {'matches':>8} {'wins':>5}  pattern")
+    for entry, matched, won, _ in per_entry:
+        print(f"{entry.line:>5} {len(matched):>8} {len(won):>5}  {entry.pattern}")
+
+    shadowed = [item for item in per_entry if item[1] and not item[2]]
+    partly = [item for item in per_entry if item[2] and item[3]]
+    no_parts = [item[0] for item in per_entry if not item[1]]
+
+    print(f"\nShadowed entries (match parts, win none): {len(shadowed)}")
+    for entry, matched, _, lost in shadowed:
+        by = sorted({_entry_label(w) for w in lost.values()})
+        print(
+            f"  {_entry_label(entry)}: {len(matched)} parts, all won by {'; '.join(by)}"
+        )
+
+    print(f"\nPartly shadowed entries: {len(partly)}")
+    for entry, _, won, lost in partly:
+        print(f"  {_entry_label(entry)}: wins {len(won)}, loses {len(lost)}")
+        by_winner = {}
+        for part, w in lost.items():
+            by_winner.setdefault(_entry_label(w), []).append(part)
+        for label, parts in by_winner.items():
+            print(f"    to {label}: {_shorten(parts, limit)}")
+
+    print(f"\nParts matched by several entries: {len(overlapping)}")
+    for part, matching in list(overlapping.items())[:limit]:
+        print(f"  {part}: " + " > ".join(_entry_label(e) for e in matching))
+    if len(overlapping) > limit:
+        print(f"  ... (+{len(overlapping) - limit})")
+
+    print(f"\nCatalogue parts no entry matches: {len(unmatched)}")
+    if unmatched:
+        print(f"  {_shorten(unmatched, limit)}")
+
+    print(f"\nEntries matching no catalogue part: {len(no_parts)}")
+    for entry in no_parts:
+        print(f"  {_entry_label(entry)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find shadowed and overlapping entries of the MEMS table of stm32-data."
+    )
+    parser.add_argument("--parquet", default=products_parquet_file)
+    parser.add_argument(
+        "--mems",
+        default=default_mems_source,
+        help="memory.rs of stm32-data-gen, or a patch of it (only its MEMS rows are used)",
+    )
+    parser.add_argument(
+        "--limit", type=int, default=8, help="Parts listed per line of the report"
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Exit with 1 if an entry is shadowed or a catalogue part is unmatched",
+    )
+    args = parser.parse_args()
+
+    entries = read_mems(args.mems)
+    if args.mems.endswith((".patch", ".diff")):
+        print(
+            f"Warning: {args.mems} is a patch, only the MEMS rows in its hunks are read.\n"
+            "Entries outside the hunks are not seen, so shadowing by them is missed.\n"
+            "Pass the full table with --mems path/to/memory.rs for a complete analysis.\n"
+        )
+    parts = (
+        pd.read_parquet(args.parquet, columns=["part_number"])["part_number"]
+        .str.strip()
+        .drop_duplicates()
+        .sort_values()
+    )
+    print(
+        f"{len(entries)} MEMS entries from {args.mems}, {len(parts)} catalogue parts.\n"
+    )
+    per_entry, overlapping, unmatched = analyze(entries, parts.to_numpy())
+    per_entry, other_families = catalogue_entries(per_entry, parts)
+    if other_families:
+        print(
+            f"{len(entries) - len(per_entry)} entries of families without catalogue parts "
+            f"({', '.join(other_families)}) are not reported.\n"
+        )
+    print_report(per_entry, overlapping, unmatched, args.limit)
+
+    if args.strict and (
+        unmatched or any(matched and not won for _, matched, won, _ in per_entry)
+    ):
+        raise SystemExit(1)
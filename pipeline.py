@@ -0,0 +1,347 @@
+"""Build graph of the data pipeline with a content-addressed stage cache.
+
+Every stage declares the files it reads and writes. Before a stage runs, its inputs
+(including the script itself) are hashed; if the same inputs were seen before, the
+outputs are restored from the cache instead of running the script again.
+
+The research CSV is curated by hand on top of what add_csv.py generates, so that
+stage only runs when the CSV does not exist yet (or when it is asked for explicitly).
+fix_csv.py and update.py edit the CSV in place, so it is both an input and an output
+of those stages; the rules are idempotent, so after one run their cached outputs
+are hit again until a rule or the CSV changes.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# --- Configuration ---
+cache_dir = Path(".pipeline_cache")
+research_file_csv = "stm32_l0_l1_eeprom_research.csv"
+products_parquet_file = "all_stm_products.parquet"
+# Same directories as in json_check.py
+original_json_dir = "/home/okhsunrog/temp/generated_data/original/data/chips"
+w_eeprom_json_dir = "/home/okhsunrog/temp/generated_data/w_eeprom/data/chips"
+
+# Bump when the key or record layout changes
+CACHE_VERSION = 1
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: list  # files, glob patterns or directories
+    outputs: list = field(default_factory=list)
+    args: list = field(default_factory=list)
+    # Only create the outputs, never overwrite existing ones unless the stage is a target
+    bootstrap: bool = False
+
+
+# Modules the research CSV stages run their filters and rules through
+engine_sources = ["engine.py", "eeprom_rules.py", "csv_diff_writer.py"]
+
+STAGES = [
+    Stage(
+        "products",
+        "main.py",
+        inputs=["ProductsList_L*.csv", "constraints.py", "pn_search.py"],
+        outputs=[products_parquet_file],
+    ),
+    Stage(
+        "research_csv",
+        "add_csv.py",
+        inputs=[products_parquet_file, *engine_sources],
+        outputs=[research_file_csv],
+        bootstrap=True,
+    ),
+    Stage(
+        "fix_series",
+        "fix_csv.py",
+        inputs=[research_file_csv, *engine_sources],
+        outputs=[research_file_csv],
+    ),
+    Stage(
+        "l1_rules",
+        "update.py",
+        inputs=[research_file_csv, *engine_sources],
+        outputs=[research_file_csv],
+    ),
+    Stage(
+        "engine_parity",
+        "engine.py",
+        inputs=[research_file_csv, products_parquet_file, *engine_sources],
+    ),
+    Stage(
+        "snapshot",
+        "snapshot_check.py",
+        inputs=[
+            products_parquet_file,
+            research_file_csv,
+            "check_report.golden.txt",
+            "ProductsList_L*.csv",
+            "*.py",
+        ],
+    ),
+    Stage("check", "check.py", inputs=[research_file_csv, "ProductsList_L*.csv"]),
+    Stage("memmap_check", "memmap_check.py", inputs=[research_file_csv]),
+    Stage(
+        "rm_crosscheck",
+        "rm_crosscheck.py",
+        inputs=[research_file_csv, "rm_extract.py", "RM/*.pdf"],
+    ),
+    Stage(
+        "json_check",
+        "json_check.py",
+        inputs=[
+            research_file_csv,
+            "catalog_diff.py",
+            "diff_spec.py",
+            original_json_dir,
+            w_eeprom_json_dir,
+        ],
+        outputs=["json_check_report.jsonl"],
+    ),
+]
+
+
+# --- Hashing ---
+class FileHasher:
+    """sha256 of files, memoized by (size, mtime) in the cache directory."""
+
+    def __init__(self, root):
+        self.path = Path(root) / "stat_cache.json"
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+
+    def file(self, path):
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        entry = self.entries.get(str(path))
+        if entry and entry[0] == stamp:
+            return entry[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.entries[str(path)] = [stamp, digest]
+        self.dirty = True
+        return digest
+
+    def forget(self, path):
+        if self.entries.pop(str(path), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            _write_bytes_atomic(self.path, json.dumps(self.entries).encode())
+            self.dirty = False
+
+
+def expand_inputs(patterns):
+    """Resolves globs and directories to a sorted list of files; missing paths are kept as is."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(str(p) for p in Path(pattern).rglob("*") if p.is_file())
+        elif glob.has_magic(pattern):
+            files.extend(glob.glob(pattern))
+        else:
+            files.append(pattern)
+    return sorted(set(files))
+
+
+def stage_key(stage, hasher):
+    """Content hash of everything a stage depends on: its script, arguments and inputs."""
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}\0{stage.name}\0{stage.script}\0".encode())
+    h.update("\0".join(stage.args).encode())
+    for path in expand_inputs([stage.script] + stage.inputs):
+        digest = hasher.file(path) if os.path.isfile(path) else "missing"
+        h.update(f"\0{path}\0{digest}".encode())
+    return h.hexdigest()
+
+
+# --- Content-addressed storage ---
+def _write_bytes_atomic(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _object_path(digest):
+    return cache_dir / "objects" / digest[:2] / digest[2:]
+
+
+def store_object(data):
+    digest = hashlib.sha256(data).hexdigest()
+    obj = _object_path(digest)
+    if not obj.exists():
+        _write_bytes_atomic(obj, data)
+    return digest
+
+
+def load_object(digest):
+    with open(_object_path(digest), "rb") as f:
+        return f.read()
+
+
+def _record_path(key):
+    return cache_dir / "stages" / f"{key}.json"
+
+
+def load_record(key):
+    try:
+        with open(_record_path(key), "r") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # A record is only usable when all its objects are still there
+    digests = list(record["outputs"].values()) + [record["log"]]
+    if not all(_object_path(d).exists() for d in digests):
+        return None
+    return record
+
+
+# --- Graph ---
+def upstream_stages(stages, targets):
+    """Targets plus every earlier stage that produces one of their inputs, in pipeline order."""
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [t for t in targets if t not in by_name]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)}")
+
+    needed = set(targets)
+    for idx in range(len(stages) - 1, -1, -1):
+        stage = stages[idx]
+        if stage.name not in needed:
+            continue
+        consumed = set(stage.inputs)
+        for producer in stages[:idx]:
+            if consumed & set(producer.outputs):
+                needed.add(producer.name)
+    return [stage for stage in stages if stage.name in needed]
+
+
+def _produced_files(stage):
+    return set(stage.outputs)
+
+
+def run_pipeline(stages, targets=(), force=False, dry_run=False):
+    """Runs or restores every stage in order. Returns the names of failed stages."""
+    hasher = FileHasher(cache_dir)
+    failed = set()
+    failed_outputs = set()
+
+    for stage in stages:
+        if (
+            stage.bootstrap
+            and stage.name not in targets
+            and all(os.path.isfile(path) for path in stage.outputs)
+        ):
+            print(f"[keep]    {stage.name}: {', '.join(stage.outputs)} already exists")
+            continue
+        if set(stage.inputs) & failed_outputs:
+            print(f"[skip]    {stage.name}: an input was not produced")
+            failed.add(stage.name)
+            failed_outputs |= _produced_files(stage)
+            continue
+
+        key = stage_key(stage, hasher)
+        record = None if force else load_record(key)
+
+        if record is not None and dry_run:
+            print(f"[cached]  {stage.name}")
+            continue
+        if record is not None:
+            restored = []
+            for path, digest in record["outputs"].items():
+                if not os.path.isfile(path) or hasher.file(path) != digest:
+                    _write_bytes_atomic(path, load_object(digest))
+                    hasher.forget(path)
+                    restored.append(path)
+            note = f", restored {', '.join(restored)}" if restored else ""
+            print(f"[cached]  {stage.name}{note}")
+            # Checks have no outputs; their log is what they produce
+            if not stage.outputs:
+                sys.stdout.write(load_object(record["log"]).decode("utf-8", "replace"))
+            continue
+
+        if dry_run:
+            print(f"[run]     {stage.name} ({stage.script})")
+            continue
+
+        print(f"[run]     {stage.name} ({stage.script})")
+        proc = subprocess.run(
+            [sys.executable, stage.script] + stage.args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        log = proc.stdout
+        sys.stdout.write(log.decode("utf-8", "replace"))
+        if proc.returncode != 0:
+            print(f"[failed]  {stage.name}: exit code {proc.returncode}")
+            failed.add(stage.name)
+            failed_outputs |= _produced_files(stage)
+            continue
+
+        outputs = {}
+        for path in stage.outputs:
+            with open(path, "rb") as f:
+                outputs[path] = store_object(f.read())
+            hasher.forget(path)
+        record = {"stage": stage.name, "outputs": outputs, "log": store_object(log)}
+        _write_bytes_atomic(_record_path(key), json.dumps(record, indent=2).encode())
+
+    hasher.save()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the data pipeline, skipping stages whose inputs have not changed."
+    )
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        help="Stages to bring up to date together with the stages they depend on (default: all)",
+    )
+    parser.add_argument("--force", action="store_true", help="Ignore the cache")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only show which stages would run"
+    )
+    parser.add_argument("--list", action="store_true", help="Show the stage graph")
+    args = parser.parse_args()
+
+    if args.list:
+        for stage in STAGES:
+            deps = [
+                s.name for s in upstream_stages(STAGES, [stage.name]) if s is not stage
+            ]
+            print(
+                f"{stage.name:<14} {stage.script:<18} after: {', '.join(deps) or '-'}"
+            )
+        raise SystemExit(0)
+
+    selected = upstream_stages(STAGES, args.stages) if args.stages else STAGES
+    failed = run_pipeline(
+        selected, targets=args.stages, force=args.force, dry_run=args.dry_run
+    )
+    if failed:
+        print(f"\n--- Failed stages: {', '.join(sorted(failed))} ---")
+        raise SystemExit(1)
+    print("\n--- Pipeline is up to date. ---")
@@ -0,0 +1,270 @@
+"""Fuzzy part number search over the product catalogue.
+
+Part numbers are indexed by character trigrams, without the common "STM32" prefix,
+so "L151CB", "STM32L07RZ" or "l072cz" find the right parts. The index is an inverted
+list in CSR form (sorted grams, offsets, part ids) stored as JSON next to the Parquet
+file; a query is one bisect per gram and a count over the hit postings.
+
+Only the standard library is needed to load and query the index, so a lookup from
+the shell does not pay for importing numpy or pyarrow.
+
+The index is updated incrementally: only part numbers that are new in the catalogue
+are split into grams, removed ones are masked out until the next compaction.
+"""
+
+import argparse
+import bisect
+import difflib
+import json
+import os
+
+# --- Configuration ---
+products_parquet_file = "all_stm_products.parquet"
+INDEX_SUFFIX = ".pn_index.json"
+NGRAM = 3
+# Rebuild from scratch once this share of indexed parts has been removed
+COMPACT_DELETED_SHARE = 0.25
+INDEX_VERSION = 2
+
+
+def index_path_for(parquet_filepath):
+    root, _ = os.path.splitext(parquet_filepath)
+    return root + INDEX_SUFFIX
+
+
+def normalize(text):
+    text = str(text).strip().upper().replace(" ", "")
+    return text[5:] if text.startswith("STM32") else text
+
+
+def ngrams(text):
+    """Padded trigrams, so prefixes ("L15") and suffixes ("CB") weigh in as well."""
+    padded = "^" * (NGRAM - 1) + normalize(text) + "$"
+    return {padded[i : i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+def _pairs(part_numbers, first_id):
+    return [
+        (gram, first_id + offset)
+        for offset, pn in enumerate(part_numbers)
+        for gram in ngrams(pn)
+    ]
+
+
+def _csr(pairs):
+    pairs.sort()
+    keys, offsets, postings = [], [], []
+    for gram, part_id in pairs:
+        if not keys or keys[-1] != gram:
+            keys.append(gram)
+            offsets.append(len(postings))
+        postings.append(part_id)
+    offsets.append(len(postings))
+    return keys, offsets, postings
+
+
+class PartNumberIndex:
+    def __init__(
+        self,
+        parts,
+        keys,
+        offsets,
+        postings,
+        deleted=None,
+        gram_counts=None,
+        source=None,
+    ):
+        self.parts = parts
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+        self.deleted = deleted if deleted is not None else [False] * len(parts)
+        # Number of distinct grams per part, for the similarity score
+        if gram_counts is None:
+            gram_counts = [0] * len(parts)
+            for part_id in postings:
+                gram_counts[part_id] += 1
+        self.gram_counts = gram_counts
+        # (size, mtime_ns) of the Parquet file the index was built from
+        self.source = source
+
+    # --- Building ---
+    @classmethod
+    def build(cls, part_numbers):
+        parts = sorted(set(part_numbers))
+        return cls(parts, *_csr(_pairs(parts, 0)))
+
+    def updated(self, part_numbers):
+        """Index for a new set of part numbers, reusing the grams of known parts."""
+        wanted = set(part_numbers)
+        added = sorted(wanted.difference(self.parts))
+        # A part that was removed and comes back is simply undeleted here
+        deleted = [pn not in wanted for pn in self.parts]
+
+        if sum(deleted) > COMPACT_DELETED_SHARE * max(len(wanted), 1):
+            return PartNumberIndex.build(part_numbers), len(added), True
+        if not added:
+            index = PartNumberIndex(
+                self.parts,
+                self.keys,
+                self.offsets,
+                self.postings,
+                deleted,
+                self.gram_counts,
+            )
+            return index, 0, False
+
+        # Known grams are reused as they are, only the new part numbers are split
+        pairs = [
+            (gram, part_id)
+            for k, gram in enumerate(self.keys)
+            for part_id in self.postings[self.offsets[k] : self.offsets[k + 1]]
+        ]
+        pairs.extend(_pairs(added, len(self.parts)))
+        index = PartNumberIndex(
+            self.parts + added,
+            *_csr(pairs),
+            deleted + [False] * len(added),
+        )
+        return index, len(added), False
+
+    # --- Persistence ---
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "source": self.source,
+                    "parts": self.parts,
+                    "keys": self.keys,
+                    "offsets": self.offsets,
+                    "postings": self.postings,
+                    "deleted": self.deleted,
+                    "gram_counts": self.gram_counts,
+                },
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} has an old index format")
+        return cls(
+            data["parts"],
+            data["keys"],
+            data["offsets"],
+            data["postings"],
+            data["deleted"],
+            data["gram_counts"],
+            data["source"],
+        )
+
+    def part_numbers(self):
+        return [pn for pn, gone in zip(self.parts, self.deleted) if not gone]
+
+    # --- Searching ---
+    def search(self, query, limit=10):
+        """Ranked (part_number, score) matches; score is the trigram Jaccard similarity."""
+        query_grams = ngrams(query)
+        shared = {}
+        for gram in query_grams:
+            k = bisect.bisect_left(self.keys, gram)
+            if k == len(self.keys) or self.keys[k] != gram:
+                continue
+            for part_id in self.postings[self.offsets[k] : self.offsets[k + 1]]:
+                shared[part_id] = shared.get(part_id, 0) + 1
+
+        scores = {
+            part_id: count / (len(query_grams) + self.gram_counts[part_id] - count)
+            for part_id, count in shared.items()
+            if not self.deleted[part_id]
+        }
+        # Take a few more candidates than asked and order ties by edit similarity
+        candidates = sorted(scores, key=lambda i: (-scores[i], self.parts[i]))
+        q = normalize(query)
+        ranked = sorted(
+            candidates[: limit * 3],
+            key=lambda i: (
+                -scores[i],
+                -difflib.SequenceMatcher(None, q, normalize(self.parts[i])).ratio(),
+                self.parts[i],
+            ),
+        )
+        return [(self.parts[i], scores[i]) for i in ranked[:limit]]
+
+
+def _source_stamp(parquet_filepath):
+    st = os.stat(parquet_filepath)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def read_part_numbers(parquet_filepath):
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(parquet_filepath, columns=["part_number"])
+    return [pn.strip() for pn in table["part_number"].to_pylist() if pn]
+
+
+def update_index(parquet_filepath=products_parquet_file):
+    """Brings the index next to parquet_filepath up to date. Returns (index, added, rebuilt)."""
+    path = index_path_for(parquet_filepath)
+    part_numbers = read_part_numbers(parquet_filepath)
+    try:
+        index = PartNumberIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        index = None
+    if index is None:
+        index, added, rebuilt = (
+            PartNumberIndex.build(part_numbers),
+            len(part_numbers),
+            True,
+        )
+    else:
+        index, added, rebuilt = index.updated(part_numbers)
+    index.source = _source_stamp(parquet_filepath)
+    index.save(path)
+    return index, added, rebuilt
+
+
+def load_index(parquet_filepath=products_parquet_file):
+    """The persisted index; (re)built when missing or older than the Parquet file."""
+    try:
+        index = PartNumberIndex.load(index_path_for(parquet_filepath))
+    except (OSError, ValueError, KeyError):
+        return update_index(parquet_filepath)[0]
+    if index.source != _source_stamp(parquet_filepath):
+        return update_index(parquet_filepath)[0]
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fuzzy search of part numbers in the product catalogue."
+    )
+    parser.add_argument("queries", nargs="*", help="Part numbers, complete or not")
+    parser.add_argument("--parquet", default=products_parquet_file)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument(
+        "--update", action="store_true", help="Update the index from the Parquet file"
+    )
+    args = parser.parse_args()
+
+    if args.update:
+        index, added, rebuilt = update_index(args.parquet)
+        action = "rebuilt" if rebuilt else f"updated, {added} new part numbers"
+        print(f"Index {index_path_for(args.parquet)} {action}.")
+    else:
+        index = load_index(args.parquet)
+
+    for query in args.queries:
+        print(f"{query}:")
+        matches = index.search(query, args.limit)
+        if not matches:
+            print("  no matches")
+        for part_number, score in matches:
+            print(f"  {part_number:<16} {score:.2f}")
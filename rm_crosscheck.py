@@ -0,0 +1,162 @@
+import argparse
+
+import pandas as pd
+
+from rm_extract import load_rm_memory_map, rm_dir
+
+# --- Configuration ---
+research_file_csv = "stm32_l0_l1_eeprom_research.csv"
+
+BANK_COLUMNS = [
+    "eeprom_bank1_start_addr",
+    "eeprom_bank1_size_b",
+    "eeprom_bank2_start_addr",
+    "eeprom_bank2_size_b",
+]
+JOIN_KEYS = ["rm_series", "flash_kb", "device_key"]
+
+
+# --- RM side: one row per (series, flash size, device, category) with its bank layout ---
+def rm_category_layouts(rm_map):
+    """Pivots the normalized RM table to the bank columns used by the research CSV.
+
+    Only rows with a flash size take part in the join (L0 density tables and L1
+    Table 1); L0 rows are keyed by device number (STM32L031x -> STM32L031) as the
+    same flash size can belong to two categories there.
+    """
+    rm = rm_map[rm_map["flash_kb"].notna()].copy()
+    rm["device_key"] = ""
+    is_l0 = rm["rm_series"].str.startswith("L0")
+    rm.loc[is_l0, "device_key"] = rm.loc[is_l0, "device_pattern"].str[:9]
+
+    layout = rm.pivot_table(
+        index=JOIN_KEYS + ["category"],
+        columns="eeprom_bank",
+        values=["eeprom_start_addr", "eeprom_size_b"],
+        aggfunc="first",
+    )
+    layout.columns = [
+        f"eeprom_bank{bank}_{'start_addr' if value == 'eeprom_start_addr' else 'size_b'}"
+        for value, bank in layout.columns
+    ]
+    layout = layout.reset_index()
+    for col in BANK_COLUMNS:
+        if col not in layout.columns:
+            layout[col] = pd.NA
+    layout["flash_kb"] = layout["flash_kb"].astype("int64")
+    return layout[JOIN_KEYS + ["category"] + BANK_COLUMNS]
+
+
+# --- Research side ---
+def load_research_for_join(csv_path):
+    df = pd.read_csv(csv_path, dtype=str).fillna("")
+    df["part_number"] = df["part_number"].str.strip()
+    df["flash_kb"] = pd.to_numeric(df["flash_size_kb_prog"], errors="coerce")
+    df["rm_series"] = df["series_line"].where(
+        df["series_line"].str.startswith("L0"), "L1"
+    )
+    df["device_key"] = df["part_number"].str[:9].where(
+        df["rm_series"].str.startswith("L0"), ""
+    )
+    df["research_categories"] = df["category_from_doc"].str.findall(
+        r"(?:Category\s*|Cat\.)(\d)"
+    )
+    return df
+
+
+def _same(a, b):
+    """NA-aware equality of two string columns ('' and NA both mean 'not set')."""
+    a = a.fillna("").astype(str)
+    b = b.fillna("").astype(str)
+    return a == b
+
+
+def cross_validate(research_df, layouts):
+    """Flags research rows whose category or EEPROM banks disagree with the RM.
+
+    Every research row is exploded into one row per category it claims and joined
+    to the RM layouts in a single merge; the verdict is then aggregated per part.
+    """
+    rm_bank_columns = {col: f"rm_{col}" for col in BANK_COLUMNS}
+    layouts = layouts.rename(columns=rm_bank_columns).copy()
+    layouts["category"] = layouts["category"].astype(str)
+    for col in ["rm_eeprom_bank1_size_b", "rm_eeprom_bank2_size_b"]:
+        layouts[col] = layouts[col].astype("Int64").astype(str).replace("<NA>", "")
+
+    # All RM categories per key, to report what the RM would have accepted
+    rm_categories = (
+        layouts.groupby(JOIN_KEYS)["category"]
+        .agg(lambda c: "/".join(sorted(set(c))))
+        .rename("rm_categories")
+        .reset_index()
+    )
+
+    exploded = research_df.explode("research_categories")
+    exploded["category"] = exploded["research_categories"].fillna("")
+    joined = exploded.merge(
+        layouts, on=JOIN_KEYS + ["category"], how="left", indicator=True
+    )
+    joined["category_ok"] = joined["_merge"] == "both"
+    joined["start_ok"] = joined["category_ok"] & (
+        _same(joined["eeprom_bank1_start_addr"], joined["rm_eeprom_bank1_start_addr"])
+        & _same(
+            joined["eeprom_bank2_start_addr"], joined["rm_eeprom_bank2_start_addr"]
+        )
+    )
+    joined["size_ok"] = joined["category_ok"] & (
+        _same(joined["eeprom_bank1_size_b"], joined["rm_eeprom_bank1_size_b"])
+        & _same(joined["eeprom_bank2_size_b"], joined["rm_eeprom_bank2_size_b"])
+    )
+
+    # A part agrees when at least one of its claimed categories matches the RM completely
+    verdict = (
+        joined.groupby("part_number", sort=False)[["category_ok", "start_ok", "size_ok"]]
+        .any()
+        .reset_index()
+    )
+    report = research_df.merge(verdict, on="part_number", how="left").merge(
+        rm_categories, on=JOIN_KEYS, how="left"
+    )
+    report["in_rm"] = report["rm_categories"].notna()
+    bad = ~(report["category_ok"] & report["start_ok"] & report["size_ok"])
+    return report.loc[
+        bad,
+        [
+            "part_number",
+            "series_line",
+            "flash_kb",
+            "category_from_doc",
+            "rm_categories",
+            "in_rm",
+            "category_ok",
+            "start_ok",
+            "size_ok",
+        ]
+        + BANK_COLUMNS,
+    ].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cross-validate the research CSV against the category and EEPROM tables of the RMs."
+    )
+    parser.add_argument("--csv", default=research_file_csv, help="Research CSV")
+    parser.add_argument("--rm-dir", default=str(rm_dir), help="Directory with RM PDFs")
+    parser.add_argument("--output", help="Write disagreements to this CSV")
+    args = parser.parse_args()
+
+    print(f"Loading RM tables from {args.rm_dir}...")
+    layouts = rm_category_layouts(load_rm_memory_map(args.rm_dir))
+    print(f"Loading {args.csv}...")
+    research_df = load_research_for_join(args.csv)
+
+    disagreements = cross_validate(research_df, layouts)
+    if args.output:
+        disagreements.to_csv(args.output, index=False, encoding="utf-8")
+
+    if disagreements.empty:
+        print(f"\n--- All {len(research_df)} rows agree with the reference manuals. ---")
+    else:
+        print(f"\n--- {len(disagreements)} of {len(research_df)} rows disagree with the reference manuals ---")
+        print(disagreements.to_string(index=False))
+        raise SystemExit(1)
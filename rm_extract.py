@@ -0,0 +1,455 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+# --- Configuration ---
+rm_dir = Path("RM")
+cache_dir = Path(".rm_cache")
+output_csv_file = "rm_memory_map.csv"
+
+# Bump when the page parser changes, so that stale cache entries are not reused
+PARSER_VERSION = 1
+
+# Which product line each short reference manual describes
+RM_SERIES = {
+    "l0x0_short_rm.pdf": "L0x0",
+    "l0x1_short_rm.pdf": "L0x1",
+    "l0x2_short_rm.pdf": "L0x2",
+    "l0x3_short_rm.pdf": "L0x3",
+    "l1_short_rm.pdf": "L1",
+}
+
+OUTPUT_COLUMNS = [
+    "rm",
+    "rm_series",
+    "table",
+    "category",
+    "flash_kb",
+    "device_pattern",
+    "eeprom_bank",
+    "eeprom_start_addr",
+    "eeprom_size_b",
+]
+
+TABLE_HEADING_RE = re.compile(r"^Table (\d+)\.\s*(.*?)\s*$")
+RM_ID_RE = re.compile(r"\b(RM\d{4})\b")
+CATEGORY_RE = re.compile(r"(?:[Cc]ategory\s*|Cat\.)(\d)")
+KBYTES_ROW_RE = re.compile(r"^(\d+)\s*Kbytes\s+(.*)$")
+DEVICE_RE = re.compile(r"STM32[A-Z]\d{3}x[0-9A-Z]?(?=\s|$|STM32|\(|-)")
+# pypdf may break the digits apart ('0x0 808 0000'), so allow spaces anywhere in the address
+_ADDR_0808 = r"0x\s*0\s*8\s*0\s*8\s*((?:[0-9A-F]\s*){3}[0-9A-F])"
+EEPROM_RANGE_RE = re.compile(_ADDR_0808 + r"\s*-\s*" + _ADDR_0808, re.IGNORECASE)
+BANK_RE = re.compile(r"[Bb]ank\s*(\d)")
+
+
+# --- Cache helpers ---
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_path(pdf_hash, page):
+    return cache_dir / f"{pdf_hash}_v{PARSER_VERSION}_p{page}.json"
+
+
+def _manifest_path(pdf_hash):
+    return cache_dir / f"{pdf_hash}_pages.json"
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path.with_suffix(path.suffix + f".tmp{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+# --- Page parsing ---
+def _join_spaced_letters(line):
+    """pypdf sometimes yields 'S T M 3 2 L 1 6 2 x E'; glue runs of single characters."""
+    tokens = line.split()
+    out = []
+    run = ""
+    for tok in tokens:
+        if len(tok) == 1:
+            run += tok
+            continue
+        if run:
+            out.append(run)
+            run = ""
+        out.append(tok)
+    if run:
+        out.append(run)
+    return out
+
+
+def _split_density_cells(cells_text):
+    """Splits a density row ('STM32L011xSTM32L021x (AES) STM32L031x... --') into cells.
+
+    A '-' is an empty cell and '(AES)' closes a cell. A device joins the open cell
+    when it is its AES twin (device number + 10, e.g. STM32L011x/STM32L021x),
+    otherwise it starts a new one.
+    """
+    cells = []
+    prev_num = None
+    token_re = re.compile(DEVICE_RE.pattern + r"|-|\(AES\)")
+    for m in token_re.finditer(cells_text):
+        tok = m.group(0)
+        if tok in ("-", "(AES)"):
+            if tok == "-":
+                cells.append([])
+            prev_num = None
+            continue
+        num = int(tok[6:9])
+        if prev_num is not None and num - prev_num == 10:
+            cells[-1].append(tok)
+        else:
+            cells.append([tok])
+        prev_num = num
+    return cells
+
+
+def parse_page_text(text):
+    """Extracts table headings, category rows and data EEPROM ranges from one page.
+
+    Rows that appear before the first heading of the page are returned with
+    heading None; they belong to a table that started on an earlier page. RPN rows
+    seen before any column header keep their raw marks for the same reason.
+    """
+    result = {"rm": None, "headings": [], "categories": [], "rows": []}
+    rm_match = RM_ID_RE.search(text)
+    if rm_match:
+        result["rm"] = rm_match.group(1)
+
+    lines = text.splitlines(keepends=True)
+    current_heading = None
+    heading_positions = []
+    categories = []
+    line_pos = 0
+    for raw_line in lines:
+        line = raw_line.strip()
+        line_pos += len(raw_line)
+        heading_match = TABLE_HEADING_RE.match(line)
+        if heading_match:
+            title = heading_match.group(2)
+            if "(continued)" in title:
+                continue
+            current_heading = f"Table {heading_match.group(1)}. {title}"
+            result["headings"].append(current_heading)
+            heading_positions.append((line_pos, current_heading))
+            categories = []
+            continue
+
+        # Column headers of the category tables
+        if line.startswith(
+            ("Memory density", "Flash program memory size level", "RPNs")
+        ):
+            categories = [int(c) for c in CATEGORY_RE.findall(line)]
+            result["categories"] = categories
+            continue
+
+        # L0 density tables (devices per cell) and L1 Table 1 (x marks per cell)
+        kbytes_match = KBYTES_ROW_RE.match(line)
+        if kbytes_match and categories:
+            flash_kb = int(kbytes_match.group(1))
+            cells_text = kbytes_match.group(2)
+            if DEVICE_RE.search(cells_text) or "-" in cells_text:
+                if set(cells_text.replace(" ", "")) <= {"x", "-"}:
+                    marks = cells_text.replace(" ", "")
+                    for cat, mark in zip(categories, marks):
+                        if mark == "x":
+                            result["rows"].append(
+                                {
+                                    "kind": "density",
+                                    "heading": current_heading,
+                                    "category": cat,
+                                    "flash_kb": flash_kb,
+                                    "device_pattern": "",
+                                }
+                            )
+                else:
+                    cells = _split_density_cells(cells_text)
+                    if len(cells) != len(categories):
+                        print(
+                            f"Warning: {len(cells)} cells for {len(categories)} categories in row '{line}'."
+                        )
+                    for cat, devices in zip(categories, cells):
+                        for device in devices:
+                            result["rows"].append(
+                                {
+                                    "kind": "density",
+                                    "heading": current_heading,
+                                    "category": cat,
+                                    "flash_kb": flash_kb,
+                                    "device_pattern": device,
+                                }
+                            )
+            continue
+
+        # L1 RPN tables: 'STM32L15xx6-A - x ---- STM32L151C6T6A'
+        if line.replace(" ", "").startswith("STM32"):
+            tokens = _join_spaced_letters(line)
+            rpn = tokens[0]
+            marks = ""
+            for tok in tokens[1:]:
+                if set(tok) <= {"x", "-"}:
+                    marks += tok
+                else:
+                    break
+            if not marks:
+                continue
+            if not categories:
+                result["rows"].append(
+                    {
+                        "kind": "rpn",
+                        "heading": None,
+                        "category": None,
+                        "flash_kb": None,
+                        "device_pattern": rpn,
+                        "marks": marks,
+                    }
+                )
+            elif len(marks) >= len(categories):
+                for cat, mark in zip(categories, marks):
+                    if mark == "x":
+                        result["rows"].append(
+                            {
+                                "kind": "rpn",
+                                "heading": current_heading,
+                                "category": cat,
+                                "flash_kb": None,
+                                "device_pattern": rpn,
+                            }
+                        )
+            continue
+
+    # Data EEPROM address ranges, with the bank number from the same line or the label after it
+    for m in EEPROM_RANGE_RE.finditer(text):
+        start = 0x08080000 + int(re.sub(r"\s", "", m.group(1)), 16)
+        end = 0x08080000 + int(re.sub(r"\s", "", m.group(2)), 16)
+        line_start = text.rfind("\n", 0, m.start()) + 1
+        bank_match = BANK_RE.search(text[line_start : m.start()])
+        if not bank_match:
+            next_addr = text.find("0x", m.end())
+            after = text[m.end() : next_addr if next_addr != -1 else len(text)]
+            bank_match = BANK_RE.search(after)
+        heading = None
+        for heading_pos, h in heading_positions:
+            if heading_pos <= m.start():
+                heading = h
+        result["rows"].append(
+            {
+                "kind": "eeprom",
+                "heading": heading,
+                "bank": int(bank_match.group(1)) if bank_match else None,
+                "start_addr": start,
+                "size_b": end - start + 1,
+            }
+        )
+    return result
+
+
+def parse_pdf_pages(pdf_path, pages, pdf_hash):
+    """Worker: parses a batch of pages of one PDF and stores the results in the cache.
+
+    The PDF is opened once per batch, not once per page."""
+    from pypdf import PdfReader  # pip install pypdf
+
+    reader = PdfReader(pdf_path)
+    results = []
+    for page in pages:
+        text = reader.pages[page].extract_text() or ""
+        result = parse_page_text(text)
+        _write_json_atomic(_cache_path(pdf_hash, page), result)
+        results.append((page, result))
+    return results
+
+
+def _page_batches(pages, batch_count):
+    """Splits pages into at most batch_count contiguous batches of about equal size."""
+    size = -(-len(pages) // batch_count)
+    return [pages[i : i + size] for i in range(0, len(pages), size)]
+
+
+def _pdf_page_count(pdf_path, pdf_hash):
+    manifest = _manifest_path(pdf_hash)
+    if manifest.exists():
+        with open(manifest, "r") as f:
+            return json.load(f)["pages"]
+    from pypdf import PdfReader  # pip install pypdf
+
+    pages = len(PdfReader(pdf_path).pages)
+    _write_json_atomic(manifest, {"pages": pages})
+    return pages
+
+
+def extract_pages(pdf_paths, max_workers=None):
+    """Returns {pdf_path: [page results]}; only pages missing from the cache are parsed."""
+    cache_dir.mkdir(exist_ok=True)
+    results = {}
+    jobs = {}
+    for pdf_path in pdf_paths:
+        pdf_hash = file_sha256(pdf_path)
+        n_pages = _pdf_page_count(pdf_path, pdf_hash)
+        results[pdf_path] = [None] * n_pages
+        for page in range(n_pages):
+            cached = _cache_path(pdf_hash, page)
+            if cached.exists():
+                with open(cached, "r") as f:
+                    results[pdf_path][page] = json.load(f)
+            else:
+                jobs.setdefault((pdf_path, pdf_hash), []).append(page)
+
+    if jobs:
+        print(f"Parsing {sum(map(len, jobs.values()))} uncached pages...")
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(parse_pdf_pages, str(pdf_path), batch, pdf_hash): pdf_path
+                for (pdf_path, pdf_hash), pages in jobs.items()
+                for batch in _page_batches(pages, workers)
+            }
+            for future, pdf_path in futures.items():
+                for page, result in future.result():
+                    results[pdf_path][page] = result
+    else:
+        print("All pages served from cache.")
+    return results
+
+
+# --- Normalization ---
+def build_rm_memory_map(page_results):
+    """Joins category rows and data EEPROM banks of every RM into one table.
+
+    One row per (RM, category, flash size, device pattern, EEPROM bank). Tables that
+    continue on the next page are attached to the last heading of the previous page.
+    """
+    category_rows = []
+    eeprom_rows = []
+    for pdf_path, pages in page_results.items():
+        rm_series = RM_SERIES.get(Path(pdf_path).name, Path(pdf_path).stem)
+        rm_id = next((p["rm"] for p in pages if p["rm"]), "")
+        last_heading = None
+        last_categories = []
+        for page in pages:
+            for row in page["rows"]:
+                heading = row["heading"] or last_heading
+                if row["kind"] == "rpn" and row["category"] is None:
+                    for cat, mark in zip(last_categories, row["marks"]):
+                        if mark == "x":
+                            category_rows.append(
+                                {
+                                    "rm": rm_id,
+                                    "rm_series": rm_series,
+                                    "category": cat,
+                                    "flash_kb": None,
+                                    "device_pattern": row["device_pattern"],
+                                }
+                            )
+                elif row["kind"] == "eeprom":
+                    # Remapping tables show the swapped banks (UFB = 1), not the default map
+                    if heading is None or "remapping" in heading:
+                        continue
+                    categories = [int(c) for c in CATEGORY_RE.findall(heading or "")]
+                    flash_match = re.search(r"(\d+)\s*Kbyte", heading or "")
+                    for cat in categories:
+                        eeprom_rows.append(
+                            {
+                                "rm": rm_id,
+                                "rm_series": rm_series,
+                                "table": heading,
+                                "category": cat,
+                                "flash_kb": (
+                                    int(flash_match.group(1)) if flash_match else None
+                                ),
+                                "eeprom_bank": row["bank"] or 1,
+                                "eeprom_start_addr": f"0x{row['start_addr']:08X}",
+                                "eeprom_size_b": row["size_b"],
+                            }
+                        )
+                else:
+                    category_rows.append(
+                        {
+                            "rm": rm_id,
+                            "rm_series": rm_series,
+                            "category": row["category"],
+                            "flash_kb": row["flash_kb"],
+                            "device_pattern": row["device_pattern"],
+                        }
+                    )
+            if page["headings"]:
+                last_heading = page["headings"][-1]
+            if page["categories"]:
+                last_categories = page["categories"]
+
+    categories_df = pd.DataFrame(
+        category_rows,
+        columns=["rm", "rm_series", "category", "flash_kb", "device_pattern"],
+    )
+    eeprom_df = pd.DataFrame(
+        eeprom_rows,
+        columns=[
+            "rm",
+            "rm_series",
+            "table",
+            "category",
+            "flash_kb",
+            "eeprom_bank",
+            "eeprom_start_addr",
+            "eeprom_size_b",
+        ],
+    )
+    categories_df["flash_kb"] = categories_df["flash_kb"].astype("Int64")
+    eeprom_df["flash_kb"] = eeprom_df["flash_kb"].astype("Int64")
+
+    # NVM tables without a flash size (e.g. 'category 3 devices') apply to every size of the category
+    merged = categories_df.merge(
+        eeprom_df.rename(columns={"flash_kb": "eeprom_flash_kb"}),
+        on=["rm", "rm_series", "category"],
+        how="left",
+    )
+    keep = (
+        merged["eeprom_flash_kb"].isna()
+        | merged["flash_kb"].isna()
+        | (merged["eeprom_flash_kb"] == merged["flash_kb"])
+    )
+    merged = merged[keep.fillna(False)]
+    merged = merged.drop(columns=["eeprom_flash_kb"]).drop_duplicates()
+    merged["eeprom_bank"] = merged["eeprom_bank"].astype("Int64")
+    merged["eeprom_size_b"] = merged["eeprom_size_b"].astype("Int64")
+    return (
+        merged[OUTPUT_COLUMNS]
+        .sort_values(
+            ["rm_series", "category", "flash_kb", "device_pattern", "eeprom_bank"]
+        )
+        .reset_index(drop=True)
+    )
+
+
+def load_rm_memory_map(pdf_dir=rm_dir, max_workers=None):
+    pdf_paths = sorted(Path(pdf_dir).glob("*.pdf"))
+    return build_rm_memory_map(extract_pages(pdf_paths, max_workers=max_workers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract device-category and data EEPROM tables from the reference manuals in RM/."
+    )
+    parser.add_argument("--rm-dir", default=str(rm_dir), help="Directory with RM PDFs")
+    parser.add_argument(
+        "--output", default=output_csv_file, help="Normalized CSV to write"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    rm_map = load_rm_memory_map(args.rm_dir, max_workers=args.workers)
+    rm_map.to_csv(args.output, index=False, encoding="utf-8")
+    print(f"Written {len(rm_map)} rows to {args.output}.")
@@ -0,0 +1,239 @@
+"""Golden-snapshot regression check for the pipeline outputs.
+
+The checked-in outputs are the golden files. The pipeline scripts are run in a
+scratch directory on the checked-in inputs and what they produce is compared with
+them:
+
+    all_stm_products.parquet          main.py on ProductsList_L*.csv
+    stm32_l0_l1_eeprom_research.csv   fix_csv.py and update.py on the golden CSV with
+                                      every cell the rules own blanked out
+    check_report.golden.txt           the report of check.py on the outputs above
+
+check_report.golden.txt was saved from the original pandas check.py (everything
+from "--- Checking Data ---" on, the loading messages are left out), so it pins
+the Arrow rewrite of check.py to the output of the code it replaced. It is never
+overwritten by --update; tests/test_check.py compares it on the checked-in CSVs.
+
+Only files a script produces are covered. shorter_one.csv is a hand-made extract
+of the research CSV with no script behind it, so there is nothing to rerun for it.
+
+The research CSV is curated by hand, so it cannot be regenerated from scratch; the
+rules have to fill the blanked cells back in exactly as they are checked in.
+
+Files with identical bytes pass at once. Otherwise both sides are loaded and every
+column is hashed; cells are only compared in the columns whose hashes differ. The
+check report is text and is compared line by line.
+
+    python snapshot_check.py            compare, exit 1 on any difference
+    python snapshot_check.py --update   overwrite the golden files with the outputs
+                                        (all but check_report.golden.txt)
+"""
+
+import argparse
+import difflib
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# --- Configuration ---
+products_parquet_file = "all_stm_products.parquet"
+research_file_csv = "stm32_l0_l1_eeprom_research.csv"
+check_report_file = "check_report.golden.txt"
+CHECK_REPORT_START = "--- Checking Data ---"
+# Saved from code that no longer exists, so --update must not replace them
+FROZEN_GOLDEN_FILES = [check_report_file]
+INPUT_PATTERNS = ["*.py", "ProductsList_L*.csv"]
+
+# Cells fix_csv.py and update.py derive: the series line of every L0/L1 part and
+# the EEPROM layout of the L0x1 and L1 parts
+RULE_OWNED_COLUMNS = [
+    "category_from_doc",
+    "eeprom_total_size_b_from_doc",
+    "eeprom_bank1_start_addr",
+    "eeprom_bank1_size_b",
+    "eeprom_bank2_start_addr",
+    "eeprom_bank2_size_b",
+]
+
+
+# --- Producing the outputs ---
+def prepare_workdir(workdir):
+    for pattern in INPUT_PATTERNS:
+        for path in glob.glob(pattern):
+            shutil.copy2(path, workdir)
+
+
+def run_script(workdir, script):
+    """Runs a script in workdir. Returns what it printed."""
+    proc = subprocess.run(
+        [sys.executable, script],
+        cwd=workdir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{script} failed:\n{proc.stdout}")
+    return proc.stdout
+
+
+def scrub_research_csv(golden_path, output_path):
+    df = pd.read_csv(golden_path, dtype=str, keep_default_na=False)
+    l0_l1 = df["part_number"].str.startswith(("STM32L0", "STM32L1"))
+    owned = (df["series_line"] == "L0x1") | df["part_number"].str.startswith("STM32L1")
+    df.loc[owned, RULE_OWNED_COLUMNS] = ""
+    df.loc[l0_l1, "series_line"] = ""
+    df.to_csv(output_path, index=False)
+
+
+def produce_outputs(workdir):
+    """Runs the pipeline in workdir. Returns {golden file: produced file}."""
+    prepare_workdir(workdir)
+    run_script(workdir, "main.py")
+
+    research_path = os.path.join(workdir, research_file_csv)
+    scrub_research_csv(research_file_csv, research_path)
+    run_script(workdir, "fix_csv.py")
+    run_script(workdir, "update.py")
+
+    report_path = os.path.join(workdir, check_report_file)
+    report = run_script(workdir, "check.py")
+    with open(report_path, "w") as f:
+        f.write(report[report.index(CHECK_REPORT_START) :])
+
+    return {
+        products_parquet_file: os.path.join(workdir, products_parquet_file),
+        research_file_csv: research_path,
+        check_report_file: report_path,
+    }
+
+
+# --- Comparing ---
+def load_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def column_digest(series):
+    hashes = pd.util.hash_pandas_object(series, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def _same_bytes(path_a, path_b):
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        return a.read() == b.read()
+
+
+def compare_text(golden_path, actual_path):
+    with open(golden_path) as a, open(actual_path) as b:
+        golden, actual = a.read().splitlines(), b.read().splitlines()
+    return list(
+        difflib.unified_diff(golden, actual, "golden", "output", n=1, lineterm="")
+    )
+
+
+def compare_snapshot(golden_path, actual_path, max_cells=5):
+    """Returns a list of difference lines, empty when the snapshot matches."""
+    if _same_bytes(golden_path, actual_path):
+        return []
+    if golden_path.endswith(".txt"):
+        return compare_text(golden_path, actual_path)
+    golden = load_frame(golden_path)
+    actual = load_frame(actual_path)
+
+    lines = []
+    missing = [c for c in golden.columns if c not in actual.columns]
+    extra = [c for c in actual.columns if c not in golden.columns]
+    if missing:
+        lines.append(f"missing columns: {', '.join(missing)}")
+    if extra:
+        lines.append(f"extra columns: {', '.join(extra)}")
+    common = [c for c in golden.columns if c in actual.columns]
+    if not missing and not extra and list(golden.columns) != list(actual.columns):
+        lines.append("column order differs")
+    if len(golden) != len(actual):
+        lines.append(f"rows: golden {len(golden)}, output {len(actual)}")
+
+    rows = min(len(golden), len(actual))
+    golden = golden.iloc[:rows].reset_index(drop=True)
+    actual = actual.iloc[:rows].reset_index(drop=True)
+    key = "part_number" if "part_number" in common else None
+    for col in common:
+        if golden[col].dtype != actual[col].dtype:
+            lines.append(f"{col}: dtype {golden[col].dtype} -> {actual[col].dtype}")
+        if column_digest(golden[col]) == column_digest(actual[col]):
+            continue
+        # Only now the cells of this column are compared
+        same = (golden[col] == actual[col]) | (golden[col].isna() & actual[col].isna())
+        changed = (~same).to_numpy().nonzero()[0]
+        if not len(changed):
+            continue
+        lines.append(f"{col}: {len(changed)} cells differ")
+        for row in changed[:max_cells]:
+            label = golden.at[row, key] if key else f"row {row}"
+            lines.append(
+                f"  {label}: {golden.at[row, col]!r} -> {actual.at[row, col]!r}"
+            )
+    if not lines:
+        lines.append("same data, different bytes (formatting or file metadata)")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline on the checked-in inputs and compare its outputs with the golden files."
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Overwrite the golden files with the new outputs (except the frozen check report)",
+    )
+    parser.add_argument(
+        "--max-cells", type=int, default=5, help="Differing cells shown per column"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the scratch directory"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="snapshot_check_")
+    try:
+        outputs = produce_outputs(workdir)
+        failed = False
+        for golden_path, actual_path in outputs.items():
+            differences = compare_snapshot(golden_path, actual_path, args.max_cells)
+            if not differences:
+                print(f"OK    {golden_path}")
+                continue
+            if args.update and golden_path not in FROZEN_GOLDEN_FILES:
+                shutil.copy2(actual_path, golden_path)
+                print(f"UPD   {golden_path}")
+            else:
+                failed = True
+                frozen = args.update and golden_path in FROZEN_GOLDEN_FILES
+                print(
+                    f"DIFF  {golden_path}"
+                    + (" (frozen, not updated)" if frozen else "")
+                )
+            for line in differences:
+                print(f"      {line}")
+    finally:
+        if args.keep:
+            print(f"Outputs kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Done in {time.perf_counter() - start:.1f} s.")
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,24 @@
+"""check.py on the checked-in CSVs must print the report of the original pandas
+check.py, saved in check_report.golden.txt."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from snapshot_check import CHECK_REPORT_START, check_report_file
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_report_matches_original_script():
+    proc = subprocess.run(
+        [sys.executable, "check.py"],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    assert proc.returncode == 0, proc.stdout
+    report = proc.stdout[proc.stdout.index(CHECK_REPORT_START) :]
+    golden = (ROOT / check_report_file).read_text()
+    assert report.splitlines() == golden.splitlines()
@@ -0,0 +1,38 @@
+"""Data-quality constraints on small catalogue frames."""
+
+import pandas as pd
+
+from constraints import check_constraints
+
+CATALOGUE = pd.DataFrame(
+    {
+        "part_number": ["STM32L011F4", "STM32F103C8"],
+        "marketing_status": ["Active", "Active"],
+        "flash_size_kb_prog": [16, 64],
+        "ram_size_kb": [2, 20],
+        "supply_voltage_v_min": [1.8, 2.0],
+        "supply_voltage_v_max": [3.6, 3.6],
+        "operating_temperature_degc_min": [-40, -40],
+        "operating_temperature_degc_max": [85, 85],
+        "data_e2prom_b": [512, 0],
+    }
+)
+
+
+def test_clean_catalogue():
+    assert check_constraints(CATALOGUE).empty
+
+
+def test_missing_column_is_not_an_error():
+    # Exports of families without data EEPROM have no such column
+    violations = check_constraints(CATALOGUE.drop(columns=["data_e2prom_b"]))
+    assert violations["constraint"].tolist() == ["eeprom_only_in_eeprom_families"]
+    assert violations["severity"].tolist() == ["warning"]
+    assert violations["row"].tolist() == [-1]
+
+
+def test_violating_values_keep_their_severity():
+    df = CATALOGUE.assign(data_e2prom_b=[512, 1024], flash_size_kb_prog=[16, 100])
+    violations = check_constraints(df).set_index("constraint")["severity"]
+    assert violations["eeprom_only_in_eeprom_families"] == "error"
+    assert violations["flash_size_valid_code"] == "warning"
@@ -0,0 +1,191 @@
+"""The pandas and Arrow engines must produce the same cells on every operation.
+
+Each case builds a small research-like CSV with the awkward cells the real files
+have (blanks, pandas NA spellings, duplicates, non-numeric values) and runs the
+same operation through both engines. Outputs are compared the way the CSV writer
+renders them (cell_text), and the rule match counts must agree as well.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from eeprom_rules import (
+    L0X1_EEPROM_RULES,
+    L1_EEPROM_RULES,
+    RESEARCH_FILTER,
+    RESEARCH_SERIES_LINE_RULES,
+    SERIES_LINE_RULES,
+)
+from engine import ENGINES, ArrowEngine, PandasEngine, check_parity, compare_frames
+from fix_csv import apply_fix_rules
+from update import apply_l1_rules
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEADER = "part_number,series_line,flash_size_kb_prog,total_eeprom_b_from_export,notes"
+ROWS = [
+    "STM32L011F4,L0x1,16,512,",
+    "STM32L011F4,L0x1,16,512,duplicate part number",
+    "STM32L051K8,,64,3072,",
+    "STM32L071CZ,L0x1,192,6144.0,float in the export",
+    "STM32L081KZ,L0x1, 128 ,6144,padded number",
+    "STM32L0,,32,1024,no line digits",
+    "STM32L099C8,,-,-,unknown digits",
+    "STM32L100C6-A,L100,32,4096,",
+    "STM32L100C6,L100,32,2048,",
+    "STM32L151CB,L151,128,n/a,",
+    "STM32L152RE,L152,512,16384,",
+    "STM32L162VD,,384,12288,",
+    "STM32L1,,abc,1e3,",
+    '" STM32L053R8",L0x3,64,2048,leading space',
+    "STM32F103C8,F1,64,NA,other family",
+    ",,,,blank row",
+    '"STM32L062K8",None,64,"2,048",quoted comma',
+]
+
+
+@pytest.fixture
+def research_csv(tmp_path):
+    path = tmp_path / "research.csv"
+    path.write_text("\n".join([HEADER] + ROWS) + "\n", encoding="utf-8")
+    return path
+
+
+def run_both(path, operation):
+    """operation(engine, table) -> table or (table, counts), with each engine."""
+    results = {}
+    for name, engine_class in ENGINES.items():
+        engine = engine_class()
+        result = operation(engine, engine.read_csv(path))
+        table, counts = result if isinstance(result, tuple) else (result, None)
+        results[name] = (engine.to_pandas(table), counts)
+    return results["pandas"], results["arrow"]
+
+
+def assert_same(path, operation):
+    (expected, expected_counts), (actual, actual_counts) = run_both(path, operation)
+    assert compare_frames(expected, actual, limit=50) == []
+    assert expected_counts == actual_counts
+    return expected, expected_counts
+
+
+def test_read_csv(research_csv):
+    frame, _ = assert_same(research_csv, lambda engine, table: table)
+    # NA spellings come back blank, quoted commas stay in the cell
+    assert frame["series_line"].tolist()[-1] == ""
+    assert frame["total_eeprom_b_from_export"].tolist()[-1] == "2,048"
+
+
+@pytest.mark.parametrize("as_int", [False, True])
+def test_to_numeric_non_numeric_cells(research_csv, as_int):
+    columns = ["flash_size_kb_prog", "total_eeprom_b_from_export"]
+    frame, _ = assert_same(
+        research_csv, lambda engine, table: engine.to_numeric(table, columns, as_int)
+    )
+    # "-", "abc", "n/a", blanks and "2,048" are not numbers
+    assert frame["total_eeprom_b_from_export"].tolist()[-1] == 0
+
+
+@pytest.mark.parametrize(
+    "conditions",
+    [
+        [("eq", "series_line", "L0x1")],
+        [("eq", "series_line", "")],
+        [("gt", "flash_size_kb_prog", 64)],
+        [("isin", "flash_size_kb_prog", [16, 64, 128])],
+        [("isin", "series_line", ["L100", "L152"])],
+        [("startswith", "part_number", ["STM32L1"])],
+        [("startswith", "part_number", ["STM32L0", "STM32F"])],
+        [("startswith", "flash_size_kb_prog", ["1"])],
+        RESEARCH_FILTER,
+    ],
+)
+def test_filter_and_count(research_csv, conditions):
+    def operation(engine, table):
+        table = engine.to_numeric(
+            table, ["flash_size_kb_prog", "total_eeprom_b_from_export"]
+        )
+        table = engine.with_column(
+            table, "data_e2prom_b", table["total_eeprom_b_from_export"]
+        )
+        count = engine.count_rows(table, conditions)
+        return engine.filter_rows(table, conditions), {"count": count}
+
+    assert_same(research_csv, operation)
+
+
+@pytest.mark.parametrize(
+    "rules", [SERIES_LINE_RULES, RESEARCH_SERIES_LINE_RULES], ids=["fix", "research"]
+)
+@pytest.mark.parametrize("keep_unmatched", [False, True])
+def test_derive_series_line(research_csv, rules, keep_unmatched):
+    frame, _ = assert_same(
+        research_csv,
+        lambda engine, table: engine.derive_series_line(table, rules, keep_unmatched),
+    )
+    lines = dict(zip(frame["part_number"], frame["series_line"]))
+    assert lines["STM32L0"] == "L0_Malformed_PN"
+    assert lines["STM32L099C8"] == "L0_Unknown_Digits"
+
+
+def test_rules_overlap_exclusion_and_format(research_csv):
+    rules = [
+        ("first", [("startswith", "part_number", ["STM32L0"])], [("notes", "L0")]),
+        # A later rule wins where both match
+        ("second", [("gt", "flash_size_kb_prog", 100)], [("notes", "big")]),
+        (
+            "rest",
+            [("not_rule", None, ["first", "second"])],
+            # A column the table does not have yet
+            [("category_from_doc", ("format", "{} KB", "flash_size_kb_prog"))],
+        ),
+        ("none", [("eq", "series_line", "no such line")], [("notes", "never")]),
+    ]
+
+    def operation(engine, table):
+        table = engine.to_numeric(table, ["flash_size_kb_prog"], as_int=True)
+        return engine.apply_rules(table, rules)
+
+    frame, counts = assert_same(research_csv, operation)
+    assert counts["none"] == 0
+    assert "category_from_doc" in frame.columns
+
+
+def test_fix_csv_rules(research_csv):
+    assert_same(research_csv, apply_fix_rules)
+
+
+def test_l1_rules(research_csv):
+    _, counts = assert_same(research_csv, apply_l1_rules)
+    assert set(counts) == {name for name, _, _ in L1_EEPROM_RULES}
+
+
+def test_l0x1_rules_fill_two_banks(research_csv):
+    frame, counts = assert_same(research_csv, apply_fix_rules)
+    assert set(counts) == {name for name, _, _ in L0X1_EEPROM_RULES}
+    row = frame[frame["part_number"] == "STM32L071CZ"].iloc[0]
+    assert row["category_from_doc"] == "Category 5 (192K Flash)"
+    # 6144 B split in two 3072 B banks, the second right after the first
+    assert row["eeprom_bank1_start_addr"] == "0x08080000"
+    assert row["eeprom_bank1_size_b"] == "3072"
+    assert row["eeprom_bank2_start_addr"] == "0x08080C00"
+    assert row["eeprom_bank2_size_b"] == "3072"
+    assert row["eeprom_total_size_b_from_doc"] == "6144"
+
+
+def test_arrow_engine_single_thread(research_csv):
+    results = []
+    for engine in (PandasEngine(), ArrowEngine(threads=1)):
+        table, counts = apply_l1_rules(engine, engine.read_csv(research_csv))
+        results.append((engine.to_pandas(table), counts))
+    (expected, expected_counts), (actual, actual_counts) = results
+    assert compare_frames(expected, actual) == []
+    assert expected_counts == actual_counts
+
+
+def test_checked_in_files():
+    differences = check_parity(
+        ROOT / "stm32_l0_l1_eeprom_research.csv", ROOT / "all_stm_products.parquet"
+    )
+    assert differences == {stage: [] for stage in differences}
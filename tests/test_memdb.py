@@ -0,0 +1,86 @@
+"""Round trip of the memory layout database: every region written must come back
+unchanged through the memory-mapped reader."""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from memdb import KIND_CODES, NAME_LEN, MemDB, write_memdb
+from memmap_check import regions_from_research_csv
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def expected_layouts(regions):
+    """{chip: regions as MemDB.lookup_dicts returns them}, from the source table."""
+    regions = regions.sort_values(["chip", "address", "name"], kind="stable")
+    return {
+        chip: [
+            {
+                "name": row.name,
+                "kind": row.kind if row.kind in KIND_CODES else "other",
+                "address": int(row.address),
+                "size": int(row.size),
+            }
+            for row in chip_regions.itertuples(index=False)
+        ]
+        for chip, chip_regions in regions.groupby("chip", sort=True)
+    }
+
+
+def assert_round_trip(regions, path):
+    write_memdb(regions, path)
+    db = MemDB(path)
+    expected = expected_layouts(regions)
+    assert db.part_names() == sorted(expected)
+    for chip, layout in expected.items():
+        assert db.lookup_dicts(chip) == layout
+
+
+def test_research_csv_round_trip(tmp_path):
+    regions = regions_from_research_csv(ROOT / "stm32_l0_l1_eeprom_research.csv")
+    assert_round_trip(regions, tmp_path / "memdb.bin")
+
+
+def test_unsorted_regions_other_kinds_and_prefix_names(tmp_path):
+    regions = pd.DataFrame(
+        [
+            ("STM32L011", "RAM", "ram", 0x20000000, 2048),
+            ("STM32L0", "BANK_1", "flash", 0x08000000, 16384),
+            ("STM32L011", "BANK_1", "flash", 0x08000000, 16384),
+            ("STM32L011", "EEPROM", "eeprom", 0x08080000, 512),
+            ("STM32L011", "OTP", "otp", 0x1FF80000, 32),
+            ("X" * NAME_LEN, "HIGH", "flash", 2**40, 2**33),
+        ],
+        columns=["chip", "name", "kind", "address", "size"],
+    )
+    path = tmp_path / "memdb.bin"
+    assert_round_trip(regions, path)
+
+    db = MemDB(path)
+    assert len(db) == 3
+    assert "STM32L0" in db and "STM32L01" not in db
+    assert db.lookup("STM32L01") is None
+    assert [r["name"] for r in db.lookup_dicts("STM32L011")] == [
+        "BANK_1",
+        "EEPROM",
+        "OTP",
+        "RAM",
+    ]
+
+
+def test_long_names_are_rejected(tmp_path):
+    regions = pd.DataFrame(
+        [("X" * (NAME_LEN + 1), "BANK_1", "flash", 0x08000000, 1024)],
+        columns=["chip", "name", "kind", "address", "size"],
+    )
+    with pytest.raises(ValueError, match="Part names"):
+        write_memdb(regions, tmp_path / "memdb.bin")
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "memdb.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError, match="not a memory layout database"):
+        MemDB(path)